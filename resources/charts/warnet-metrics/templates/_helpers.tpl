@@ -0,0 +1,37 @@
+{{/*
+Labels that make the main Prometheus from kube-prometheus-stack select an object
+*/}}
+{{- define "warnet-metrics.mainSelector" -}}
+release: prometheus
+{{- end }}
+
+{{/*
+Labels that make the shard Prometheus select an object
+*/}}
+{{- define "warnet-metrics.shardSelector" -}}
+warnet-metrics: shard
+{{- end }}
+
+{{- define "warnet-metrics.sharded" -}}
+{{- if gt (int .Values.shards) 1 }}true{{ end }}
+{{- end }}
+
+{{/*
+Operator combining per-shard partial aggregates: counts add up
+*/}}
+{{- define "warnet-metrics.combine" -}}
+{{- if eq . "count" }}sum{{ else }}{{ . }}{{ end }}
+{{- end }}
+
+{{/*
+Exporter health from the exporters' own metrics: the ten tanks with the slowest
+RPC p90, failed RPC calls and the oldest snapshot served
+*/}}
+{{- define "warnet-metrics.exporterRules" -}}
+- record: {{ .prefix }}:exporter_rpc_seconds:slowest
+  expr: topk(10, histogram_quantile(0.9, sum by (namespace, pod, tank, le) (rate(bitcoin_exporter_rpc_seconds_bucket[5m]))))
+- record: {{ .prefix }}:exporter_rpc_errors:rate5m
+  expr: sum by (namespace) (rate(bitcoin_exporter_rpc_errors_total[5m]))
+- record: {{ .prefix }}:exporter_snapshot_age_seconds:max
+  expr: max by (namespace) (bitcoin_exporter_snapshot_age_seconds)
+{{- end }}
@@ -1,18 +1,35 @@
+import ast
+import json
 import os
+import re
+import ssl
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+from socketserver import ThreadingMixIn
+from typing import Optional
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
 
 from authproxy import AuthServiceProxy
-from prometheus_client import Gauge, start_http_server
-
-
-# Ensure that all RPC calls are made with brand new http connections
-def auth_proxy_request(self, method, path, postdata):
-    self._set_conn()  # creates new http client connection
-    return self.oldrequest(method, path, postdata)
-
-
-AuthServiceProxy.oldrequest = AuthServiceProxy._request
-AuthServiceProxy._request = auth_proxy_request
-
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client.core import (
+    REGISTRY,
+    CounterMetricFamily,
+    GaugeHistogramMetricFamily,
+    GaugeMetricFamily,
+)
+from prometheus_client.core import Metric as Family
 
 # RPC Credentials for bitcoin node
 # By default we assume the container is in the same pod as bitcoind, on regtest
@@ -30,50 +47,653 @@ METRICS = os.environ.get(
     "METRICS",
     'blocks=getblockcount() inbounds=getnetworkinfo()["connections_in"] outbounds=getnetworkinfo()["connections_out"] mempool_size=getmempoolinfo()["size"]',
 )
+# Structured metric definitions as a JSON list, see METRIC_FIELDS
+METRICS_CONFIG = os.environ.get("METRICS_CONFIG", "")
+# Set to 1 to also export BUILTIN_METRICS
+BUILTIN = os.environ.get("BUILTIN_METRICS", "0").lower() in ("1", "true", "yes")
 
-# Set up bitcoind RPC client
-rpc = AuthServiceProxy(
-    service_url=f"http://{BITCOIN_RPC_USER}:{BITCOIN_RPC_PASSWORD}@{BITCOIN_RPC_HOST}:{BITCOIN_RPC_PORT}"
-)
+# Scrapes within this many seconds of the last RPC batch reuse its results
+CACHE_SECONDS = float(os.environ.get("CACHE_SECONDS", "5"))
+# Set to 0 to send RPC calls one at a time, so their latency is recorded per method
+RPC_BATCH = os.environ.get("RPC_BATCH", "1").lower() in ("1", "true", "yes")
+
+# Multi-target mode: poll every pod in the namespace matching this label selector
+# instead of the single bitcoind above. Pod labels give the RPC port and password,
+# the metrics, metricsConfig and builtinMetrics annotations the metrics, and
+# metricsBatch whether to batch its RPC calls.
+TARGETS_SELECTOR = os.environ.get("TARGETS_SELECTOR", "")
+DISCOVERY_SECONDS = float(os.environ.get("DISCOVERY_SECONDS", "30"))
+CONCURRENCY = int(os.environ.get("CONCURRENCY", "32"))
+RPC_TIMEOUT = float(os.environ.get("RPC_TIMEOUT", "5"))
+SERVICE_ACCOUNT = "/var/run/secrets/kubernetes.io/serviceaccount"
+
+# A metric definition. Only name and rpc are required.
+METRIC_FIELDS = {
+    "name": "metric name",
+    "help": "description, defaults to the RPC call",
+    "type": "gauge, counter, histogram (of the current values) or churn (items appearing/leaving)",
+    "rpc": "RPC method",
+    "params": "list of RPC params",
+    "path": "list of keys leading from the RPC result to the value or items",
+    "items": "list, values (of a dict) or entries (key and value of a dict), if several",
+    "where": "{field: value} items must match",
+    "key": "field identifying an item across snapshots, for counters and churn",
+    "labels": "{label: field} label values read from each item",
+    "expand": "field holding a {name: value} dict, one value per entry",
+    "expand_label": "label for the entry names of expand",
+    "value": "dotted field of the item holding the value, defaults to the item itself",
+    "per": "dotted field to divide the value by",
+    "scale": "factor to multiply the value by",
+    "age": "true to export seconds since the value, a unix timestamp",
+    "aggregate": "sum, count, min or max of the items sharing labels (gauges), default sum",
+    "buckets": "histogram bucket upper bounds",
+}
+METRIC_TYPES = ("gauge", "counter", "histogram", "churn")
+
+PING_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+RPC_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+FEE_RATE_BUCKETS = [1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+BUILTIN_METRICS = [
+    {
+        "name": "bitcoin_peer_message_bytes_sent",
+        "help": "Bytes sent per P2P message type, over all peers",
+        "type": "counter",
+        "rpc": "getpeerinfo",
+        "items": "list",
+        "key": "id",
+        "expand": "bytessent_per_msg",
+        "expand_label": "msgtype",
+    },
+    {
+        "name": "bitcoin_peer_message_bytes_received",
+        "help": "Bytes received per P2P message type, over all peers",
+        "type": "counter",
+        "rpc": "getpeerinfo",
+        "items": "list",
+        "key": "id",
+        "expand": "bytesrecv_per_msg",
+        "expand_label": "msgtype",
+    },
+    {
+        "name": "bitcoin_peer_ping_seconds",
+        "help": "Current ping time of connected peers",
+        "type": "histogram",
+        "rpc": "getpeerinfo",
+        "items": "list",
+        "value": "pingtime",
+        "buckets": PING_BUCKETS,
+    },
+    {
+        "name": "bitcoin_peers",
+        "help": "Connected peers by connection type",
+        "rpc": "getpeerinfo",
+        "items": "list",
+        "labels": {"connection_type": "connection_type"},
+        "aggregate": "count",
+    },
+    {
+        "name": "bitcoin_peer_connections",
+        "help": "Peer connections opened and closed since the exporter started",
+        "type": "churn",
+        "rpc": "getpeerinfo",
+        "items": "list",
+        "key": "id",
+        "labels": {"connection_type": "connection_type"},
+    },
+    {
+        "name": "bitcoin_network_bytes_sent",
+        "help": "Bytes sent over the network",
+        "type": "counter",
+        "rpc": "getnettotals",
+        "value": "totalbytessent",
+    },
+    {
+        "name": "bitcoin_network_bytes_received",
+        "help": "Bytes received over the network",
+        "type": "counter",
+        "rpc": "getnettotals",
+        "value": "totalbytesrecv",
+    },
+    {
+        "name": "bitcoin_blocks",
+        "help": "Height of the validated chain tip",
+        "rpc": "getblockchaininfo",
+        "value": "blocks",
+    },
+    {
+        "name": "bitcoin_headers",
+        "help": "Height of the best header, ahead of bitcoin_blocks while blocks wait for validation",
+        "rpc": "getblockchaininfo",
+        "value": "headers",
+    },
+    {
+        "name": "bitcoin_tip_age_seconds",
+        "help": "Seconds since the timestamp of the chain tip",
+        "rpc": "getblockchaininfo",
+        "value": "time",
+        "age": True,
+    },
+    {
+        "name": "bitcoin_mempool_transactions",
+        "help": "Transactions in the mempool",
+        "rpc": "getmempoolinfo",
+        "value": "size",
+    },
+    {
+        "name": "bitcoin_mempool_fee_rate",
+        "help": "Fee rates (sat/vB) of the transactions in the mempool",
+        "type": "histogram",
+        "rpc": "getrawmempool",
+        "params": [True],
+        "items": "values",
+        "value": "fees.base",
+        "per": "vsize",
+        "scale": 1e8,
+        "buckets": FEE_RATE_BUCKETS,
+    },
+]
+
+QUERY = re.compile(r"^(?P<method>\w+)\((?P<params>.*)\)(?P<keys>(?:\[[^\]]*\])*)$")
+KEY = re.compile(r"\[([^\]]*)\]")
+
+
+def parse_query(label: str, query: str) -> dict:
+    """
+    Definition of one labeled query from METRICS, either label=method(params)[key][...]
+    or label=COUNT:method(params),key,value counting the result items whose key equals value
+    """
+    call = query
+    definition = {"name": label, "help": query}
+    if query.startswith("COUNT:"):
+        call, key, value = query[len("COUNT:") :].split(",")
+        definition.update({"items": "list", "where": {key: value}, "aggregate": "count"})
+    match = QUERY.match(call)
+    if not match:
+        raise ValueError(f"Can not parse metric {label}={query}")
+    params = match["params"].strip()
+    definition["rpc"] = match["method"]
+    definition["params"] = list(ast.literal_eval(f"({params},)")) if params else []
+    definition["path"] = [ast.literal_eval(key) for key in KEY.findall(match["keys"])]
+    return definition
+
+
+def field(item, dotted: Optional[str]):
+    if dotted is None:
+        return item
+    for part in dotted.split("."):
+        item = item[part]
+    return item
+
+
+def field_path(result, path: list):
+    for key in path:
+        result = result[key]
+    return result
+
+
+class Metric:
+    """A metric definition and the state it keeps between snapshots"""
+
+    def __init__(self, definition: dict):
+        unknown = set(definition) - set(METRIC_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)} in metric {definition.get('name')}")
+        self.name = definition["name"]
+        self.type = definition.get("type", "gauge")
+        if self.type not in METRIC_TYPES:
+            raise ValueError(f"Metric {self.name} has unknown type {self.type}")
+        self.rpc = definition["rpc"]
+        self.params = definition.get("params", [])
+        self.help = definition.get("help", f"{self.rpc}({json.dumps(self.params)[1:-1]})")
+        self.path = definition.get("path", [])
+        self.items = definition.get("items")
+        self.where = definition.get("where", {})
+        self.key = definition.get("key")
+        self.labels = definition.get("labels", {})
+        self.expand = definition.get("expand")
+        self.expand_label = definition.get("expand_label", "key")
+        self.value = definition.get("value")
+        self.per = definition.get("per")
+        self.scale = definition.get("scale", 1)
+        self.age = definition.get("age", False)
+        self.aggregate = definition.get("aggregate", "sum")
+        self.buckets = sorted(definition.get("buckets", PING_BUCKETS))
+        self.label_names = list(self.labels) + ([self.expand_label] if self.expand else [])
+        # Metrics making the same RPC call share one request per snapshot
+        self.call = (self.rpc, json.dumps(self.params))
+
+        # counter: last cumulative value per item and running totals per label values
+        self.last = {}
+        self.totals = defaultdict(float)
+        # churn: label values of the items in the previous snapshot
+        self.present = None
+
+    def observations(self, result) -> list[tuple[tuple, tuple, float]]:
+        """(item identity, label values, value) for everything this metric reads from a result"""
+        result = field_path(result, self.path)
+        if self.items == "list":
+            items = result
+        elif self.items == "values":
+            items = result.values()
+        elif self.items == "entries":
+            items = [{"key": key, "value": value} for key, value in result.items()]
+        else:
+            items = [result]
+
+        now = time.time()
+        observed = []
+        for item in items:
+            if any(str(item.get(k)) != str(v) for k, v in self.where.items()):
+                continue
+            try:
+                labels = tuple(str(field(item, name)) for name in self.labels.values())
+                identity = (field(item, self.key),) if self.key else labels
+                if self.expand:
+                    for entry, value in field(item, self.expand).items():
+                        observed.append((identity + (entry,), labels + (entry,), float(value)))
+                    continue
+                if self.type == "churn" or self.aggregate == "count":
+                    observed.append((identity, labels, 1.0))
+                    continue
+                value = float(field(item, self.value))
+                if self.per:
+                    value /= float(field(item, self.per))
+                value *= self.scale
+                if self.age:
+                    value = now - value
+                observed.append((identity, labels, value))
+            except (KeyError, IndexError, TypeError, ValueError, ZeroDivisionError):
+                # e.g. pingtime is missing until the first pong
+                continue
+        return observed
+
+    def update(self, result):
+        """Fold a new snapshot into counter and churn state"""
+        observed = self.observations(result)
+        if self.type == "counter":
+            for identity, labels, value in observed:
+                last = self.last.get(identity, 0.0)
+                # A smaller value means the item was reset, e.g. a peer reconnected with the same id
+                self.totals[labels] += value - last if value >= last else value
+            self.last = {identity: value for identity, _, value in observed}
+        elif self.type == "churn":
+            present = {identity: labels for identity, labels, _ in observed}
+            if self.present is not None:
+                for identity, labels in present.items():
+                    if identity not in self.present:
+                        self.totals[labels + ("opened",)] += 1
+                for identity, labels in self.present.items():
+                    if identity not in present:
+                        self.totals[labels + ("closed",)] += 1
+            self.present = present
+        return observed
+
+    def family(self, observed):
+        if self.type == "counter":
+            family = CounterMetricFamily(self.name, self.help, labels=self.label_names)
+            for labels, total in sorted(self.totals.items()):
+                family.add_metric(list(labels), total)
+        elif self.type == "churn":
+            family = CounterMetricFamily(self.name, self.help, labels=self.label_names + ["event"])
+            for labels, total in sorted(self.totals.items()):
+                family.add_metric(list(labels), total)
+        elif self.type == "histogram":
+            family = GaugeHistogramMetricFamily(self.name, self.help, labels=self.label_names)
+            by_labels = defaultdict(list)
+            for _, labels, value in observed:
+                by_labels[labels].append(value)
+            for labels, values in sorted(by_labels.items()):
+                buckets = [(str(bound), sum(v <= bound for v in values)) for bound in self.buckets]
+                buckets.append(("+Inf", len(values)))
+                family.add_metric(list(labels), buckets, sum(values))
+        else:
+            family = GaugeMetricFamily(self.name, self.help, labels=self.label_names)
+            by_labels = defaultdict(list)
+            for _, labels, value in observed:
+                by_labels[labels].append(value)
+            if not self.label_names and not by_labels and self.aggregate in ("sum", "count"):
+                by_labels[()] = []
+            for labels, values in sorted(by_labels.items()):
+                if self.aggregate == "count":
+                    value = len(values)
+                elif self.aggregate == "min":
+                    value = min(values)
+                elif self.aggregate == "max":
+                    value = max(values)
+                else:
+                    value = sum(values)
+                family.add_metric(list(labels), value)
+        return family
+
+
+def load_metrics(metrics=METRICS, config=METRICS_CONFIG, builtin=BUILTIN, verbose=True):
+    definitions = []
+    for labeled_query in metrics.split(" "):
+        if "=" not in labeled_query:
+            continue
+        label, query = labeled_query.strip().split("=", 1)
+        definitions.append(parse_query(label, query))
+    if config:
+        definitions += json.loads(config)
+    if builtin:
+        definitions += BUILTIN_METRICS
+
+    metrics = []
+    names = set()
+    for definition in definitions:
+        metric = Metric(definition)
+        if metric.name in names:
+            raise ValueError(f"Metric {metric.name} is defined twice")
+        names.add(metric.name)
+        metrics.append(metric)
+        if verbose:
+            print(f"Metric created: {metric.name} ({metric.type}) from {metric.help}")
+    return metrics
+
+
+class RPCCollector:
+    """
+    Computes every metric from one snapshot of RPC results, fetched as a single
+    JSON-RPC batch (or one request per call) over a persistent connection and
+    reused for CACHE_SECONDS
+    """
+
+    def __init__(self, rpc: AuthServiceProxy, metrics: list[Metric], batch: bool = RPC_BATCH):
+        self.rpc = rpc
+        self.metrics = metrics
+        self.batch = batch
+        self.calls = list(dict.fromkeys(metric.call for metric in metrics))
+        self.lock = threading.Lock()
+        self.families = []
+        self.snapshot_time = 0.0
+        self.snapshot_wall_time = None
+
+        # The exporter's own metrics, exported next to the bitcoind ones
+        self.rpc_seconds = Histogram(
+            "bitcoin_exporter_rpc_seconds",
+            "Round trip of RPC requests to bitcoind, by method or batch when calls are batched",
+            ["method"],
+            buckets=RPC_BUCKETS,
+            registry=None,
+        )
+        self.rpc_batch_size = Gauge(
+            "bitcoin_exporter_rpc_batch_size",
+            "RPC calls sent per request to bitcoind",
+            registry=None,
+        )
+        self.rpc_errors = Counter(
+            "bitcoin_exporter_rpc_errors",
+            "RPC calls that returned no result, by method",
+            ["method"],
+            registry=None,
+        )
+        self.snapshot_seconds = Gauge(
+            "bitcoin_exporter_snapshot_seconds",
+            "Time taken to fetch and compute the last snapshot",
+            registry=None,
+        )
+
+    def post(self, requests: list[dict], method: str) -> list[dict]:
+        """Responses to requests sent as one batch, timed under method"""
+        start = time.monotonic()
+        try:
+            responses = self.rpc.batch(requests)
+        except (OSError, HTTPException):
+            # bitcoind closed the keep-alive connection, e.g. after a restart: retry once
+            self.rpc._set_conn()
+            start = time.monotonic()
+            responses = self.rpc.batch(requests)
+        self.rpc_seconds.labels(method).observe(time.monotonic() - start)
+        return responses
+
+    def fetch(self) -> dict:
+        """Results of every distinct RPC call by (method, params), leaving out failed calls"""
+        requests = [
+            {"version": "1.1", "method": method, "params": json.loads(params), "id": i}
+            for i, (method, params) in enumerate(self.calls)
+        ]
+        if self.batch:
+            responses = self.post(requests, "batch")
+            self.rpc_batch_size.set(len(requests))
+        else:
+            responses = [
+                response
+                for request in requests
+                for response in self.post([request], request["method"])
+            ]
+            self.rpc_batch_size.set(1)
+        results = {
+            self.calls[response["id"]]: response["result"]
+            for response in responses
+            if response.get("error") is None
+        }
+        for method, params in self.calls:
+            if (method, params) not in results:
+                self.rpc_errors.labels(method).inc()
+        return results
+
+    def cached_families(self) -> list:
+        # Counters and churn advance once per snapshot, however often we are scraped
+        with self.lock:
+            if time.monotonic() - self.snapshot_time >= CACHE_SECONDS:
+                start = time.monotonic()
+                try:
+                    snapshot = self.fetch()
+                    self.snapshot_time = time.monotonic()
+                    self.snapshot_wall_time = time.time()
+                except Exception as e:
+                    print(f"RPC batch failed: {e}")
+                    for method, _ in self.calls:
+                        self.rpc_errors.labels(method).inc()
+                    snapshot = {}
+                self.families = [
+                    metric.family(metric.update(snapshot[metric.call]))
+                    for metric in self.metrics
+                    if metric.call in snapshot
+                ]
+                self.snapshot_seconds.set(time.monotonic() - start)
+            return self.families + self.self_families()
+
+    def self_families(self) -> list:
+        families = [
+            *self.rpc_seconds.collect(),
+            *self.rpc_batch_size.collect(),
+            *self.rpc_errors.collect(),
+            *self.snapshot_seconds.collect(),
+        ]
+        if self.snapshot_wall_time is not None:
+            families.append(
+                GaugeMetricFamily(
+                    "bitcoin_exporter_snapshot_age_seconds",
+                    "Seconds since the served results were fetched from bitcoind",
+                    value=time.time() - self.snapshot_wall_time,
+                )
+            )
+        return families
+
+    def describe(self):
+        # Lets the registry check metric names without making RPC calls
+        for metric in self.metrics:
+            yield GaugeMetricFamily(metric.name, metric.help)
+
+    def collect(self):
+        yield from self.cached_families()
+
+
+class Target:
+    """A tank found by discovery, polled through its own persistent RPC connection"""
+
+    def __init__(self, pod: dict):
+        labels = pod["metadata"].get("labels", {})
+        annotations = pod["metadata"].get("annotations", {})
+        self.name = pod["metadata"]["name"]
+        self.url = (
+            f"http://user:{labels['rpcpassword']}@{pod['status']['podIP']}:{labels['RPCPort']}"
+        )
+        self.definitions = (
+            annotations.get("metrics", METRICS),
+            annotations.get("metricsConfig", ""),
+            annotations.get("builtinMetrics", "false").lower() in ("1", "true", "yes"),
+            annotations.get("metricsBatch", "true").lower() in ("1", "true", "yes"),
+        )
+        self.collector = RPCCollector(
+            AuthServiceProxy(service_url=self.url, timeout=RPC_TIMEOUT),
+            load_metrics(*self.definitions[:3], verbose=False),
+            batch=self.definitions[3],
+        )
+
+    def same(self, other: "Target") -> bool:
+        return (self.url, self.definitions) == (other.url, other.definitions)
+
+
+def discover_pods(selector: str) -> list[dict]:
+    """Running pods in our namespace matching a label selector, from the Kubernetes API"""
+    with open(f"{SERVICE_ACCOUNT}/namespace") as f:
+        namespace = f.read().strip()
+    with open(f"{SERVICE_ACCOUNT}/token") as f:
+        token = f.read().strip()
+    host = os.environ["KUBERNETES_SERVICE_HOST"]
+    port = os.environ.get("KUBERNETES_SERVICE_PORT", "443")
+    request = urllib.request.Request(
+        f"https://{host}:{port}/api/v1/namespaces/{namespace}/pods"
+        f"?labelSelector={urllib.parse.quote(selector)}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    context = ssl.create_default_context(cafile=f"{SERVICE_ACCOUNT}/ca.crt")
+    with urllib.request.urlopen(request, context=context, timeout=RPC_TIMEOUT) as response:
+        pods = json.load(response)["items"]
+    return [
+        pod
+        for pod in pods
+        if pod["status"].get("phase") == "Running" and pod["status"].get("podIP")
+    ]
+
+
+class MultiTargetCollector:
+    """
+    Every discovered tank behind one endpoint: /metrics polls all of them
+    concurrently and adds a tank label, /probe?target=<tank> returns one
+    """
+
+    def __init__(self, selector: str, discover=discover_pods):
+        self.selector = selector
+        self.discover = discover
+        self.targets = {}
+        self.discovered = 0.0
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=CONCURRENCY)
+
+    def current_targets(self) -> dict[str, Target]:
+        with self.lock:
+            if time.monotonic() - self.discovered >= DISCOVERY_SECONDS:
+                try:
+                    pods = self.discover(self.selector)
+                    self.discovered = time.monotonic()
+                except Exception as e:
+                    print(f"Target discovery failed: {e}")
+                    return self.targets
+                targets = {}
+                for pod in pods:
+                    try:
+                        target = Target(pod)
+                    except (KeyError, ValueError) as e:
+                        print(f"Skipping {pod['metadata']['name']}: {e}")
+                        continue
+                    old = self.targets.get(target.name)
+                    # Keep counter state and the open connection of unchanged tanks
+                    targets[target.name] = old if old and old.same(target) else target
+                if targets.keys() != self.targets.keys():
+                    print(f"Polling {len(targets)} tanks")
+                self.targets = targets
+            return self.targets
+
+    def probe(self, name: str):
+        target = self.current_targets().get(name)
+        return target.collector if target else None
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        start = time.monotonic()
+        targets = list(self.current_targets().values())
+        results = list(self.pool.map(lambda target: target.collector.cached_families(), targets))
+        yield GaugeMetricFamily(
+            "bitcoin_exporter_scrape_seconds",
+            "Time taken to poll every tank for this scrape",
+            value=time.monotonic() - start,
+        )
+        yield GaugeMetricFamily("bitcoin_exporter_targets", "Tanks polled", value=len(targets))
+        merged = {}
+        for target, families in zip(targets, results):
+            for family in families:
+                if family.name not in merged:
+                    merged[family.name] = Family(family.name, family.documentation, family.type)
+                elif merged[family.name].type != family.type:
+                    continue
+                merged[family.name].samples += [
+                    sample._replace(labels={**sample.labels, "tank": target.name})
+                    for sample in family.samples
+                ]
+        yield from merged.values()
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def multi_target_app(collector: MultiTargetCollector):
+    def app(environ, start_response):
+        path = environ.get("PATH_INFO", "/")
+        if path == "/probe":
+            query = urllib.parse.parse_qs(environ.get("QUERY_STRING", ""))
+            probed = collector.probe(query.get("target", [""])[0])
+            if probed is None:
+                start_response("404 Not Found", [("Content-Type", "text/plain")])
+                return [b"Unknown target\n"]
+            output = generate_latest(probed)
+        elif path in ("/", "/metrics"):
+            output = generate_latest(collector)
+        else:
+            start_response("404 Not Found", [("Content-Type", "text/plain")])
+            return [b"Not found\n"]
+        start_response("200 OK", [("Content-Type", CONTENT_TYPE_LATEST)])
+        return [output]
+
+    return app
+
+
+if __name__ == "__main__":
+    if TARGETS_SELECTOR:
+        # One exporter for all tanks labelled with TARGETS_SELECTOR
+        server = make_server(
+            "",
+            METRICS_PORT,
+            multi_target_app(MultiTargetCollector(TARGETS_SELECTOR)),
+            ThreadingWSGIServer,
+            handler_class=QuietHandler,
+        )
+        print(f"Polling tanks matching {TARGETS_SELECTOR} on port {METRICS_PORT}")
+        server.serve_forever()
+
+    # Set up bitcoind RPC client
+    rpc = AuthServiceProxy(
+        service_url=f"http://{BITCOIN_RPC_USER}:{BITCOIN_RPC_PASSWORD}@{BITCOIN_RPC_HOST}:{BITCOIN_RPC_PORT}"
+    )
+    REGISTRY.register(RPCCollector(rpc, load_metrics()))
+
+    # Start the server
+    server, thread = start_http_server(METRICS_PORT)
 
+    print(f"Server: {server}")
+    print(f"Thread: {thread}")
 
-# Create closure outside the loop
-def make_metric_function(cmd):
-    try:
-        return lambda: eval(f"rpc.{cmd}")
-    except Exception:
-        return None
-
-
-def make_counting_function(cmd, key, value):
-    try:
-        return lambda: sum(1 for x in eval(f"rpc.{cmd}") if x.get(key) == value)
-    except Exception:
-        return None
-
-
-# Parse RPC queries into metrics
-commands = METRICS.split(" ")
-for labeled_cmd in commands:
-    if "=" not in labeled_cmd:
-        continue
-    label, cmd = labeled_cmd.strip().split("=")
-    # label, description i.e. ("bitcoin_conn_in", "Number of connections in")
-    metric = Gauge(label, cmd)
-    if "COUNT:" in cmd:
-        _, args = cmd.split(":")
-        cmd, key, value = args.split(",")
-        metric.set_function(make_counting_function(cmd, key, value))
-    else:
-        metric.set_function(make_metric_function(cmd))
-    print(f"Metric created: {labeled_cmd}")
-
-# Start the server
-server, thread = start_http_server(METRICS_PORT)
-
-print(f"Server: {server}")
-print(f"Thread: {thread}")
-
-# Keep alive by waiting for endless loop to end
-thread.join()
-server.shutdown()
+    # Keep alive by waiting for endless loop to end
+    thread.join()
+    server.shutdown()
@@ -0,0 +1,336 @@
+import asyncio
+import base64
+import decimal
+import functools
+import inspect
+import json
+from time import monotonic
+from typing import Any, Optional, Union
+from urllib.parse import urlparse
+
+from commander import WARNET, Commander, RPCResults
+from ln_framework.ln import CLN, INSECURE_CONTEXT, LND, RESTCall
+from test_framework.authproxy import USER_AGENT, JSONRPCException, serialization_fallback
+from test_framework.p2p import NetworkThread
+from test_framework.test_node import TestNode
+
+# Open connections to one server. bitcoind serves 4 RPC threads by default and
+# queues 16 requests, so more than this only waits longer in its queue.
+ASYNC_MAX_CONNECTIONS = 8
+ASYNC_TIMEOUT = 60
+# Coroutines run at the same time by AsyncCommander.arpc_all
+ASYNC_RPC_ALL_CONCURRENCY = 256
+
+# Raised when a server closes a keep-alive connection we were about to reuse
+STALE_CONNECTION_ERRORS = (ConnectionError, asyncio.IncompleteReadError)
+
+
+class AsyncHTTPPool:
+    """
+    HTTP/1.1 keep-alive connections to one server over asyncio streams, so
+    thousands of requests can be in flight from the network thread's event loop
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        ssl=None,
+        max_connections: int = ASYNC_MAX_CONNECTIONS,
+        timeout: float = ASYNC_TIMEOUT,
+    ):
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self.timeout = timeout
+        self.slots = asyncio.Semaphore(max_connections)
+        self.idle = []
+
+    async def request(
+        self, method: str, path: str, headers: dict, body: bytes = b"", first_line: bool = False
+    ) -> tuple[int, bytes]:
+        """
+        Status and body of a response. first_line returns as soon as the first line
+        of the body has arrived, for LND's streaming endpoints.
+        """
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        data = (head + "\r\n").encode() + body
+        async with self.slots:
+            while True:
+                reused = bool(self.idle)
+                if reused:
+                    reader, writer = self.idle.pop()
+                else:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout
+                    )
+                try:
+                    writer.write(data)
+                    await writer.drain()
+                    status, keep_alive, response = await asyncio.wait_for(
+                        self._read_response(reader, first_line), self.timeout
+                    )
+                except STALE_CONNECTION_ERRORS:
+                    writer.close()
+                    if not reused:
+                        raise
+                    continue
+                except BaseException:
+                    writer.close()
+                    raise
+                if keep_alive and not first_line:
+                    self.idle.append((reader, writer))
+                else:
+                    writer.close()
+                return status, response
+
+    @staticmethod
+    async def _read_response(reader, first_line: bool) -> tuple[int, bool, bytes]:
+        status_line = await reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+        keep_alive = headers.get("connection") != "close"
+
+        if headers.get("transfer-encoding") == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readuntil(b"\r\n")
+                    return status, keep_alive, b"".join(chunks)
+                chunks.append((await reader.readexactly(size + 2))[:-2])
+                # Earlier chunks had no newline, so only the last one needs checking
+                if first_line and b"\n" in chunks[-1]:
+                    return status, False, b"".join(chunks).split(b"\n")[0]
+        if "content-length" in headers:
+            return status, keep_alive, await reader.readexactly(int(headers["content-length"]))
+        if first_line:
+            return status, False, await reader.readline()
+        return status, False, await reader.read()
+
+
+class AsyncRPC:
+    """
+    bitcoind JSON-RPC from coroutines: await node.arpc.getblockcount(), or
+    await node.arpc.call("getblock", blockhash, 2)
+    """
+
+    def __init__(
+        self, url: str, timeout: float = ASYNC_TIMEOUT, pool: Optional[AsyncHTTPPool] = None
+    ):
+        self.url = urlparse(url)
+        self.pool = pool or AsyncHTTPPool(self.url.hostname, self.url.port, timeout=timeout)
+        auth = base64.b64encode(f"{self.url.username}:{self.url.password}".encode()).decode()
+        self.headers = {
+            "User-Agent": USER_AGENT,
+            "Authorization": f"Basic {auth}",
+            "Content-Type": "application/json",
+        }
+        self.id_count = 0
+
+    def wallet(self, name: str) -> "AsyncRPC":
+        """Client for a wallet endpoint, sharing this client's connections"""
+        return AsyncRPC(
+            self.url._replace(path=f"/wallet/{name}").geturl(), self.pool.timeout, self.pool
+        )
+
+    def request(self, method: str, *params) -> dict:
+        self.id_count += 1
+        return {"jsonrpc": "2.0", "method": method, "params": params, "id": self.id_count}
+
+    async def post(self, payload):
+        body = json.dumps(payload, default=serialization_fallback).encode()
+        status, response = await self.pool.request("POST", self.url.path or "/", self.headers, body)
+        if not response:
+            raise JSONRPCException(
+                {"code": -342, "message": "missing HTTP response from server"}, status
+            )
+        return json.loads(response, parse_float=decimal.Decimal)
+
+    async def call(self, method: str, *params):
+        response = await self.post(self.request(method, *params))
+        if response.get("error") is not None:
+            raise JSONRPCException(response["error"])
+        return response["result"]
+
+    async def batch(self, calls: list[tuple]) -> list:
+        """Results of (method, *params) calls sent as one JSON-RPC batch"""
+        requests = [self.request(*call) for call in calls]
+        responses = {response["id"]: response for response in await self.post(requests)}
+        results = []
+        for request in requests:
+            response = responses[request["id"]]
+            if response.get("error") is not None:
+                raise JSONRPCException(response["error"])
+            results.append(response["result"])
+        return results
+
+    def __getattr__(self, method: str):
+        if method.startswith("_"):
+            raise AttributeError(method)
+        return functools.partial(self.call, method)
+
+
+class AsyncLN:
+    """
+    REST calls to a lightning node from coroutines, with the node's credentials.
+    Requests and response decoding come from the node's synchronous client.
+    """
+
+    def __init__(self, node, port: int):
+        self.node = node
+        self.name = node.name
+        self.pool = AsyncHTTPPool(f"{node.name}.{node.namespace}", port, ssl=INSECURE_CONTEXT)
+
+    def headers(self) -> dict:
+        return {"Content-Type": "application/json"}
+
+    async def call(self, rest: RESTCall):
+        body = b"" if rest.method == "GET" else json.dumps(rest.data or {}).encode()
+        _, response = await self.pool.request(
+            rest.method, rest.uri, self.headers(), body, first_line=rest.first_line
+        )
+        return rest.decode(json.loads(response))
+
+    async def uri(self) -> str:
+        return await self.call(self.node.uri_call())
+
+    async def walletbalance(self) -> int:
+        return await self.call(self.node.walletbalance_call())
+
+    async def connect(self, target_uri: str) -> dict:
+        return await self.call(self.node.connect_call(target_uri))
+
+
+class AsyncLND(AsyncLN):
+    def __init__(self, node: LND):
+        super().__init__(node, 8080)
+
+    def headers(self) -> dict:
+        return {**super().headers(), "Grpc-Metadata-macaroon": self.node.admin_macaroon_hex}
+
+    async def newaddress(self) -> str:
+        return await self.call(LND.newaddress_call())
+
+    async def channelbalance(self) -> int:
+        return await self.call(LND.channelbalance_call())
+
+    async def channel(self, pk: str, capacity: int, push_amt: int, fee_rate: int) -> dict:
+        return await self.call(LND.channel_call(pk, capacity, push_amt, fee_rate))
+
+    async def update(
+        self, txid_hex: str, policy: dict, capacity: int, output_index: int = 0
+    ) -> dict:
+        return await self.call(LND.update_call(txid_hex, policy, capacity, output_index))
+
+    async def graph(self) -> dict:
+        return await self.call(LND.graph_call())
+
+
+class AsyncCLN(AsyncLN):
+    def __init__(self, node: CLN):
+        super().__init__(node, 3010)
+
+    def headers(self) -> dict:
+        return {**super().headers(), "Rune": self.node.headers["Rune"]}
+
+    async def call(self, rest: RESTCall):
+        if "Rune" not in self.node.headers:
+            # createrune() polls with blocking sleeps, so keep it off the event loop
+            await asyncio.to_thread(self.node.createrune)
+        return await super().call(rest)
+
+
+def run_on_network_thread(run_test):
+    """A blocking run_test() running the coroutine on the network thread's event loop"""
+
+    @functools.wraps(run_test)
+    def blocking_run_test(self):
+        loop = NetworkThread.network_event_loop
+        return asyncio.run_coroutine_threadsafe(run_test(self), loop).result()
+
+    return blocking_run_test
+
+
+class AsyncCommander(Commander):
+    """
+    Commander for scenarios written as `async def run_test(self)`. The coroutine
+    runs on the event loop of the existing network thread, next to any P2P
+    connections, so thousands of RPC and REST calls can be in flight at once
+    without a thread each. Every tank gets an AsyncRPC client as node.arpc and
+    every lightning node an async REST client in self.alns.
+
+    Synchronous RPCs and sleep() block the event loop: use the async clients,
+    asyncio.sleep(), and asyncio.to_thread() for anything else that blocks.
+    """
+
+    # required by subclasses of BitcoinTestFramework
+    def set_test_params(self):
+        pass
+
+    def run_test(self):
+        pass
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if inspect.iscoroutinefunction(cls.__dict__.get("run_test")):
+            cls.run_test = run_on_network_thread(cls.__dict__["run_test"])
+
+    def setup(self):
+        super().setup()
+        for node, tank in zip(self.nodes, WARNET["tanks"]):
+            node.arpc = AsyncRPC(
+                f"http://{tank['rpc_user']}:{tank['rpc_password']}@{tank['rpc_host']}:{tank['rpc_port']}",
+                timeout=self.rpc_timeout,
+            )
+        self.alns: dict[str, AsyncLN] = {
+            ln.name: AsyncLND(ln) if ln.impl == "lnd" else AsyncCLN(ln) for ln in self.ln_nodes
+        }
+
+    async def arpc_all(
+        self,
+        method: Union[str, list[tuple]],
+        *args,
+        nodes: Optional[list[TestNode]] = None,
+        concurrency: int = ASYNC_RPC_ALL_CONCURRENCY,
+        timeout: Optional[float] = None,
+    ) -> RPCResults:
+        """
+        Coroutine version of Commander.rpc_all: the same call (or list of
+        (method, *args) calls, as one batch) on many tanks, at most concurrency at a time.
+        The timeout applies to each call once it is sent, not while it waits for a slot.
+        """
+        nodes = self.nodes if nodes is None else nodes
+        label = method if isinstance(method, str) else ", ".join(call[0] for call in method)
+        limit = asyncio.Semaphore(concurrency)
+
+        async def call(node) -> tuple[Any, float]:
+            async with limit:
+                start = monotonic()
+                if isinstance(method, str):
+                    request = node.arpc.call(method, *args)
+                else:
+                    request = node.arpc.batch(method)
+                result = await asyncio.wait_for(request, timeout)
+                return result, monotonic() - start
+
+        replies = await asyncio.gather(*(call(node) for node in nodes), return_exceptions=True)
+        outcome = RPCResults({}, {}, {})
+        for node, reply in zip(nodes, replies):
+            if isinstance(reply, asyncio.TimeoutError):
+                outcome.errors[node.tank] = TimeoutError(f"No reply to {label} within {timeout}s")
+            elif isinstance(reply, BaseException):
+                outcome.errors[node.tank] = reply
+            else:
+                outcome.results[node.tank], outcome.latency[node.tank] = reply
+
+        summary = f"{label} on {len(nodes)} tanks: {len(outcome.errors)} failed"
+        if outcome.latency:
+            slowest = max(outcome.latency, key=outcome.latency.get)
+            summary += f", slowest {slowest} {outcome.latency[slowest] * 1000:.1f} ms"
+        self.log.info(summary)
+        return outcome
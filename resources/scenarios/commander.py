@@ -1,6 +1,11 @@
 import argparse
+import asyncio
 import base64
 import configparser
+import copy
+import gzip
+import http.client
+import io
 import json
 import logging
 import os
@@ -12,12 +17,18 @@ import sys
 import tempfile
 import threading
 import types
-from time import sleep
-
-from kubernetes import client, config
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from functools import partial
+from math import ceil
+from time import monotonic, sleep
+from typing import Any, NamedTuple, Optional, Union
+
+from kubernetes import client, config, watch
 from kubernetes.stream import stream
 from ln_framework.ln import CLN, LND, LNNode, get_admin_macaroon
-from test_framework.authproxy import AuthServiceProxy
+from test_framework.authproxy import USER_AGENT, AuthServiceProxy, JSONRPCException
 from test_framework.blocktools import get_witness_script, script_BIP34_coinbase_height
 from test_framework.messages import (
     CBlock,
@@ -27,6 +38,7 @@ from test_framework.messages import (
     CTxIn,
     CTxInWitness,
     CTxOut,
+    deser_compact_size,
     from_binary,
     from_hex,
     hash256,
@@ -59,9 +71,19 @@ PSBT_SIGNET_BLOCK = (
 )
 
 NAMESPACE = None
+sclient = None
+list_pods = None
 pods = client.V1PodList(items=[])
 cmaps = client.V1ConfigMapList(items=[])
 
+# Pod IPs and LND macaroons found by a previous commander, reused while the pod
+# (by uid) keeps the same IP instead of being fetched again. The Secret is
+# created by `warnet run`; commanders may only read and update it.
+DISCOVERY_SECRET = "warnet-discovery"
+DISCOVERY_KEY = "pods.json.gz"
+POD_IP_TIMEOUT = 60
+MACAROON_WORKERS = 32
+
 try:
     # Get the in-cluster k8s client to determine what we have access to
     config.load_incluster_config()
@@ -76,71 +98,595 @@ try:
         # A wargames player with namespaced access will get a FORBIDDEN error here
         pods = sclient.list_pod_for_all_namespaces()
         cmaps = sclient.list_config_map_for_all_namespaces()
+        list_pods = sclient.list_pod_for_all_namespaces
     except Exception:
         # Just get whatever we have access to in this namespace only
         pods = sclient.list_namespaced_pod(namespace=NAMESPACE)
         cmaps = sclient.list_namespaced_config_map(namespace=NAMESPACE)
+        list_pods = partial(sclient.list_namespaced_pod, NAMESPACE)
 except Exception:
     # If there is no cluster config, the user might just be
     # running the scenario file locally with --help
     pass
 
-WARNET = {"tanks": [], "lightning": [], "channels": []}
-for pod in pods.items:
-    if "mission" not in pod.metadata.labels:
-        continue
 
-    pod_ip = pod.status.pod_ip
-    while pod_ip is None:
-        sleep(5)
-        pod = sclient.read_namespaced_pod(pod.metadata.name, pod.metadata.namespace)
+def read_discovery() -> dict:
+    """{pod uid: {"ip", "macaroon"}} published by an earlier commander in this namespace"""
+    try:
+        secret = sclient.read_namespaced_secret(DISCOVERY_SECRET, NAMESPACE)
+        return json.loads(gzip.decompress(base64.b64decode(secret.data[DISCOVERY_KEY])))
+    except Exception:
+        return {}
+
+
+def publish_discovery(discovery: dict):
+    """Best effort: without the Secret or permission to update it, skip it"""
+    data = base64.b64encode(gzip.compress(json.dumps(discovery).encode())).decode()
+    body = client.V1Secret(
+        metadata=client.V1ObjectMeta(name=DISCOVERY_SECRET, labels={"app": "warnet"}),
+        data={DISCOVERY_KEY: data},
+    )
+    try:
+        sclient.replace_namespaced_secret(DISCOVERY_SECRET, NAMESPACE, body)
+    except Exception as e:
+        print(f"Could not publish {DISCOVERY_SECRET}: {e}")
+
+
+def wait_for_pod_ips(pods) -> dict:
+    """
+    Pods by (namespace, name) once every one of them has an IP, following a single
+    watch from the list's resource version instead of polling each pod
+    """
+    ready = {(pod.metadata.namespace, pod.metadata.name): pod for pod in pods.items}
+    pending = {key for key, pod in ready.items() if pod.status.pod_ip is None}
+    resource_version = pods.metadata.resource_version
+    while pending:
+        print(f"Waiting for {len(pending)} pod IPs")
+        w = watch.Watch()
+        try:
+            for event in w.stream(
+                list_pods, resource_version=resource_version, timeout_seconds=POD_IP_TIMEOUT
+            ):
+                pod = event["object"]
+                resource_version = pod.metadata.resource_version
+                key = (pod.metadata.namespace, pod.metadata.name)
+                if key not in pending:
+                    continue
+                if event["type"] == "DELETED":
+                    del ready[key]
+                    pending.discard(key)
+                elif pod.status.pod_ip:
+                    ready[key] = pod
+                    pending.discard(key)
+                if not pending:
+                    w.stop()
+        except client.ApiException as e:
+            if e.status != 410:
+                raise
+            # Our resource version expired: start again from a fresh list
+            fresh = list_pods()
+            resource_version = fresh.metadata.resource_version
+            for pod in fresh.items:
+                key = (pod.metadata.namespace, pod.metadata.name)
+                if key in pending and pod.status.pod_ip:
+                    ready[key] = pod
+                    pending.discard(key)
+    return ready
+
+
+def discover(pods, cmaps) -> dict:
+    warnet = {"tanks": [], "lightning": [], "channels": []}
+    pods.items = [pod for pod in pods.items if "mission" in (pod.metadata.labels or {})]
+    ready = wait_for_pod_ips(pods) if pods.items else {}
+
+    cached = read_discovery() if sclient else {}
+    discovery = {}
+    macaroons = {}
+    lnd_pods = []
+    for pod in ready.values():
+        uid = pod.metadata.uid
+        discovery[uid] = {"ip": pod.status.pod_ip}
+        if pod.metadata.labels["mission"] != "lightning":
+            continue
+        if "lnd" not in pod.metadata.labels["app.kubernetes.io/name"]:
+            continue
+        entry = cached.get(uid, {})
+        if entry.get("ip") == pod.status.pod_ip and entry.get("macaroon"):
+            macaroons[uid] = entry["macaroon"]
+        else:
+            lnd_pods.append(pod)
+
+    # Old LND versions need an exec per pod to read admin.macaroon
+    with ThreadPoolExecutor(max_workers=MACAROON_WORKERS) as executor:
+        fetched = executor.map(lambda pod: get_admin_macaroon(sclient, pod), lnd_pods)
+        for pod, macaroon in zip(lnd_pods, fetched):
+            macaroons[pod.metadata.uid] = macaroon
+    for uid, macaroon in macaroons.items():
+        discovery[uid]["macaroon"] = macaroon
+
+    for pod in ready.values():
         pod_ip = pod.status.pod_ip
+        if pod.metadata.labels["mission"] == "tank":
+            warnet["tanks"].append(
+                {
+                    "tank": pod.metadata.name,
+                    "namespace": pod.metadata.namespace,
+                    "chain": pod.metadata.labels["chain"],
+                    "p2pport": int(pod.metadata.labels["P2PPort"]),
+                    "rpc_host": pod_ip,
+                    "rpc_port": int(pod.metadata.labels["RPCPort"]),
+                    "rpc_user": "user",
+                    "rpc_password": pod.metadata.labels["rpcpassword"],
+                    "zmq_block_port": int(pod.metadata.labels["ZMQBlockPort"]),
+                    "zmq_tx_port": int(pod.metadata.labels["ZMQTxPort"]),
+                    "init_peers": pod.metadata.annotations["init_peers"],
+                }
+            )
 
-    if pod.metadata.labels["mission"] == "tank":
-        WARNET["tanks"].append(
-            {
-                "tank": pod.metadata.name,
-                "namespace": pod.metadata.namespace,
-                "chain": pod.metadata.labels["chain"],
-                "p2pport": int(pod.metadata.labels["P2PPort"]),
-                "rpc_host": pod_ip,
-                "rpc_port": int(pod.metadata.labels["RPCPort"]),
-                "rpc_user": "user",
-                "rpc_password": pod.metadata.labels["rpcpassword"],
-                "init_peers": pod.metadata.annotations["init_peers"],
-            }
+        if pod.metadata.labels["mission"] == "lightning":
+            lnnode = None
+            if "lnd" in pod.metadata.labels["app.kubernetes.io/name"]:
+                lnnode = LND(
+                    pod.metadata.name,
+                    pod.metadata.namespace,
+                    pod_ip,
+                    macaroons[pod.metadata.uid],
+                )
+            if "cln" in pod.metadata.labels["app.kubernetes.io/name"]:
+                lnnode = CLN(pod.metadata.name, pod.metadata.namespace, pod_ip)
+            assert lnnode
+            warnet["lightning"].append(lnnode)
+
+    for cm in cmaps.items:
+        if not cm.metadata.labels or "channels" not in cm.metadata.labels:
+            continue
+        channel_jsons = json.loads(cm.data["channels"])
+        for channel_json in channel_jsons:
+            channel_json["source"] = cm.data["source"]
+            warnet["channels"].append(channel_json)
+
+    if sclient and discovery != cached:
+        publish_discovery(discovery)
+    return warnet
+
+
+WARNET = discover(pods, cmaps)
+
+
+# Idle keep-alive connections kept open to each RPC server
+RPC_POOL_MAX_IDLE = 8
+# A server may close an idle keep-alive connection at any time: a request that
+# fails like this on a reused connection is sent once more on a new one
+RECONNECT_ERRORS = (
+    BrokenPipeError,
+    ConnectionResetError,
+    http.client.BadStatusLine,
+    http.client.ImproperConnectionState,
+)
+
+
+class RPCConnectionPool:
+    """Keep-alive HTTP connections to one RPC server, shared by all threads"""
+
+    def __init__(self, scheme: str, host: str, port: int):
+        self.connection_class = (
+            http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
         )
+        self.host = host
+        self.port = port
+        self.lock = threading.Lock()
+        self.idle = []
+        self.created = 0
+        self.reconnects = 0
+        self.requests = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def get(self, timeout: float):
+        """A connection, with its socket timeout set to timeout, and whether it was reused"""
+        with self.lock:
+            if self.idle:
+                conn = self.idle.pop()
+                conn.timeout = timeout
+                if conn.sock:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            self.created += 1
+        return self.connection_class(self.host, self.port, timeout=timeout), False
+
+    def put(self, conn, seconds: float):
+        with self.lock:
+            self.requests += 1
+            self.seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            if len(self.idle) < RPC_POOL_MAX_IDLE:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "connections": self.created,
+                "idle": len(self.idle),
+                "reconnects": self.reconnects,
+                "requests": self.requests,
+                "mean_seconds": self.seconds / self.requests if self.requests else 0.0,
+                "max_seconds": self.max_seconds,
+            }
 
-    if pod.metadata.labels["mission"] == "lightning":
-        if "lnd" in pod.metadata.labels["app.kubernetes.io/name"]:
-            lnnode = LND(
-                pod.metadata.name,
-                pod.metadata.namespace,
-                pod_ip,
-                get_admin_macaroon(sclient, pod),
-            )
-        if "cln" in pod.metadata.labels["app.kubernetes.io/name"]:
-            lnnode = CLN(pod.metadata.name, pod.metadata.namespace, pod.status.pod_ip)
-        assert lnnode
-        WARNET["lightning"].append(lnnode)
 
-for cm in cmaps.items:
-    if not cm.metadata.labels or "channels" not in cm.metadata.labels:
-        continue
-    channel_jsons = json.loads(cm.data["channels"])
-    for channel_json in channel_jsons:
-        channel_json["source"] = cm.data["source"]
-        WARNET["channels"].append(channel_json)
+class RPCConnectionPools:
+    """
+    One pool per RPC server, used by every AuthServiceProxy in place of its single
+    connection, so wallet and method proxies derived from a node's proxy share it too
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.pools = {}
+
+    def pool(self, url) -> RPCConnectionPool:
+        port = 80 if url.port is None else url.port
+        key = (url.scheme, url.hostname, port)
+        with self.lock:
+            if key not in self.pools:
+                self.pools[key] = RPCConnectionPool(url.scheme, url.hostname, port)
+            return self.pools[key]
+
+    def stats(self) -> dict[str, dict]:
+        with self.lock:
+            pools = list(self.pools.values())
+        return {f"{pool.host}:{pool.port}": pool.stats() for pool in pools}
+
+
+rpc_pools = RPCConnectionPools()
+# Monotonic deadline of the rpc_all call running on this thread, if any
+rpc_deadline = threading.local()
+
+
+def request_timeout(self) -> float:
+    """
+    Socket timeout for the next request: the proxy's own (proxies for methods share
+    the node proxy's connection, and with it its timeout), capped by rpc_all
+    """
+    timeout = self._AuthServiceProxy__conn.timeout
+    deadline = getattr(rpc_deadline, "at", None)
+    if deadline is None:
+        return timeout
+    remaining = deadline - monotonic()
+    if remaining <= 0:
+        raise TimeoutError("rpc_all timeout expired before the request was sent")
+    return min(timeout, remaining)
+
+
+def pooled_request(self, method, path, postdata):
+    timeout = request_timeout(self)
+    if not rpc_pools.enabled:
+        # Brand new http connection for every call
+        self._set_conn()
+        self._AuthServiceProxy__conn.timeout = timeout
+        return self.unpooled_request(method, path, postdata)
+
+    url = self._AuthServiceProxy__url
+    headers = {
+        "Host": url.hostname,
+        "User-Agent": USER_AGENT,
+        "Authorization": self._AuthServiceProxy__auth_header,
+        "Content-type": "application/json",
+    }
+    pool = rpc_pools.pool(url)
+    while True:
+        conn, reused = pool.get(timeout)
+        start = monotonic()
+        # _get_response() reads the proxy's connection, which other threads may be
+        # swapping out on a shared proxy: give it a private copy
+        proxy = copy.copy(self)
+        proxy._AuthServiceProxy__conn = conn
+        try:
+            conn.request(method, path, postdata, headers)
+            response = proxy._get_response()
+        except RECONNECT_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            # The server probably restarted, so the other idle connections are stale too
+            with pool.lock:
+                pool.reconnects += 1
+                stale, pool.idle = pool.idle, []
+            for idle in stale:
+                idle.close()
+            continue
+        except BaseException:
+            conn.close()
+            raise
+        pool.put(conn, monotonic() - start)
+        return response
+
+
+AuthServiceProxy.unpooled_request = AuthServiceProxy._request
+AuthServiceProxy._request = pooled_request
+
+
+# Tanks called at the same time by Commander.rpc_all
+RPC_ALL_CONCURRENCY = 32
+
+
+# Seconds between polls of sync_blocks, sync_mempools and wait_for_tip
+SYNC_POLL_SECONDS = 0.25
+# Seconds one poll waits for a tank's reply before going on with its last one
+SYNC_POLL_TIMEOUT = 5
+# Laggards named in sync logs and errors
+SYNC_MAX_LAGGARDS = 20
+
+
+class RPCResults(NamedTuple):
+    """Outcome of Commander.rpc_all by tank name: every tank is in results or errors"""
+
+    results: dict[str, Any]
+    errors: dict[str, Exception]
+    latency: dict[str, float]
+
+
+def describe_laggards(tanks: list[str], polled: RPCResults) -> str:
+    """Tank names with what they last replied (height or mempool size) or their error"""
+    described = []
+    for tank in tanks[:SYNC_MAX_LAGGARDS]:
+        if tank in polled.errors:
+            described.append(f"{tank} ({polled.errors[tank]})")
+        elif isinstance(polled.results.get(tank), list):
+            described.append(f"{tank} (height {polled.results[tank][0]})")
+        elif tank in polled.results:
+            described.append(f"{tank} ({polled.results[tank]['size']} txs)")
+        else:
+            described.append(tank)
+    more = len(tanks) - SYNC_MAX_LAGGARDS
+    return ", ".join(described) + (f" and {more} more" if more > 0 else "")
+
+
+def merge_poll(latest: RPCResults, polled: RPCResults):
+    """Update latest with a poll, keeping the last reply of tanks that failed this time"""
+    for tank, result in polled.results.items():
+        latest.results[tank] = result
+        latest.latency[tank] = polled.latency[tank]
+        latest.errors.pop(tank, None)
+    for tank, error in polled.errors.items():
+        if tank not in latest.results:
+            latest.errors[tank] = error
+
+
+# bitcoind publishes over ZMTP 3.0 with the NULL mechanism: a SUB socket is a
+# 64 byte greeting, a READY command and one subscription message per topic
+ZMTP_GREETING = (
+    b"\xff" + bytes(8) + b"\x7f" + bytes([3, 0]) + b"NULL".ljust(20, b"\x00") + bytes(32)
+)
+ZMTP_READY = b"\x05READY\x0bSocket-Type" + (3).to_bytes(4, "big") + b"SUB"
+ZMTP_MORE = 0x01
+ZMTP_LONG = 0x02
+ZMTP_COMMAND = 0x04
+ZMQ_RECONNECT_SECONDS = 1
+# Transactions remembered by ZMQSubscriber for wait_for_tx, oldest forgotten first
+ZMQ_MAX_TXS = 100_000
+
+
+def zmtp_frame(flags: int, body: bytes) -> bytes:
+    if len(body) > 255:
+        return bytes([flags | ZMTP_LONG]) + len(body).to_bytes(8, "big") + body
+    return bytes([flags, len(body)]) + body
+
+
+async def zmtp_read_frame(reader) -> tuple[int, bytes]:
+    flags = (await reader.readexactly(1))[0]
+    size_bytes = 8 if flags & ZMTP_LONG else 1
+    size = int.from_bytes(await reader.readexactly(size_bytes), "big")
+    return flags, await reader.readexactly(size)
+
+
+async def zmtp_read_message(reader) -> list[bytes]:
+    """Frames of the next message, skipping commands like PING"""
+    message = []
+    while True:
+        flags, body = await zmtp_read_frame(reader)
+        if flags & ZMTP_COMMAND:
+            continue
+        message.append(body)
+        if not flags & ZMTP_MORE:
+            return message
+
+
+def coinbase_height(script_sig: bytes) -> int:
+    """Block height pushed first in a BIP34 coinbase scriptSig"""
+    if script_sig[0] == 0:
+        return 0
+    if 0x51 <= script_sig[0] <= 0x60:
+        return script_sig[0] - 0x50
+    return int.from_bytes(script_sig[1 : 1 + script_sig[0]], "little", signed=True)
+
+
+class ZMQSubscriber:
+    """
+    Blocks and transactions published by tanks over ZMQ. Every endpoint is read
+    by a coroutine on the network thread's event loop, and the wait_for_*
+    methods block the calling thread until enough tanks have seen an event.
+    """
+
+    def __init__(self, tanks: list[dict], log: logging.Logger, blocks: bool, txs: bool):
+        self.log = log
+        self.endpoints = []
+        for tank in tanks:
+            if blocks:
+                self.endpoints.append(
+                    (tank["tank"], tank["rpc_host"], tank["zmq_block_port"], b"rawblock")
+                )
+            if txs:
+                self.endpoints.append(
+                    (tank["tank"], tank["rpc_host"], tank["zmq_tx_port"], b"rawtx")
+                )
+        self.tanks = [tank["tank"] for tank in tanks]
+        self.block_tanks = set(self.tanks) if blocks else set()
+        self.cond = threading.Condition()
+        self.connected = set()
+        # Tank name to (height, block hash) of the last block it published
+        self.tips: dict[str, tuple[int, str]] = {}
+        # Txid to the names of tanks that published it
+        self.txs: OrderedDict[str, set[str]] = OrderedDict()
+        self.missed = 0
+        self.futures = []
+
+    def start(self, timeout: float = 10):
+        """Connect to every endpoint, waiting up to timeout for them to accept"""
+        loop = NetworkThread.network_event_loop
+        self.futures = [
+            asyncio.run_coroutine_threadsafe(self.subscribe(*endpoint), loop)
+            for endpoint in self.endpoints
+        ]
+        with self.cond:
+            self.cond.wait_for(lambda: len(self.connected) == len(self.endpoints), timeout)
+            if len(self.connected) < len(self.endpoints):
+                self.log.warning(
+                    f"ZMQ: {len(self.connected)} of {len(self.endpoints)} endpoints connected "
+                    f"after {timeout}s, still trying the rest in the background"
+                )
 
+    def stop(self):
+        for future in self.futures:
+            future.cancel()
+        if self.missed:
+            self.log.warning(f"ZMQ: {self.missed} notifications were dropped by publishers")
+
+    async def subscribe(self, tank: str, host: str, port: int, topic: bytes):
+        last_sequence = None
+        while True:
+            writer = None
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+                writer.write(ZMTP_GREETING)
+                await reader.readexactly(len(ZMTP_GREETING))
+                writer.write(zmtp_frame(ZMTP_COMMAND, ZMTP_READY))
+                writer.write(zmtp_frame(0, b"\x01" + topic))
+                await writer.drain()
+                # The publisher's READY
+                await zmtp_read_frame(reader)
+                with self.cond:
+                    self.connected.add((tank, topic))
+                    self.cond.notify_all()
+
+                while True:
+                    message = await zmtp_read_message(reader)
+                    if len(message) != 3 or message[0] != topic:
+                        continue
+                    sequence = int.from_bytes(message[2], "little")
+                    # A lower sequence means the publisher restarted and counts from 0 again
+                    if last_sequence is not None and sequence > last_sequence:
+                        self.missed += sequence - last_sequence - 1
+                    last_sequence = sequence
+                    if topic == b"rawblock":
+                        self.on_block(tank, message[1])
+                    else:
+                        self.on_tx(tank, message[1])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.log.debug(f"ZMQ {topic.decode()} from {tank}: {e}, reconnecting")
+                await asyncio.sleep(ZMQ_RECONNECT_SECONDS)
+            finally:
+                if writer:
+                    writer.close()
+
+    def on_block(self, tank: str, raw: bytes):
+        stream = io.BytesIO(raw[80:])
+        deser_compact_size(stream)
+        coinbase = CTransaction()
+        coinbase.deserialize(stream)
+        tip = (coinbase_height(coinbase.vin[0].scriptSig), hash256(raw[:80])[::-1].hex())
+        with self.cond:
+            self.tips[tank] = tip
+            self.cond.notify_all()
+
+    def on_tx(self, tank: str, raw: bytes):
+        txid = from_binary(CTransaction, raw).txid_hex
+        with self.cond:
+            if txid not in self.txs:
+                self.txs[txid] = set()
+                if len(self.txs) > ZMQ_MAX_TXS:
+                    self.txs.popitem(last=False)
+            self.txs[txid].add(tank)
+            self.cond.notify_all()
+
+    def seed_tips(self, tips: dict[str, tuple[int, str]]):
+        """Tips read over RPC, for tanks that have not published a block since connecting"""
+        with self.cond:
+            for tank, tip in tips.items():
+                self.tips.setdefault(tank, tip)
+            self.cond.notify_all()
+
+    def wait(
+        self,
+        reached,
+        what: str,
+        tanks: Optional[list[str]],
+        count: Optional[int],
+        timeout: float,
+    ):
+        tanks = self.tanks if tanks is None else tanks
+        count = len(tanks) if count is None else count
+        with self.cond:
+            if not self.cond.wait_for(lambda: sum(map(reached, tanks)) >= count, timeout):
+                laggards = [tank for tank in tanks if not reached(tank)]
+                raise AssertionError(
+                    f"{len(tanks) - len(laggards)} of {len(tanks)} tanks saw {what} within "
+                    f"{timeout}s, wanted {count}. Missing: {', '.join(laggards[:20])}"
+                    f"{' ...' if len(laggards) > 20 else ''}"
+                )
 
-# Ensure that all RPC calls are made with brand new http connections
-def auth_proxy_request(self, method, path, postdata):
-    self._set_conn()  # creates new http client connection
-    return self.oldrequest(method, path, postdata)
+    def wait_for_height(
+        self,
+        height: int,
+        tanks: Optional[list[str]] = None,
+        count: Optional[int] = None,
+        timeout: float = 60,
+    ):
+        """Wait until count (default all) of tanks have a tip at or above height"""
+        self.wait(
+            lambda tank: tank in self.tips and self.tips[tank][0] >= height,
+            f"height {height}",
+            tanks,
+            count,
+            timeout,
+        )
 
+    def wait_for_block(
+        self,
+        block_hash: str,
+        tanks: Optional[list[str]] = None,
+        count: Optional[int] = None,
+        timeout: float = 60,
+    ):
+        """Wait until block_hash is the tip of count (default all) of tanks"""
+        self.wait(
+            lambda tank: tank in self.tips and self.tips[tank][1] == block_hash,
+            f"block {block_hash}",
+            tanks,
+            count,
+            timeout,
+        )
 
-AuthServiceProxy.oldrequest = AuthServiceProxy._request
-AuthServiceProxy._request = auth_proxy_request
+    def wait_for_tx(
+        self,
+        txid: str,
+        tanks: Optional[list[str]] = None,
+        count: Optional[int] = None,
+        timeout: float = 60,
+    ):
+        """Wait until count (default all) of tanks have published txid, from their mempool or a block"""
+        self.wait(
+            lambda tank: tank in self.txs.get(txid, ()),
+            f"tx {txid}",
+            tanks,
+            count,
+            timeout,
+        )
 
 
 # Create a custom formatter
@@ -200,41 +746,323 @@ class Commander(BitcoinTestFramework):
             return base64.b64decode(b64).hex()
 
     def wait_for_tanks_connected(self):
-        def tank_connected(self, tank):
-            while True:
-                try:
-                    peers = tank.getpeerinfo()
-                    count = sum(
-                        1
-                        for peer in peers
-                        if peer.get("connection_type") == "manual" or peer.get("addnode") is True
+        waiting = list(self.nodes)
+        while waiting:
+            peerinfo = self.rpc_all("getpeerinfo", nodes=waiting)
+            for tank in list(waiting):
+                if tank.tank in peerinfo.errors:
+                    self.log.warning(
+                        f"Couldn't get peer info from {tank.tank} : {peerinfo.errors[tank.tank]}"
                     )
-                    self.log.info(f"Tank {tank.tank} connected to {count}/{tank.init_peers} peers")
-                    if count >= tank.init_peers:
-                        break
-                except Exception as e:
-                    self.log.warning(f"Couldn't get peer info from {tank.tank} : {e}")
+                    continue
+                count = sum(
+                    1
+                    for peer in peerinfo.results[tank.tank]
+                    if peer.get("connection_type") == "manual" or peer.get("addnode") is True
+                )
+                self.log.info(f"Tank {tank.tank} connected to {count}/{tank.init_peers} peers")
+                if count >= tank.init_peers:
+                    waiting.remove(tank)
+            if waiting:
                 sleep(5)
+        self.log.info("Network connected")
 
-        conn_threads = [
-            threading.Thread(target=tank_connected, args=(self, tank)) for tank in self.nodes
-        ]
-        for thread in conn_threads:
-            thread.start()
+    def rpc_all(
+        self,
+        method: Union[str, list[tuple]],
+        *args,
+        nodes: Optional[list[TestNode]] = None,
+        concurrency: int = RPC_ALL_CONCURRENCY,
+        timeout: Optional[float] = None,
+        quiet: bool = False,
+    ) -> RPCResults:
+        """
+        Call an RPC on many tanks at once (all of them by default), at most
+        concurrency at a time. method is either a method name called with args, or a
+        list of (method, *args) tuples sent to each tank as one JSON-RPC batch, whose
+        result is then the list of their results. Tanks without a reply after timeout
+        seconds get a TimeoutError, and so do tanks still busy with the call an earlier
+        rpc_all gave up on. quiet logs the summary at debug level, for polls.
+        """
+        nodes = self.nodes if nodes is None else nodes
+        label = method if isinstance(method, str) else ", ".join(call[0] for call in method)
+        limit = threading.BoundedSemaphore(concurrency)
+        deadline = None if timeout is None else monotonic() + timeout
+
+        def call(node):
+            with limit:
+                rpc_deadline.at = deadline
+                try:
+                    return call_node(node)
+                finally:
+                    rpc_deadline.at = None
+
+        def call_node(node):
+            start = monotonic()
+            if isinstance(method, str):
+                result = getattr(node, method)(*args)
+            else:
+                requests = [getattr(node, name).get_request(*params) for name, *params in method]
+                responses = {response["id"]: response for response in node.batch(requests)}
+                result = []
+                for request in requests:
+                    response = responses[request["id"]]
+                    if response.get("error") is not None:
+                        raise JSONRPCException(response["error"])
+                    result.append(response["result"])
+            return result, monotonic() - start
+
+        outcome = RPCResults({}, {}, {})
+        executor = self.rpc_executor(concurrency)
+        futures = {}
+        with self._rpc_lock:
+            for node in nodes:
+                busy = self._rpc_busy.get(node.tank)
+                if busy is not None and not busy.done():
+                    outcome.errors[node.tank] = TimeoutError(
+                        f"Still waiting for an earlier call that timed out, {label} not sent"
+                    )
+                    continue
+                futures[executor.submit(call, node)] = node.tank
+        done, _ = wait_futures(futures, timeout=timeout)
+        for future, tank in futures.items():
+            if future not in done:
+                # Queued calls never start; running ones keep their tank busy until they return
+                if not future.cancel():
+                    with self._rpc_lock:
+                        self._rpc_busy[tank] = future
+                outcome.errors[tank] = TimeoutError(f"No reply to {label} within {timeout:g}s")
+            elif future.exception() is not None:
+                outcome.errors[tank] = future.exception()
+            else:
+                outcome.results[tank], outcome.latency[tank] = future.result()
+
+        summary = f"{label} on {len(nodes)} tanks: {len(outcome.errors)} failed"
+        if outcome.latency:
+            slowest = max(outcome.latency, key=outcome.latency.get)
+            summary += f", slowest {slowest} {outcome.latency[slowest] * 1000:.1f} ms"
+        log = self.log.debug if quiet else self.log.info
+        log(summary)
+        for tank, latency in outcome.latency.items():
+            self.log.debug(f"{label} on {tank}: {latency * 1000:.1f} ms")
+        return outcome
+
+    def sync_blocks(
+        self,
+        nodes: Optional[list[TestNode]] = None,
+        wait: float = SYNC_POLL_SECONDS,
+        timeout: float = 60,
+        quorum: float = 1.0,
+    ):
+        """
+        Wait until a quorum (a fraction, default all) of nodes share the highest tip
+        any of them has, polling their height and best block hash concurrently
+        """
+        self.sync_tips(self.nodes if nodes is None else nodes, None, wait, timeout, quorum)
+
+    def wait_for_tip(
+        self,
+        block_hash: str,
+        nodes: Optional[list[TestNode]] = None,
+        wait: float = SYNC_POLL_SECONDS,
+        timeout: float = 60,
+        quorum: float = 1.0,
+    ):
+        """
+        Wait until block_hash is the tip of a quorum (a fraction, default all) of
+        nodes. Follows a ZMQ subscription to their blocks if there is one.
+        """
+        nodes = self.nodes if nodes is None else nodes
+        tanks = [node.tank for node in nodes]
+        for subscriber in self.zmq_subscribers:
+            if set(tanks) <= subscriber.block_tanks:
+                return subscriber.wait_for_block(
+                    block_hash,
+                    tanks=tanks,
+                    count=ceil(len(tanks) * quorum),
+                    timeout=timeout * self.options.timeout_factor,
+                )
+        self.sync_tips(nodes, block_hash, wait, timeout, quorum)
+
+    def sync_tips(
+        self,
+        nodes: list[TestNode],
+        block_hash: Optional[str],
+        wait: float,
+        timeout: float,
+        quorum: float,
+    ):
+        need = ceil(len(nodes) * quorum)
+        timeout *= self.options.timeout_factor
+        stop_time = monotonic() + timeout
+        tips = RPCResults({}, {}, {})
+        while True:
+            merge_poll(
+                tips,
+                self.rpc_all(
+                    [("getblockcount",), ("getbestblockhash",)],
+                    nodes=nodes,
+                    timeout=self.sync_poll_timeout(stop_time, wait),
+                    quiet=True,
+                ),
+            )
+            target = block_hash
+            if target is None and tips.results:
+                best = max(height for height, _ in tips.results.values())
+                target = Counter(
+                    tip for height, tip in tips.results.values() if height == best
+                ).most_common(1)[0][0]
+            behind = [
+                node.tank for node in nodes if tips.results.get(node.tank, (0, ""))[1] != target
+            ]
+            if len(nodes) - len(behind) >= need:
+                if behind:
+                    self.log.warning(
+                        f"Tip {target} not reached by {describe_laggards(behind, tips)}"
+                    )
+                return
+            if monotonic() > stop_time:
+                raise AssertionError(
+                    f"Block sync timed out after {timeout}s: {len(nodes) - len(behind)} of "
+                    f"{len(nodes)} tanks at {target}, wanted {need}. "
+                    f"Behind: {describe_laggards(behind, tips)}"
+                )
+            sleep(wait)
+
+    def sync_mempools(
+        self,
+        nodes: Optional[list[TestNode]] = None,
+        wait: float = SYNC_POLL_SECONDS,
+        timeout: float = 60,
+        flush_scheduler: bool = True,
+        quorum: float = 1.0,
+    ):
+        """
+        Wait until a quorum (a fraction, default all) of nodes have the same
+        transactions in their mempools. Mempool sizes are polled concurrently, and
+        txids are only fetched from the nodes whose sizes agree.
+        """
+        nodes = self.nodes if nodes is None else nodes
+        need = ceil(len(nodes) * quorum)
+        timeout *= self.options.timeout_factor
+        stop_time = monotonic() + timeout
+        sizes = RPCResults({}, {}, {})
+        pools = RPCResults({}, {}, {})
+        while True:
+            merge_poll(
+                sizes,
+                self.rpc_all(
+                    "getmempoolinfo",
+                    nodes=nodes,
+                    timeout=self.sync_poll_timeout(stop_time, wait),
+                    quiet=True,
+                ),
+            )
+            counts = Counter(info["size"] for info in sizes.results.values())
+            size = counts.most_common(1)[0][0] if counts else None
+            agreeing = [
+                node for node in nodes if sizes.results.get(node.tank, {}).get("size") == size
+            ]
+            compared = len(agreeing) >= need
+            if compared:
+                merge_poll(
+                    pools,
+                    self.rpc_all(
+                        "getrawmempool",
+                        nodes=agreeing,
+                        timeout=self.sync_poll_timeout(stop_time, wait),
+                        quiet=True,
+                    ),
+                )
+                txids = {
+                    node.tank: frozenset(pools.results[node.tank])
+                    for node in agreeing
+                    if node.tank in pools.results
+                }
+                pool = Counter(txids.values()).most_common(1)[0][0] if txids else None
+                agreeing = [node for node in agreeing if txids.get(node.tank) == pool]
+            agreeing_tanks = {node.tank for node in agreeing}
+            behind = [node.tank for node in nodes if node.tank not in agreeing_tanks]
+            if compared and len(agreeing) >= need:
+                if flush_scheduler:
+                    self.rpc_all("syncwithvalidationinterfacequeue", nodes=agreeing, quiet=True)
+                if behind:
+                    self.log.warning(f"Mempool not synced on {describe_laggards(behind, sizes)}")
+                return
+            if monotonic() > stop_time:
+                raise AssertionError(
+                    f"Mempool sync timed out after {timeout}s: {len(agreeing)} of {len(nodes)} "
+                    f"tanks agree, wanted {need}. Behind: {describe_laggards(behind, sizes)}"
+                )
+            sleep(wait)
 
-        all(thread.join() is None for thread in conn_threads)
-        self.log.info("Network connected")
+    @staticmethod
+    def sync_poll_timeout(stop_time: float, wait: float) -> float:
+        """
+        Time one sync poll gives every tank to reply, so a hung tank only delays
+        its own entry and the others can still reach a quorum before stop_time
+        """
+        return min(max(stop_time - monotonic(), wait), max(SYNC_POLL_TIMEOUT, 4 * wait))
+
+    def sync_all(self, nodes: Optional[list[TestNode]] = None, quorum: float = 1.0):
+        self.sync_blocks(nodes, quorum=quorum)
+        self.sync_mempools(nodes, quorum=quorum)
+
+    def rpc_executor(self, workers: int) -> ThreadPoolExecutor:
+        """Thread pool shared by rpc_all calls, grown to the largest concurrency used"""
+        with self._rpc_lock:
+            if self._rpc_workers < workers:
+                if self._rpc_executor:
+                    self._rpc_executor.shutdown(wait=False)
+                self._rpc_executor = ThreadPoolExecutor(max_workers=workers)
+                self._rpc_workers = workers
+            return self._rpc_executor
+
+    def zmq_subscribe(
+        self, nodes: Optional[list[TestNode]] = None, blocks: bool = True, txs: bool = False
+    ) -> ZMQSubscriber:
+        """
+        Follow the rawblock (and with txs, rawtx) notifications of nodes (default
+        all) until the scenario ends. Block tips start from getbestblockhash.
+        """
+        nodes = self.nodes if nodes is None else nodes
+        tanks = {tank["tank"]: tank for tank in WARNET["tanks"]}
+        subscriber = ZMQSubscriber([tanks[node.tank] for node in nodes], self.log, blocks, txs)
+        subscriber.start()
+        self.zmq_subscribers.append(subscriber)
+        if blocks:
+            tips = self.rpc_all([("getblockcount",), ("getbestblockhash",)], nodes=nodes)
+            subscriber.seed_tips({tank: tuple(tip) for tank, tip in tips.results.items()})
+        return subscriber
 
     def handle_sigterm(self, signum, frame):
         print("SIGTERM received, stopping...")
         self.shutdown()
         sys.exit(0)
 
+    def shutdown(self):
+        for subscriber in self.zmq_subscribers:
+            subscriber.stop()
+        if self._rpc_executor:
+            self._rpc_executor.shutdown(wait=False)
+        stats = rpc_pools.stats().values()
+        requests = sum(pool["requests"] for pool in stats)
+        if requests:
+            self.log.info(
+                f"RPC: {requests} requests to {len(stats)} servers over "
+                f"{sum(pool['connections'] for pool in stats)} connections "
+                f"({sum(pool['reconnects'] for pool in stats)} reconnects), "
+                f"mean {sum(pool['mean_seconds'] * pool['requests'] for pool in stats) / requests * 1000:.1f} ms, "
+                f"max {max(pool['max_seconds'] for pool in stats) * 1000:.1f} ms"
+            )
+        return super().shutdown()
+
     # The following functions are chopped-up hacks of
     # the original methods from BitcoinTestFramework
 
     def setup(self):
         signal.signal(signal.SIGTERM, self.handle_sigterm)
+        rpc_pools.enabled = self.options.rpc_pool
 
         # hacked from _start_logging()
         # Scenarios will log plain messages to stdout only, which will can redirected by warnet
@@ -249,6 +1077,13 @@ class Commander(BitcoinTestFramework):
         ch.setFormatter(ColorFormatter())
         self.log.addHandler(ch)
 
+        self._rpc_executor = None
+        self._rpc_workers = 0
+        # Guards the executor and the tanks whose timed out rpc_all calls still run
+        self._rpc_lock = threading.Lock()
+        self._rpc_busy: dict[str, Future] = {}
+        self.zmq_subscribers: list[ZMQSubscriber] = []
+
         # Keep a separate index of tanks by pod name
         self.tanks: dict[str, TestNode] = {}
         self.lns: dict[str, LNNode] = {}
@@ -468,6 +1303,13 @@ class Commander(BitcoinTestFramework):
             action="store_true",
             help="use BIP324 v2 connections between all nodes by default",
         )
+        parser.add_argument(
+            "--no_rpc_pool",
+            dest="rpc_pool",
+            default=True,
+            action="store_false",
+            help="Open a new HTTP connection for every RPC instead of reusing keep-alive connections",
+        )
         parser.add_argument(
             "--test_methods",
             dest="test_methods",
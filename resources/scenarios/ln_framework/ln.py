@@ -6,6 +6,7 @@ import re
 import ssl
 from abc import ABC, abstractmethod
 from time import sleep
+from typing import Any, Callable, NamedTuple, Optional
 
 import requests
 from kubernetes.stream import stream
@@ -67,6 +68,17 @@ class Policy:
             htlc_maximum_msat=int(policy.get("max_htlc_msat")),
         )
 
+    @staticmethod
+    def dict_from_lnd_describegraph(policy: dict) -> dict:
+        """Same as from_lnd_describegraph(policy).to_dict() without building a Policy"""
+        return {
+            "cltv_expiry_delta": int(policy.get("time_lock_delta")),
+            "htlc_minimum_msat": int(policy.get("min_htlc")),
+            "fee_base_msat": int(policy.get("fee_base_msat")),
+            "fee_proportional_millionths": int(policy.get("fee_rate_milli_msat")),
+            "htlc_maximum_msat": int(policy.get("max_htlc_msat")),
+        }
+
     @classmethod
     def from_dict(cls, policy: dict):
         return cls(
@@ -101,6 +113,44 @@ class Policy:
         }
 
 
+class RESTCall(NamedTuple):
+    """
+    A REST request and the decoding of its JSON response, built once for both the
+    clients here and the async ones in async_commander.py
+    """
+
+    method: str
+    uri: str
+    data: Optional[dict] = None
+    decode: Callable[[Any], Any] = lambda res: res
+    # LND streams updates on some endpoints: the first line holds the result
+    first_line: bool = False
+
+
+def _lnd_address(res: dict) -> str:
+    if "address" in res:
+        return res["address"]
+    raise Exception(res)
+
+
+def _lnd_connected(res: dict) -> dict:
+    if "status" in res and "initiated" in res["status"]:
+        return {}
+    return res
+
+
+def _lnd_channel_pending(res: dict) -> dict:
+    if "result" not in res:
+        raise Exception(res)
+    res["txid"] = LNNode.b64_to_hex(res["result"]["chan_pending"]["txid"], reverse=True)
+    res["outpoint"] = f"{res['txid']}:{res['result']['chan_pending']['output_index']}"
+    return res
+
+
+def _cln_uri(res: dict) -> str:
+    return f"{res['id']}@{res['address'][0]['address']}:{res['address'][0]['port']}"
+
+
 class LNNode(ABC):
     @abstractmethod
     def __init__(self, pod_name, pod_namespace, ip_address):
@@ -232,27 +282,41 @@ class CLN(LNNode):
             return res["p2tr"]
         raise Exception(res)
 
+    def call(self, rest: RESTCall):
+        # CLN's REST API takes POST for every method
+        return rest.decode(json.loads(self.post(rest.uri, rest.data)))
+
+    @staticmethod
+    def uri_call() -> RESTCall:
+        return RESTCall("POST", "/v1/getinfo", decode=_cln_uri)
+
     def uri(self):
-        res = json.loads(self.post("/v1/getinfo"))
-        return f"{res['id']}@{res['address'][0]['address']}:{res['address'][0]['port']}"
+        return self.call(self.uri_call())
+
+    @staticmethod
+    def walletbalance_call() -> RESTCall:
+        return RESTCall(
+            "POST",
+            "/v1/listfunds",
+            decode=lambda res: int(sum(o["amount_msat"] for o in res["outputs"]) / 1000),
+        )
 
     def walletbalance(self) -> int:
-        response = self.post("/v1/listfunds")
-        res = json.loads(response)
-        return int(sum(o["amount_msat"] for o in res["outputs"]) / 1000)
+        return self.call(self.walletbalance_call())
 
     def channelbalance(self) -> int:
         response = self.post("/v1/listfunds")
         res = json.loads(response)
         return int(sum(o["our_amount_msat"] for o in res["channels"]) / 1000)
 
+    @staticmethod
+    def connect_call(target_uri) -> RESTCall:
+        return RESTCall(
+            "POST", "/v1/connect", {"id": target_uri}, lambda res: {} if "id" in res else res
+        )
+
     def connect(self, target_uri) -> dict:
-        response = self.post("/v1/connect", {"id": target_uri})
-        res = json.loads(response)
-        if "id" in res:
-            return {}
-        else:
-            return res
+        return self.call(self.connect_call(target_uri))
 
     def channel(self, pk, capacity, push_amt, fee_rate) -> dict:
         data = {
@@ -343,67 +407,78 @@ class LND(LNNode):
                 break
         return stream
 
-    def newaddress(self):
+    def call(self, rest: RESTCall):
+        if rest.method == "GET":
+            response = self.get(rest.uri)
+        else:
+            response = self.post(rest.uri, rest.data, wait_for_completion=not rest.first_line)
+        return rest.decode(json.loads(response))
+
+    @staticmethod
+    def newaddress_call() -> RESTCall:
         # Taproot signatures are a fixed length which improves
         # the accuracy of fee estimation, and therefore our
         # channel ID determinism.
-        response = self.get("/v1/newaddress?type=TAPROOT_PUBKEY")
-        res = json.loads(response)
-        if "address" in res:
-            return res["address"]
-        raise Exception(res)
+        return RESTCall("GET", "/v1/newaddress?type=TAPROOT_PUBKEY", decode=_lnd_address)
+
+    def newaddress(self):
+        return self.call(self.newaddress_call())
+
+    @staticmethod
+    def walletbalance_call() -> RESTCall:
+        return RESTCall(
+            "GET", "/v1/balance/blockchain", decode=lambda res: int(res["confirmed_balance"])
+        )
 
     def walletbalance(self) -> int:
-        res = self.get("/v1/balance/blockchain")
-        return int(json.loads(res)["confirmed_balance"])
+        return self.call(self.walletbalance_call())
+
+    @staticmethod
+    def channelbalance_call() -> RESTCall:
+        return RESTCall("GET", "/v1/balance/channels", decode=lambda res: int(res["balance"]))
 
     def channelbalance(self) -> int:
-        res = self.get("/v1/balance/channels")
-        return int(json.loads(res)["balance"])
+        return self.call(self.channelbalance_call())
+
+    @staticmethod
+    def uri_call() -> RESTCall:
+        return RESTCall("GET", "/v1/getinfo", decode=lambda res: res["uris"][0])
 
     def uri(self):
-        res = self.get("/v1/getinfo")
-        info = json.loads(res)
-        return info["uris"][0]
+        return self.call(self.uri_call())
 
-    def connect(self, target_uri):
+    @staticmethod
+    def connect_call(target_uri) -> RESTCall:
         pk, host = target_uri.split("@")
-        response = self.post("/v1/peers", data={"addr": {"pubkey": pk, "host": host}})
-        res = json.loads(response)
-        if "status" in res and "initiated" in res["status"]:
-            return {}
-        else:
-            return res
+        return RESTCall("POST", "/v1/peers", {"addr": {"pubkey": pk, "host": host}}, _lnd_connected)
+
+    def connect(self, target_uri):
+        return self.call(self.connect_call(target_uri))
+
+    @staticmethod
+    def channel_call(pk, capacity, push_amt, fee_rate) -> RESTCall:
+        data = {
+            "local_funding_amount": capacity,
+            "push_sat": push_amt,
+            "node_pubkey": LNNode.hex_to_b64(pk),
+            "sat_per_vbyte": fee_rate,
+        }
+        return RESTCall("POST", "/v1/channels/stream", data, _lnd_channel_pending, first_line=True)
 
     def channel(self, pk, capacity, push_amt, fee_rate):
-        b64_pk = self.hex_to_b64(pk)
-        response = self.post(
-            "/v1/channels/stream",
-            data={
-                "local_funding_amount": capacity,
-                "push_sat": push_amt,
-                "node_pubkey": b64_pk,
-                "sat_per_vbyte": fee_rate,
-            },
-        )
-        res = json.loads(response)
-        if "result" not in res:
-            raise Exception(res)
-        res["txid"] = self.b64_to_hex(res["result"]["chan_pending"]["txid"], reverse=True)
-        res["outpoint"] = f"{res['txid']}:{res['result']['chan_pending']['output_index']}"
-        return res
+        return self.call(self.channel_call(pk, capacity, push_amt, fee_rate))
 
-    def update(self, txid_hex: str, policy: dict, capacity: int):
+    @staticmethod
+    def update_call(txid_hex: str, policy: dict, capacity: int, output_index: int = 0) -> RESTCall:
+        # Policy objects returned by DescribeGraph have
+        # completely different labels than policy objects expected
+        # by the UpdateChannelPolicy API.
         ln_policy = Policy.from_dict(policy).to_lnd_chanpolicy(capacity)
-        data = {"chan_point": {"funding_txid_str": txid_hex, "output_index": 0}, **ln_policy}
-        res = self.post(
-            "/v1/chanpolicy",
-            # Policy objects returned by DescribeGraph have
-            # completely different labels than policy objects expected
-            # by the UpdateChannelPolicy API.
-            data=data,
-        )
-        return json.loads(res)
+        chan_point = {"funding_txid_str": txid_hex, "output_index": output_index}
+        return RESTCall("POST", "/v1/chanpolicy", {"chan_point": chan_point, **ln_policy})
+
+    def update(self, txid_hex: str, policy: dict, capacity: int, output_index: int = 0):
+        return self.call(self.update_call(txid_hex, policy, capacity, output_index))
 
     def createinvoice(self, sats, label) -> str:
         response = self.post("/v1/invoices", data={"value": sats, "memo": label})
@@ -419,9 +494,12 @@ class LND(LNNode):
         res = json.loads(response)
         return res
 
+    @staticmethod
+    def graph_call() -> RESTCall:
+        return RESTCall("GET", "/v1/graph")
+
     def graph(self):
-        res = self.get("/v1/graph")
-        return json.loads(res)
+        return self.call(self.graph_call())
 
 
 def _get_lnd_semver(pod):
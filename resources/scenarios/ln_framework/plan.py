@@ -0,0 +1,111 @@
+from math import ceil
+
+from test_framework.messages import COIN
+
+from .ln import (
+    CHANNEL_OPEN_START_HEIGHT,
+    CHANNEL_OPENS_PER_BLOCK,
+    FEE_RATE_DECREMENT,
+    MAX_FEE_RATE,
+)
+
+# A channel open spends one P2WPKH/P2TR input into a P2WSH/P2TR funding output
+# plus change, about 154 vB. Round up so LND's own fee estimate stays covered.
+CHANNEL_OPEN_VSIZE = 200
+CHANNEL_OPEN_WEIGHT = CHANNEL_OPEN_VSIZE * 4
+MAX_BLOCK_WEIGHT = 4_000_000
+COINBASE_WEIGHT_RESERVE = 4_000
+# Bitcoin Core's MAX_STANDARD_TX_WEIGHT is 400k, a P2TR output is 172 WU
+MAX_FUNDING_OUTPUTS = 1_000
+# Left in every funding UTXO so the change output of each open stays larger than
+# the channel (keeping the channel at output 0) and LND's max fee ratio is met
+FUNDING_MARGIN = 2 * COIN
+
+
+def max_opens_per_block() -> int:
+    """Channel opens that fit in one block, in weight and in the fee rate range"""
+    fee_slots = (MAX_FEE_RATE - 1) // FEE_RATE_DECREMENT
+    weight_slots = (MAX_BLOCK_WEIGHT - COINBASE_WEIGHT_RESERVE) // CHANNEL_OPEN_WEIGHT
+    return min(CHANNEL_OPENS_PER_BLOCK, fee_slots, weight_slots)
+
+
+def fee_rate_for_index(index: int) -> int:
+    """
+    Fee rate (s/vB) of the open at a 1-based position in its block. Miners order
+    transactions by fee rate, so descending rates make each channel ID deterministic.
+    """
+    return MAX_FEE_RATE - index * FEE_RATE_DECREMENT
+
+
+def plan_channel_opens(
+    channels: list[tuple[str, dict]], start_height: int = CHANNEL_OPEN_START_HEIGHT
+) -> int:
+    """
+    Pack channel opens into as few blocks as possible, writing each channel's
+    "id" ({"block", "index"}) and "fee_rate" in place. channels are (source, channel)
+    pairs and keep their relative order within every block. Returns the block count.
+
+    Channels are dealt round-robin over the blocks, grouped by source, so a source
+    opens at most ceil(its channels / blocks) channels per block and needs only that
+    many funding UTXOs: each open's change confirms with it and funds the next one.
+    """
+    blocks = max(1, ceil(len(channels) / max_opens_per_block()))
+    opens = {}
+    for source, _ in channels:
+        opens[source] = opens.get(source, 0) + 1
+    by_source = sorted(
+        range(len(channels)), key=lambda i: (-opens[channels[i][0]], channels[i][0], i)
+    )
+    block_of = [0] * len(channels)
+    for position, i in enumerate(by_source):
+        block_of[i] = position % blocks
+
+    loads = [0] * blocks
+    for i, (_, channel) in enumerate(channels):
+        block = block_of[i]
+        loads[block] += 1
+        channel["id"] = {"block": start_height + block, "index": loads[block]}
+        channel["fee_rate"] = fee_rate_for_index(loads[block])
+    return blocks
+
+
+def plan_funding(channels: list[dict]) -> dict[str, list[int]]:
+    """
+    Funding UTXOs (amounts in sats) each source needs for a plan, from channels with
+    "source", "capacity" and "id". A source gets as many equal UTXOs as it opens
+    channels in its busiest block.
+
+    LND selects the largest UTXO first, so the UTXOs drain evenly and each stays
+    within one open of the average. Sizing each to its share of all the source's
+    opens plus three of its largest opens and FUNDING_MARGIN leaves every change
+    output larger than the channel being opened.
+    """
+    per_block = {}
+    needed = {}
+    largest = {}
+    for ch in channels:
+        source = ch["source"]
+        block = ch["id"]["block"]
+        fee_rate = ch.get("fee_rate") or fee_rate_for_index(ch["id"]["index"])
+        cost = ch["capacity"] + CHANNEL_OPEN_VSIZE * fee_rate
+        per_block[(source, block)] = per_block.get((source, block), 0) + 1
+        needed[source] = needed.get(source, 0) + cost
+        largest[source] = max(largest.get(source, 0), cost)
+
+    utxos = {}
+    for (source, _), count in per_block.items():
+        utxos[source] = max(utxos.get(source, 0), count)
+    return {
+        source: [ceil(needed[source] / count) + 3 * largest[source] + FUNDING_MARGIN] * count
+        for source, count in utxos.items()
+    }
+
+
+def funding_batches(funding: dict[str, list[int]], addresses: dict[str, str]):
+    """Split (address, amount) funding outputs into standard-sized transactions"""
+    outputs = [
+        (addresses[source], amount) for source, amounts in funding.items() for amount in amounts
+    ]
+    return [
+        outputs[i : i + MAX_FUNDING_OUTPUTS] for i in range(0, len(outputs), MAX_FUNDING_OUTPUTS)
+    ]
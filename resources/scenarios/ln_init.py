@@ -6,11 +6,14 @@ from time import sleep
 from commander import Commander
 from ln_framework.ln import (
     CHANNEL_OPEN_START_HEIGHT,
-    CHANNEL_OPENS_PER_BLOCK,
-    FEE_RATE_DECREMENT,
-    MAX_FEE_RATE,
     Policy,
 )
+from ln_framework.plan import (
+    fee_rate_for_index,
+    funding_batches,
+    max_opens_per_block,
+    plan_funding,
+)
 from test_framework.address import address_to_scriptpubkey
 from test_framework.messages import (
     COIN,
@@ -118,34 +121,37 @@ class LNInit(Commander):
         # To reduce individual TX weight, consolidate all outputs before distribution
         miner.sendtoaddress(miner_addr, miner_balance - 1)
         gen(1)
-        helicopter = CTransaction()
 
-        # Provide the source LN node for each channel with a UTXO just big enough
-        # to open that channel with its capacity plus fee.
-        channel_openers = []
-        for ch in self.channels:
-            if ch["source"] not in channel_openers:
-                channel_openers.append(ch["source"])
-            addr = ln_addrs[ch["source"]]
-            # More than enough to open the channel plus fee and cover LND's "maxFeeRatio"
-            # As long as all channel capacities are < 4 BTC the change output will be
-            # larger and occupy tx output 1, leaving the actual channel open at output 0
-            sat_amt = 10 * COIN
-            helicopter.vout.append(CTxOut(sat_amt, address_to_scriptpubkey(addr)))
-        rawtx = miner.fundrawtransaction(helicopter.serialize().hex())
-        signed_tx = miner.signrawtransactionwithwallet(rawtx["hex"])["hex"]
-        txid = miner.sendrawtransaction(signed_tx)
+        # Provide each channel-opening LN node with the UTXOs its planned opens need:
+        # one per channel it opens in its busiest block, each reused through change
+        # outputs by its later opens. See ln_framework/plan.py
+        funding = plan_funding(self.channels)
+        channel_openers = list(funding.keys())
+        total = sum(sum(amounts) for amounts in funding.values())
+        if total > (miner_balance - 1) * COIN:
+            raise Exception(
+                f"Channel opens need {total / COIN} BTC but the miner only has {miner_balance}"
+            )
+        txids = []
+        for batch in funding_batches(funding, ln_addrs):
+            helicopter = CTransaction()
+            for addr, sat_amt in batch:
+                helicopter.vout.append(CTxOut(sat_amt, address_to_scriptpubkey(addr)))
+            rawtx = miner.fundrawtransaction(helicopter.serialize().hex())
+            signed_tx = miner.signrawtransactionwithwallet(rawtx["hex"])["hex"]
+            txids.append(miner.sendrawtransaction(signed_tx))
         # confirm funds in last block before channel opens
         gen(1)
 
-        txstats = miner.gettransaction(txid)
-        self.log.info(
-            "Funds distribution from miner:\n  "
-            + f"txid: {txid}\n  "
-            + f"# outputs: {len(txstats['details'])}\n  "
-            + f"total amount: {txstats['amount']}\n  "
-            + f"remaining miner balance: {miner.getbalance()}"
-        )
+        for txid in txids:
+            txstats = miner.gettransaction(txid)
+            self.log.info(
+                "Funds distribution from miner:\n  "
+                + f"txid: {txid}\n  "
+                + f"# outputs: {len(txstats['details'])}\n  "
+                + f"total amount: {txstats['amount']}"
+            )
+        self.log.info(f"Remaining miner balance: {miner.getbalance()}")
 
         self.log.info("Waiting for funds to be spendable by channel-openers")
 
@@ -264,6 +270,8 @@ class LNInit(Commander):
         # CHANNELS
         ##
         self.log.info("Opening lightning channels...")
+        # Funding transactions reach the miner's mempool as rawtx notifications
+        mempool = self.zmq_subscribe(nodes=[mining_tank], blocks=False, txs=True)
         # Sort the channels by assigned block and index
         # so their channel ids are deterministic
         ch_by_block = {}
@@ -314,16 +322,15 @@ class LNInit(Commander):
                         sleep(5)
 
             channels = sorted(ch_by_block[target_block], key=lambda ch: ch["id"]["index"])
-            if len(channels) > CHANNEL_OPENS_PER_BLOCK:
+            if len(channels) > max_opens_per_block():
                 raise Exception(
-                    f"Too many channels in block {target_block}: {len(channels)} / Maximum: {CHANNEL_OPENS_PER_BLOCK}"
+                    f"Too many channels in block {target_block}: {len(channels)} / Maximum: {max_opens_per_block()}"
                 )
             index = 0
-            fee_rate = MAX_FEE_RATE
             ch_threads = []
             for ch in channels:
                 index += 1  # noqa
-                fee_rate -= FEE_RATE_DECREMENT
+                fee_rate = ch.get("fee_rate", fee_rate_for_index(index))
                 assert index == ch["id"]["index"], "Channel ID indexes are not consecutive"
                 assert fee_rate >= 1, "Too many TXs in block, out of fee range"
                 t = threading.Thread(target=open_channel, args=(self, ch, fee_rate))
@@ -338,10 +345,16 @@ class LNInit(Commander):
                     raise Exception("Channel determinism ruined, abort!")
 
             self.log.info(f"Waiting for {len(channels)} channel opens in mempool...")
-            self.wait_until(
-                lambda channels=channels: self.nodes[0].getmempoolinfo()["size"] >= len(channels),
-                timeout=500,
-            )
+            txids = {ch["txid"] for ch in channels}
+            try:
+                for txid in txids:
+                    mempool.wait_for_tx(txid, timeout=60)
+            except AssertionError as e:
+                # A notification can be lost on reconnect, the mempool is authoritative
+                self.log.warning(f"ZMQ: {e}, polling the miner's mempool instead")
+                self.wait_until(
+                    lambda txids=txids: txids <= set(mining_tank.getrawmempool()), timeout=500
+                )
             block_hash = gen(1)[0]
             self.log.info(f"Confirmed {len(channels)} channel opens in block {target_block}")
             self.log.info("Checking deterministic channel IDs in block...")
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+# The base class exists inside the commander container
+try:
+    from async_commander import AsyncCommander
+except Exception:
+    from resources.scenarios.async_commander import AsyncCommander
+
+
+class AsyncTips(AsyncCommander):
+    def set_test_params(self):
+        self.num_nodes = 1
+
+    def add_options(self, parser):
+        parser.description = "Fetch the chain tip of every node concurrently from coroutines"
+        parser.usage = "warnet run /path/to/async_tips.py"
+
+    async def run_test(self):
+        tips = await self.arpc_all([("getblockcount",), ("getbestblockhash",)])
+        assert not tips.errors, f"RPC failed on {list(tips.errors)}"
+
+        headers = await asyncio.gather(
+            *(node.arpc.getblockheader(tips.results[node.tank][1]) for node in self.nodes)
+        )
+        for node, header in zip(self.nodes, headers):
+            height = tips.results[node.tank][0]
+            assert header["height"] == height, (
+                f"{node.tank} tip height {header['height']} != {height}"
+            )
+            self.log.info(f"{node.tank} tip {height} {header['hash']}")
+
+
+def main():
+    AsyncTips("").main()
+
+
+if __name__ == "__main__":
+    main()
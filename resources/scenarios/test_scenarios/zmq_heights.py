@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+# The base class exists inside the commander container
+try:
+    from commander import (
+        ZMTP_COMMAND,
+        ZMTP_MORE,
+        Commander,
+        coinbase_height,
+        zmtp_frame,
+        zmtp_read_message,
+    )
+except Exception:
+    from resources.scenarios.commander import (
+        ZMTP_COMMAND,
+        ZMTP_MORE,
+        Commander,
+        coinbase_height,
+        zmtp_frame,
+        zmtp_read_message,
+    )
+
+from test_framework.blocktools import script_BIP34_coinbase_height
+
+# OP_0, OP_1..OP_16, and pushes of 1 to 4 bytes including sign-bit boundaries
+HEIGHTS = [0, 1, 16, 17, 127, 128, 255, 256, 300, 32767, 32768, 70000, 8388607, 8388608]
+
+
+class ZMQHeights(Commander):
+    def set_test_params(self):
+        self.num_nodes = 1
+
+    def add_options(self, parser):
+        parser.description = "Mine a block and follow it to every node over ZMQ"
+        parser.usage = "warnet run /path/to/zmq_heights.py"
+
+    def check_framing(self):
+        self.log.info("Checking ZMTP frames")
+        short, long = b"x" * 255, b"y" * 256
+        assert zmtp_frame(0, short)[:2] == bytes([0, 255])
+        assert zmtp_frame(0, long)[:9] == b"\x02" + (256).to_bytes(8, "big")
+
+        async def read(data: bytes) -> list[list[bytes]]:
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            return [await zmtp_read_message(reader), await zmtp_read_message(reader)]
+
+        # A PING command between the frames of a message is skipped
+        data = (
+            zmtp_frame(ZMTP_MORE, b"rawblock")
+            + zmtp_frame(ZMTP_COMMAND, b"\x04PING")
+            + zmtp_frame(ZMTP_MORE, long)
+            + zmtp_frame(0, (7).to_bytes(4, "little"))
+            + zmtp_frame(0, short)
+        )
+        messages = asyncio.run(read(data))
+        assert messages == [[b"rawblock", long, (7).to_bytes(4, "little")], [short]], messages
+
+    def check_coinbase_heights(self):
+        self.log.info("Checking BIP34 coinbase heights")
+        for height in HEIGHTS:
+            script_sig = bytes(script_BIP34_coinbase_height(height))
+            parsed = coinbase_height(script_sig)
+            assert parsed == height, f"{script_sig.hex()} parsed as {parsed}, not {height}"
+
+    def run_test(self):
+        self.check_framing()
+        self.check_coinbase_heights()
+
+        subscriber = self.zmq_subscribe()
+        node = self.nodes[0]
+        wallet = self.ensure_miner(node)
+        block_hash = self.generatetoaddress(
+            node, 1, wallet.getnewaddress("bech32"), sync_fun=self.no_op
+        )[0]
+        height = node.getblockheader(block_hash)["height"]
+        self.log.info(f"Mined block {block_hash} at height {height} on {node.tank}")
+
+        subscriber.wait_for_block(block_hash, tanks=[node.tank])
+        subscriber.wait_for_height(height)
+        self.log.info(f"All {len(self.nodes)} tanks published height {height} over ZMQ")
+
+
+def main():
+    ZMQHeights("").main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import re
+import sys
+from collections.abc import Hashable, Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import click
+import yaml
+from rich.console import Console
+from rich.table import Table
+from urllib3.exceptions import MaxRetryError
+
+from .bitcoin import parse_duration
+from .constants import BITCOINCORE_CONTAINER, NETWORK_FILE, TANK_MISSION
+from .k8s import get_addnodes, get_mission, pod_log
+
+# Lines logged by bitcoind (with logtimemicros=1) the first time a node sees a block or tx
+PROPAGATION_EVENTS = re.compile(
+    r"^(?P<time>\S+) .*?(?:"
+    r"UpdateTip: new best=(?P<tip>[0-9a-f]{64}) height=(?P<tip_height>\d+)"
+    r"|Saw new (?:cmpctblock )?header hash=(?P<header>[0-9a-f]{64}) height=(?P<header_height>\d+)"
+    r"|AcceptToMemoryPool: peer=\d+: accepted (?P<tx>[0-9a-f]{64})"
+    r"|Submitting wtx (?P<wallet_tx>[0-9a-f]{64}) to mempool"
+    r")"
+)
+
+# Cheap substring checks so the regex only runs on candidate lines
+PROPAGATION_MARKERS = (b"UpdateTip", b"Saw new", b"AcceptToMemoryPool", b"Submitting wtx")
+
+BLOCK = "block"
+TX = "tx"
+
+
+@click.group(name="analyze")
+def analyze():
+    """Analyze the behaviour of a running network"""
+
+
+@analyze.command()
+@click.option(
+    "--network",
+    "network_dir",
+    type=click.Path(exists=True, file_okay=False),
+    default=None,
+    help="Network directory to read the topology from instead of the running tanks",
+)
+@click.option(
+    "--since",
+    type=str,
+    default=None,
+    callback=parse_duration,
+    help="Only analyze log lines newer than a relative duration like 90s, 15m, 2h or 1d",
+)
+@click.option("--top", type=int, default=10, show_default=True, help="Rows shown per table")
+@click.option("--concurrency", type=int, default=20, show_default=True, help="Logs read at once")
+def propagation(network_dir: Optional[str], since: Optional[int], top: int, concurrency: int):
+    """
+    Measure block and transaction propagation delays from tank debug logs
+
+    For every block and tx, the first time each node saw it is compared with
+    the first time any node saw it. Relay paths are inferred from the topology:
+    each node is assumed to have received an item from whichever of its peers
+    saw it first.
+    """
+    console = Console()
+    try:
+        tanks = get_mission(TANK_MISSION)
+    except MaxRetryError as e:
+        print(f"{e}")
+        sys.exit(1)
+    if not tanks:
+        console.print("[bold red]No active tanks found.[/bold red]")
+        return
+
+    # Tanks are (namespace, name), shown without the namespace when there is only one
+    namespaces = {tank.metadata.namespace for tank in tanks}
+
+    def label(node) -> str:
+        if isinstance(node, str):
+            return node
+        return node[1] if len(namespaces) == 1 else f"{node[1]}.{node[0]}"
+
+    # {kind: {item: {tank: first seen}}} and {block hash: height}
+    first_seen = {BLOCK: {}, TX: {}}
+    heights = {}
+    mempool_logged = False
+    with (
+        console.status(f"[bold yellow]Reading logs from {len(tanks)} tanks...[/bold yellow]"),
+        ThreadPoolExecutor(max_workers=concurrency) as executor,
+    ):
+        futures = {executor.submit(_read_events, tank, since): tank for tank in tanks}
+        for future in as_completed(futures):
+            tank = futures[future]
+            node = (tank.metadata.namespace, tank.metadata.name)
+            try:
+                events, tank_heights, tank_mempool_logged = future.result()
+            except Exception as e:
+                console.print(f"[red]{label(node)}: {e}[/red]")
+                continue
+            heights.update(tank_heights)
+            mempool_logged |= tank_mempool_logged
+            for kind, items in events.items():
+                for item, seen in items.items():
+                    first_seen[kind].setdefault(item, {})[node] = seen
+
+    if not mempool_logged:
+        console.print(
+            "[yellow]No tank logged AcceptToMemoryPool, so transactions relayed between "
+            "tanks can't be timed. Add debug=mempool to their bitcoin.conf.[/yellow]"
+        )
+
+    if network_dir:
+        peers = _peers_from_network(Path(network_dir), namespaces)
+    else:
+        peers = _peers_from_tanks(namespaces)
+
+    for kind, title in [(BLOCK, "Block"), (TX, "Transaction")]:
+        items = first_seen[kind]
+        if not items:
+            console.print(f"No {title.lower()} propagation events found.")
+            continue
+        stats = [_item_stats(item, seen) for item, seen in items.items()]
+        delays = sorted(d for stat in stats for d in stat["delays"])
+        slowest = sorted(stats, key=lambda stat: stat["max"], reverse=True)[:top]
+        console.print(
+            f"\n[bold cyan]{title} propagation[/bold cyan] across {len(items)} {kind}s: "
+            f"per-node delay p50 {_ms(_percentile(delays, 50))} "
+            f"p90 {_ms(_percentile(delays, 90))} max {_ms(delays[-1] if delays else None)}"
+        )
+
+        table = Table(title=f"Slowest {kind}s", show_header=True, header_style="bold magenta")
+        table.add_column(title, style="green")
+        if kind == BLOCK:
+            table.add_column("Height", justify="right")
+        table.add_column("Origin", style="cyan")
+        table.add_column("Nodes", justify="right")
+        table.add_column("p50", justify="right")
+        table.add_column("p90", justify="right")
+        table.add_column("Max", justify="right", style="yellow")
+        for stat in slowest:
+            row = [stat["item"][:16]]
+            if kind == BLOCK:
+                row.append(str(heights.get(stat["item"], "")))
+            row += [
+                label(stat["origin"]),
+                str(len(first_seen[kind][stat["item"]])),
+                _ms(stat["p50"]),
+                _ms(stat["p90"]),
+                _ms(stat["max"]),
+            ]
+            table.add_row(*row)
+        console.print(table)
+
+        table = Table(
+            title=f"Slowest {kind} relay paths", show_header=True, header_style="bold magenta"
+        )
+        table.add_column(title, style="green")
+        table.add_column("Path (delay since origin)")
+        for stat in slowest:
+            item = stat["item"]
+            seen = items[item]
+            origin = min(seen.values())
+            hops = [
+                f"{label(hop)} (+{_ms(seen[hop] - origin)})" if hop in seen else label(hop)
+                for hop in _relay_path(stat["last"], seen, peers)
+            ]
+            table.add_row(item[:16], " -> ".join(hops))
+        console.print(table)
+
+
+def _read_events(tank, since: Optional[int]) -> tuple[dict, dict, bool]:
+    logs = pod_log(
+        tank.metadata.name,
+        BITCOINCORE_CONTAINER,
+        namespace=tank.metadata.namespace,
+        since_seconds=since,
+    )
+    return _parse_events(logs)
+
+
+def _parse_events(lines: Iterable[bytes]) -> tuple[dict, dict, bool]:
+    """
+    First time one tank logged each block and tx, as seconds since the epoch, the
+    heights of the blocks, and whether it logs mempool acceptance (debug=mempool)
+    """
+    events = {BLOCK: {}, TX: {}}
+    heights = {}
+    mempool_logged = False
+    for line in lines:
+        if not any(marker in line for marker in PROPAGATION_MARKERS):
+            continue
+        match = PROPAGATION_EVENTS.match(line.decode("utf-8", errors="replace"))
+        if not match:
+            continue
+        seen = _parse_time(match["time"])
+        if seen is None:
+            continue
+        block = match["tip"] or match["header"]
+        if block:
+            events[BLOCK].setdefault(block, seen)
+            heights[block] = int(match["tip_height"] or match["header_height"])
+        else:
+            mempool_logged |= match["tx"] is not None
+            events[TX].setdefault(match["tx"] or match["wallet_tx"], seen)
+    return events, heights, mempool_logged
+
+
+def _parse_time(timestamp: str) -> Optional[float]:
+    for fmt in ("%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ"):
+        try:
+            return datetime.strptime(timestamp, fmt).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def _item_stats(item: str, seen: dict[str, float]) -> dict:
+    origin = min(seen, key=seen.get)
+    last = max(seen, key=seen.get)
+    delays = sorted(t - seen[origin] for node, t in seen.items() if node != origin)
+    return {
+        "item": item,
+        "origin": origin,
+        "last": last,
+        "delays": delays,
+        "p50": _percentile(delays, 50),
+        "p90": _percentile(delays, 90),
+        "max": delays[-1] if delays else 0.0,
+    }
+
+
+def _relay_path(node: Hashable, seen: dict, peers: dict) -> list:
+    """Walk back from node to the origin, each hop being the peer that saw the item first"""
+    path = [node]
+    while True:
+        earlier = [
+            peer
+            for peer in peers.get(path[-1], ())
+            if peer in seen and seen[peer] < seen[path[-1]] and peer not in path
+        ]
+        if not earlier:
+            break
+        path.append(min(earlier, key=seen.get))
+    if seen.get(path[-1]) != min(seen.values()):
+        path.append("?")
+    return path[::-1]
+
+
+def _peers_from_network(directory: Path, namespaces: set[str]) -> dict[tuple, set]:
+    """The network file's topology, as deployed in each of the namespaces"""
+    with (directory / NETWORK_FILE).open() as f:
+        network_file = yaml.safe_load(f)
+    addnodes = {node["name"]: node.get("addnode", []) for node in network_file["nodes"]}
+    peers = {}
+    for namespace in namespaces:
+        peers.update(_undirected(namespace, addnodes))
+    return peers
+
+
+def _peers_from_tanks(namespaces: set[str]) -> dict[tuple, set]:
+    peers = {}
+    for namespace in namespaces:
+        for node, node_peers in _undirected(namespace, get_addnodes(namespace)).items():
+            peers.setdefault(node, set()).update(node_peers)
+    return peers
+
+
+def _undirected(namespace: str, addnodes: dict[str, list[str]]) -> dict[tuple, set]:
+    """Peers of every (namespace, name) from the addnode targets of tanks in one namespace"""
+    peers = {}
+    for name, targets in addnodes.items():
+        for target in targets:
+            # addnode may be "tank-0001", "tank-0001:18444" or "tank-0001.namespace.svc"
+            host = target.split(":")[0].split(".")
+            peer = (host[1] if len(host) > 1 else namespace, host[0])
+            peers.setdefault((namespace, name), set()).add(peer)
+            peers.setdefault(peer, set()).add((namespace, name))
+    return peers
+
+
+def _percentile(values: list[float], percent: int) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    rank = max(0, -(-len(values) * percent // 100) - 1)
+    return values[rank]
+
+
+def _ms(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.0f}ms"
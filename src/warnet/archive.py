@@ -0,0 +1,293 @@
+import gzip
+import heapq
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from itertools import groupby
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Optional
+
+import click
+
+from .constants import (
+    BITCOINCORE_CONTAINER,
+    COMMANDER_CONTAINER,
+    COMMANDER_MISSION,
+    TANK_MISSION,
+)
+from .k8s import get_pods, pod_log
+
+ARCHIVE_DIR = "./warnet-logs"
+ARCHIVE_INDEX_FILE = "index.json"
+# Pulls ask the log API for this many extra seconds to absorb clock skew between
+# the local machine and the cluster. Lines already archived are dropped by cursor.
+ARCHIVE_SINCE_MARGIN = 60
+# Segments are keyed by timestamp prefix: "YYYY-MM-DDTHH" is one segment per hour
+SEGMENT_KEY_LEN = 13
+# Category indexed for lines bitcoind prints without one, like UpdateTip
+UNCATEGORIZED = "uncategorized"
+# Below this many segments, starting worker processes costs more than the search
+QUERY_POOL_MIN_SEGMENTS = 16
+# RFC3339 timestamp split into date and time (seconds optional), fraction and offset
+TIMESTAMP_RE = re.compile(
+    r"(\d{4}-\d\d-\d\dT\d\d:\d\d(?::\d\d)?)(?:\.(\d{1,9}))?(Z|[+-]\d\d:?\d\d)$"
+)
+
+ARCHIVED_MISSIONS = {
+    TANK_MISSION: BITCOINCORE_CONTAINER,
+    COMMANDER_MISSION: COMMANDER_CONTAINER,
+}
+
+
+@click.command()
+@click.option(
+    "--dir",
+    "archive_dir",
+    type=click.Path(file_okay=False),
+    default=ARCHIVE_DIR,
+    show_default=True,
+    help="Directory holding the log archive",
+)
+@click.option("--concurrency", type=int, default=10, show_default=True, help="Pods to pull at once")
+def archive(archive_dir: str, concurrency: int):
+    """Pull tank and commander logs into a local, compressed archive.
+
+    Only lines newer than the previous pull are downloaded. Logs are stored
+    gzipped per pod and per hour, alongside an index of time ranges and
+    bitcoind log categories used by `warnet logs query`.
+    """
+    root = Path(archive_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    index = load_index(root)
+
+    pods = [
+        pod
+        for pod in get_pods()
+        if pod.metadata.labels and pod.metadata.labels.get("mission") in ARCHIVED_MISSIONS
+    ]
+    if not pods:
+        click.secho("No tank or commander pods found.", fg="yellow")
+        return
+
+    lines = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {}
+        for pod in pods:
+            key = f"{pod.metadata.namespace}/{pod.metadata.name}"
+            futures[executor.submit(_archive_pod, root, pod, index.get(key, {}))] = key
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                entry, added = future.result()
+            except Exception as e:
+                click.secho(f"Failed to archive {key}: {e}", fg="red")
+                continue
+            index[key] = entry
+            lines += added
+            click.echo(f"Archived {added:>8} lines from {key}")
+
+    save_index(root, index)
+    click.secho(f"Archived {lines} new lines from {len(pods)} pods in {root}", fg="green")
+
+
+@click.command()
+@click.argument("pattern", type=str, required=True)
+@click.option(
+    "--dir",
+    "archive_dir",
+    type=click.Path(exists=True, file_okay=False),
+    default=ARCHIVE_DIR,
+    show_default=True,
+    help="Directory holding the log archive",
+)
+@click.option("--start", type=str, default=None, help="Earliest timestamp, e.g. 2024-10-01T12:00")
+@click.option("--end", type=str, default=None, help="Timestamp to stop before (exclusive)")
+@click.option(
+    "--category",
+    type=str,
+    default=None,
+    help=f"bitcoind log category, e.g. net, or {UNCATEGORIZED} for lines without one",
+)
+@click.option("--pod", "pods", type=str, multiple=True, help="Only search these pods")
+def query(
+    pattern: str,
+    archive_dir: str,
+    start: Optional[str],
+    end: Optional[str],
+    category: Optional[str],
+    pods: tuple[str],
+):
+    """
+    Search archived logs using regex <pattern>, merged in timestamp order
+
+    The index is used to skip every segment outside [--start, --end) or
+    without any lines in --category before anything is decompressed.
+    --category matches the "[category]" tag bitcoind prints, so lines logged
+    without a tag (like UpdateTip) are only found under "uncategorized".
+    """
+    try:
+        regex = re.compile(pattern)
+    except re.error as e:
+        raise click.BadParameter(f"Invalid pattern '{pattern}': {e}") from e
+
+    root = Path(archive_dir)
+    index = load_index(root)
+    start = _normalize_timestamp(start.replace(" ", "T")) if start else None
+    end = _normalize_timestamp(end.replace(" ", "T")) if end else None
+
+    searches = []
+    for key, entry in index.items():
+        namespace, pod_name = key.split("/", 1)
+        if pods and pod_name not in pods:
+            continue
+        for segment, meta in entry.get("segments", {}).items():
+            if start and meta["end"] < start:
+                continue
+            if end and meta["start"] >= end:
+                continue
+            if category and not _segment_has_category(meta, category):
+                continue
+            path = root / namespace / pod_name / f"{segment}.log.gz"
+            searches.append((str(path), regex.pattern, category, start, end, key))
+
+    if not searches:
+        click.echo("No archived segments match the query.")
+        return
+
+    if len(searches) < QUERY_POOL_MIN_SEGMENTS:
+        results = [_search_segment(search) for search in searches]
+    else:
+        with Pool() as pool:
+            results = pool.map(_search_segment, searches)
+
+    # Each segment's matches are already in time order
+    for timestamp, key, line in heapq.merge(*results):
+        namespace, pod_name = key.split("/", 1)
+        click.echo(f"{pod_name} {namespace} {line[len(timestamp) + 1 :]}")
+
+
+def load_index(root: Path) -> dict:
+    index_path = root / ARCHIVE_INDEX_FILE
+    if not index_path.exists():
+        return {}
+    with open(index_path) as f:
+        return json.load(f)
+
+
+def save_index(root: Path, index: dict):
+    with tempfile.NamedTemporaryFile("w", dir=root, delete=False) as temp_file:
+        json.dump(index, temp_file)
+    os.replace(temp_file.name, root / ARCHIVE_INDEX_FILE)
+
+
+def _archive_pod(root: Path, pod, entry: dict) -> tuple[dict, int]:
+    """Append the lines logged since the pod's cursor to its segments and update its index"""
+    name = pod.metadata.name
+    namespace = pod.metadata.namespace
+    cursor = entry.get("cursor")
+    segments = entry.setdefault("segments", {})
+
+    since = None
+    if cursor:
+        last = datetime.strptime(cursor[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+        since = int((datetime.now(timezone.utc) - last).total_seconds()) + ARCHIVE_SINCE_MARGIN
+        since = max(since, 1)
+
+    logs = pod_log(
+        name,
+        ARCHIVED_MISSIONS[pod.metadata.labels["mission"]],
+        namespace=namespace,
+        since_seconds=since,
+        timestamps=True,
+    )
+
+    def new_lines():
+        for raw in logs:
+            timestamp, _, message = raw.decode("utf-8", errors="replace").rstrip().partition(" ")
+            timestamp = _normalize_timestamp(timestamp)
+            if not cursor or timestamp > cursor:
+                yield timestamp, message
+
+    pod_dir = root / namespace / name
+    pod_dir.mkdir(parents=True, exist_ok=True)
+    added = 0
+    for segment, lines in groupby(new_lines(), key=lambda line: line[0][:SEGMENT_KEY_LEN]):
+        # gzip members can be concatenated, so appending keeps older pulls intact
+        with gzip.open(pod_dir / f"{segment}.log.gz", "at", encoding="utf-8") as f:
+            meta = segments.get(segment)
+            for timestamp, message in lines:
+                if meta is None:
+                    meta = segments[segment] = {
+                        "start": timestamp,
+                        "end": timestamp,
+                        "lines": 0,
+                        "categories": {},
+                    }
+                f.write(f"{timestamp} {message}\n")
+                meta["end"] = timestamp
+                meta["lines"] += 1
+                for category in _categories(message):
+                    meta["categories"][category] = meta["categories"].get(category, 0) + 1
+                entry["cursor"] = timestamp
+                added += 1
+
+    return entry, added
+
+
+def _search_segment(search: tuple) -> list[tuple[str, str, str]]:
+    path, pattern, category, start, end, key = search
+    regex = re.compile(pattern)
+    matches = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            timestamp, _, message = line.rstrip("\n").partition(" ")
+            if start and timestamp < start:
+                continue
+            if end and timestamp >= end:
+                break
+            if category and category not in _categories(message):
+                continue
+            if regex.search(message):
+                matches.append((timestamp, key, line.rstrip("\n")))
+    return matches
+
+
+def _categories(message: str) -> list[str]:
+    """Categories bitcoind prints as "[net]" or "[net:debug]" after its own timestamp"""
+    categories = []
+    for token in message.split(" ", 3)[1:3]:
+        if token.startswith("[") and token.endswith("]"):
+            categories.append(token[1:-1].split(":", 1)[0])
+        else:
+            break
+    return categories or [UNCATEGORIZED]
+
+
+def _segment_has_category(meta: dict, category: str) -> bool:
+    if category in meta["categories"]:
+        return True
+    # Segments indexed before UNCATEGORIZED was counted: every line has at least
+    # one category now, so fewer category counts than lines means untagged lines
+    return category == UNCATEGORIZED and meta["lines"] > sum(meta["categories"].values())
+
+
+def _normalize_timestamp(timestamp: str) -> str:
+    """Convert an RFC3339 timestamp to UTC with nanosecond fractional seconds
+
+    so timestamps compare as strings. Timestamps without an offset are already
+    taken as UTC and left alone, so prefixes like 2024-10-01T12 still work.
+    """
+    match = TIMESTAMP_RE.match(timestamp)
+    if not match:
+        return timestamp
+    seconds, fraction, offset = match.groups()
+    # Log API timestamps are all in this form, so only parse the others
+    if offset != "Z" or len(seconds) < len("YYYY-MM-DDTHH:MM:SS"):
+        offset = "+00:00" if offset == "Z" else f"{offset[:3]}:{offset[-2:]}"
+        parsed = datetime.fromisoformat(seconds + offset)
+        seconds = parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+    return f"{seconds}.{fraction or '':0<9}Z"
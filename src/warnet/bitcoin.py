@@ -1,21 +1,39 @@
+import heapq
 import json
-import os
 import re
 import shlex
+import subprocess
 import sys
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from io import BytesIO
-from typing import Optional
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from typing import BinaryIO, Optional
 
 import click
 from test_framework.messages import ser_uint256
 from test_framework.p2p import MESSAGEMAP
 from urllib3.exceptions import MaxRetryError
 
-from .constants import BITCOINCORE_CONTAINER
-from .k8s import get_default_namespace_or, get_mission, pod_log
+from .capture import (
+    CAPTURE_FORMATS,
+    CaptureDataset,
+    capture_tank,
+    read_into,
+    skip,
+    write_dataset,
+)
+from .constants import BITCOINCORE_CONTAINER, TANK_MISSION
+from .k8s import get_default_namespace_or, get_mission, get_service_ips, pod_log
 from .process import run_command
 
+# Matches buffered per tank by grep-logs before its reader blocks
+GREP_QUEUE_SIZE = 1000
+
 
 @click.group(name="bitcoin")
 def bitcoin():
@@ -88,13 +106,43 @@ def debug_log(tank: str, namespace: Optional[str]):
         print(f"{e}")
 
 
+def parse_duration(ctx, param, value) -> Optional[int]:
+    """Click callback converting a relative duration like 90s, 15m, 2h or 1d to seconds"""
+    if value is None:
+        return None
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    match = re.fullmatch(r"(\d+)([smhd]?)", value.strip())
+    if not match:
+        raise click.BadParameter(f"'{value}' is not a duration like 90s, 15m, 2h or 1d")
+    return int(match.group(1)) * units[match.group(2) or "s"]
+
+
 @bitcoin.command()
 @click.argument("pattern", type=str, required=True)
 @click.option("--show-k8s-timestamps", is_flag=True, default=False, show_default=True)
 @click.option("--no-sort", is_flag=True, default=False, show_default=True)
-def grep_logs(pattern: str, show_k8s_timestamps: bool, no_sort: bool):
+@click.option(
+    "--since",
+    type=str,
+    default=None,
+    callback=parse_duration,
+    help="Only search log lines newer than a relative duration like 90s, 15m, 2h or 1d",
+)
+@click.option(
+    "--tail", type=int, default=None, help="Only search the last N lines of each tank's log"
+)
+def grep_logs(
+    pattern: str,
+    show_k8s_timestamps: bool,
+    no_sort: bool,
+    since: Optional[int],
+    tail: Optional[int],
+):
     """
     Grep combined bitcoind logs using regex <pattern>
+
+    Tank logs are read concurrently and matches are printed as they arrive,
+    merged in bitcoind timestamp order unless --no-sort is given.
     """
 
     try:
@@ -103,59 +151,119 @@ def grep_logs(pattern: str, show_k8s_timestamps: bool, no_sort: bool):
         print(f"{e}")
         sys.exit(1)
 
-    matching_logs = []
-    longest_namespace_len = 0
+    try:
+        regex = re.compile(pattern)
+    except re.error as e:
+        print(f"Invalid pattern '{pattern}': {e}")
+        sys.exit(1)
 
-    for tank in tanks:
-        if len(tank.metadata.namespace) > longest_namespace_len:
-            longest_namespace_len = len(tank.metadata.namespace)
+    longest_namespace_len = max((len(tank.metadata.namespace) for tank in tanks), default=0)
 
-        pod_name = tank.metadata.name
-        logs = pod_log(pod_name, BITCOINCORE_CONTAINER)
+    # Every tank gets its own reader thread. With --no-sort they share one bounded queue,
+    # otherwise each tank has its own so memory use is capped at GREP_QUEUE_SIZE matches
+    # per tank no matter how large the logs are.
+    shared = Queue(maxsize=GREP_QUEUE_SIZE) if no_sort else None
+    queues = []
+    for tank in tanks:
+        matches = shared or Queue(maxsize=GREP_QUEUE_SIZE)
+        Thread(
+            target=_grep_pod_log,
+            args=(tank, regex, matches, since, tail, show_k8s_timestamps),
+            daemon=True,
+        ).start()
+        queues.append(matches)
+
+    if no_sort:
+        merged = _drain(shared, readers=len(tanks))
+    else:
+        # Each tank's log is already in time order, so a k-way merge on the bitcoind
+        # timestamp yields a globally sorted stream without buffering every match.
+        merged = heapq.merge(
+            *[_drain(matches) for matches in queues],
+            key=lambda match: _bitcoin_timestamp(match[0], show_k8s_timestamps),
+        )
 
-        if logs is not False:
+    try:
+        for log_entry, namespace, pod_name in merged:
             try:
-                for line in logs:
-                    log_entry = line.decode("utf-8").rstrip()
-                    if re.search(pattern, log_entry):
-                        matching_logs.append((log_entry, tank.metadata.namespace, pod_name))
-            except Exception as e:
-                print(e)
-            except KeyboardInterrupt:
-                print("Interrupted streaming log!")
+                if show_k8s_timestamps:
+                    # Kubernetes timestamp, Bitcoin timestamp, and the rest of the log
+                    k8s_timestamp, bitcoin_timestamp, log_message = log_entry.split(" ", 2)
+                    print(
+                        f"{pod_name} {namespace:<{longest_namespace_len}} {k8s_timestamp} {bitcoin_timestamp} {log_message}"
+                    )
+                else:
+                    bitcoin_timestamp, log_message = log_entry.split(" ", 1)
+                    print(
+                        f"{pod_name} {namespace:<{longest_namespace_len}} {bitcoin_timestamp} {log_message}"
+                    )
+            except ValueError:
+                # If we can't parse the timestamps, just print the original log entry
+                print(f"{pod_name}: {log_entry}")
+    except KeyboardInterrupt:
+        print("Interrupted streaming log!")
+
+
+def _grep_pod_log(
+    tank, regex: re.Pattern, matches: Queue, since: Optional[int], tail: Optional[int], timestamps
+):
+    """Stream one tank's log, queueing matching lines followed by a None sentinel"""
+    try:
+        logs = pod_log(
+            tank.metadata.name,
+            BITCOINCORE_CONTAINER,
+            namespace=tank.metadata.namespace,
+            tail_lines=tail,
+            since_seconds=since,
+            timestamps=timestamps,
+        )
+        for line in logs:
+            log_entry = line.decode("utf-8", errors="replace").rstrip()
+            if regex.search(log_entry):
+                matches.put((log_entry, tank.metadata.namespace, tank.metadata.name))
+    except Exception as e:
+        print(f"{tank.metadata.name}: {e}")
+    finally:
+        matches.put(None)
 
-    # Sort logs if needed
-    if not no_sort:
-        matching_logs.sort(key=lambda x: x[0])
 
-    # Print matching logs
-    for log_entry, namespace, pod_name in matching_logs:
-        try:
-            # Split the log entry into Kubernetes timestamp, Bitcoin timestamp, and the rest of the log
-            k8s_timestamp, rest = log_entry.split(" ", 1)
-            bitcoin_timestamp, log_message = rest.split(" ", 1)
-
-            # Format the output based on the show_k8s_timestamps option
-            if show_k8s_timestamps:
-                print(
-                    f"{pod_name} {namespace:<{longest_namespace_len}} {k8s_timestamp} {bitcoin_timestamp} {log_message}"
-                )
-            else:
-                print(
-                    f"{pod_name} {namespace:<{longest_namespace_len}} {bitcoin_timestamp} {log_message}"
-                )
-        except ValueError:
-            # If we can't parse the timestamps, just print the original log entry
-            print(f"{pod_name}: {log_entry}")
+def _drain(matches: Queue, readers: int = 1):
+    """Yield queued matches until every reader feeding the queue has finished"""
+    while readers:
+        match = matches.get()
+        if match is None:
+            readers -= 1
+        else:
+            yield match
+
 
-    return matching_logs
+def _bitcoin_timestamp(log_entry: str, k8s_timestamps: bool) -> str:
+    # ISO 8601 timestamps with a fixed precision sort correctly as strings
+    fields = log_entry.split(" ", 2)
+    if k8s_timestamps and len(fields) > 1:
+        return fields[1]
+    return fields[0]
 
 
 @bitcoin.command()
 @click.argument("tank_a", type=str, required=True)
 @click.argument("tank_b", type=str, required=True)
 @click.option("--chain", default="regtest", show_default=True)
-def messages(tank_a: str, tank_b: str, chain: str):
+@click.option(
+    "--type",
+    "msgtypes",
+    type=str,
+    multiple=True,
+    help="Only show these message types, e.g. --type inv --type tx or --type inv,tx",
+)
+@click.option(
+    "--since",
+    type=str,
+    default=None,
+    callback=parse_duration,
+    help="Only show messages newer than a relative duration like 90s, 15m, 2h or 1d",
+)
+def messages(tank_a: str, tank_b: str, chain: str, msgtypes: tuple[str], since: Optional[int]):
     """
     Fetch messages sent between <tank_a pod name> and <tank_b pod name> in [chain]
 
@@ -180,6 +288,8 @@ def messages(tank_a: str, tank_b: str, chain: str):
 
     tank_a, namespace_a = parse_name_and_namespace(tank_a)
     tank_b, namespace_b = parse_name_and_namespace(tank_b)
+    msgtypes = {t.strip() for types in msgtypes for t in types.split(",") if t.strip()}
+    since_us = int((time.time() - since) * 1e6) if since else None
 
     try:
         namespace_a = get_default_namespace_or(namespace_a)
@@ -187,17 +297,19 @@ def messages(tank_a: str, tank_b: str, chain: str):
 
         # Get the messages
         messages = get_messages(
-            tank_a, tank_b, chain, namespace_a=namespace_a, namespace_b=namespace_b
+            tank_a,
+            tank_b,
+            chain,
+            namespace_a=namespace_a,
+            namespace_b=namespace_b,
+            msgtypes=msgtypes,
+            since=since_us,
         )
 
-        if not messages:
-            print(
-                f"No messages found between {tank_a} ({namespace_a}) and {tank_b} ({namespace_b})"
-            )
-            return
-
-        # Process and print messages
+        # Process and print messages as they are parsed
+        found = False
         for message in messages:
+            found = True
             if not (message.get("time") and isinstance(message["time"], (int, float))):
                 continue
 
@@ -214,17 +326,105 @@ def messages(tank_a: str, tank_b: str, chain: str):
             body_str = ", ".join(f"{key}: {value}" for key, value in body_dict.items())
             print(f"{timestamp} {direction} {msgtype} {body_str}")
 
+        if not found:
+            print(
+                f"No messages found between {tank_a} ({namespace_a}) and {tank_b} ({namespace_b})"
+            )
+
     except Exception as e:
         print(f"Error fetching messages between nodes {tank_a} and {tank_b}: {e}")
 
 
-def get_messages(tank_a: str, tank_b: str, chain: str, namespace_a: str, namespace_b: str):
+@bitcoin.command()
+@click.argument("output", type=click.Path(dir_okay=False), required=True)
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(CAPTURE_FORMATS),
+    default="auto",
+    show_default=True,
+    help="auto writes Parquet if pyarrow is installed, otherwise a NumPy .npz archive",
+)
+@click.option("--concurrency", type=int, default=10, show_default=True, help="Tanks read at once")
+def export_messages(output: str, fmt: str, concurrency: int):
+    """
+    Export message capture metadata from every tank into one columnar dataset
+
+    Each row is one captured message: time (microseconds), src, dst, direction
+    (as seen by the capturing tank), msgtype and size. Message bodies are
+    skipped. Peers that are not tanks keep their raw address.
+    """
+    try:
+        tanks = get_mission(TANK_MISSION)
+    except MaxRetryError as e:
+        print(f"{e}")
+        sys.exit(1)
+    if not tanks:
+        print("No active tanks found.")
+        return
+
+    namespaces = {tank.metadata.namespace for tank in tanks}
+
+    def tank_name(name: str, namespace: str) -> str:
+        return name if len(namespaces) == 1 else f"{name}.{namespace}"
+
+    # Capture directories are named after peer IPs: resolve both pod and service IPs
+    peer_names = {}
+    for namespace in namespaces:
+        for ip, name in get_service_ips(namespace).items():
+            peer_names[ip] = tank_name(name, namespace)
+    for tank in tanks:
+        if tank.status.pod_ip:
+            peer_names[tank.status.pod_ip] = tank_name(tank.metadata.name, tank.metadata.namespace)
+
+    dataset = CaptureDataset()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(
+                capture_tank,
+                tank,
+                dataset,
+                peer_names,
+                tank_name(tank.metadata.name, tank.metadata.namespace),
+            ): tank
+            for tank in tanks
+        }
+        for future in as_completed(futures):
+            name = futures[future].metadata.name
+            try:
+                print(f"Read {future.result():>8} messages from {name}")
+            except Exception as e:
+                print(f"Error reading message capture from {name}: {e}")
+
+    if not len(dataset):
+        print("No captured messages found")
+        return
+
+    try:
+        path = write_dataset(dataset, Path(output), fmt)
+    except ImportError as e:
+        raise click.ClickException(str(e)) from e
+    print(f"Wrote {len(dataset)} messages between {len(dataset.nodes)} nodes to {path}")
+
+
+def get_messages(
+    tank_a: str,
+    tank_b: str,
+    chain: str,
+    namespace_a: str,
+    namespace_b: str,
+    msgtypes: Optional[set[str]] = None,
+    since: Optional[int] = None,
+) -> Iterator[dict]:
     """
     Fetch messages from the message capture files.
 
     Resolves tank_b to an IP via kubectl for known pods. If that fails (e.g. for
     onion addresses or external peers), falls back to matching tank_b directly
     against message capture directory names.
+
+    Every capture file is streamed from its own concurrent `kubectl exec` and the
+    files are merged lazily by time, so memory use does not grow with file size.
     """
     subdir = "" if chain == "main" else f"{chain}/"
     base_dir = f"/root/.bitcoin/{subdir}message_capture"
@@ -250,49 +450,79 @@ def get_messages(tank_a: str, tank_b: str, chain: str, namespace_a: str, namespa
 
     dirs = run_command(cmd).splitlines()
 
-    messages = []
-
+    streams = []
     for dir_name in dirs:
         if any(ident in dir_name for ident in identifiers):
             for file, outbound in [["msgs_recv.dat", False], ["msgs_sent.dat", True]]:
                 file_path = f"{base_dir}/{dir_name}/{file}"
-                # Fetch the file contents from the container
-                cmd = f"kubectl exec {tank_a} --namespace {namespace_a} -- cat {file_path}"
-                import subprocess
+                # Start streaming the file contents from the container
+                process = subprocess.Popen(
+                    ["kubectl", "exec", tank_a, "--namespace", namespace_a, "--", "cat", file_path],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                )
+                streams.append(_parse_process_output(process, outbound, msgtypes, since))
 
-                blob = subprocess.run(
-                    cmd, shell=True, capture_output=True, executable="bash"
-                ).stdout
+    # Each capture file is written in time order
+    return heapq.merge(*streams, key=lambda x: x["time"])
 
-                # Parse the blob
-                json = parse_raw_messages(blob, outbound)
-                messages = messages + json
 
-    messages.sort(key=lambda x: x["time"])
-    return messages
+def _parse_process_output(
+    process: subprocess.Popen,
+    outbound: bool,
+    msgtypes: Optional[set[str]],
+    since: Optional[int],
+) -> Iterator[dict]:
+    try:
+        yield from parse_raw_messages(process.stdout, outbound, msgtypes, since)
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
 
 
 # This function is a hacked-up copy of process_file() from
 # Bitcoin Core contrib/message-capture/message-capture-parser.py
-def parse_raw_messages(blob: bytes, outbound: bool):
+def parse_raw_messages(
+    stream: BinaryIO,
+    outbound: bool,
+    msgtypes: Optional[set[str]] = None,
+    since: Optional[int] = None,
+) -> Iterator[dict]:
+    """
+    Lazily parse a message capture file read from a binary stream.
+
+    Headers are framed through a reused buffer and only the body of the message
+    being yielded is held in memory. Messages older than `since` (microseconds)
+    or whose type is not in `msgtypes` are skipped without being deserialized.
+    """
     TIME_SIZE = 8
     LENGTH_SIZE = 4
     MSGTYPE_SIZE = 12
+    HEADER_SIZE = TIME_SIZE + MSGTYPE_SIZE + LENGTH_SIZE
 
-    messages = []
-    offset = 0
+    header = memoryview(bytearray(HEADER_SIZE))
+    body = bytearray()
     while True:
         # Read the Header
-        header_len = TIME_SIZE + LENGTH_SIZE + MSGTYPE_SIZE
-        tmp_header_raw = blob[offset : offset + header_len]
+        if read_into(stream, header) < HEADER_SIZE:
+            break
+        time = int.from_bytes(header[:TIME_SIZE], "little")  # type: int
+        msgtype = header[TIME_SIZE : TIME_SIZE + MSGTYPE_SIZE].tobytes().split(b"\x00", 1)[0]
+        length = int.from_bytes(header[TIME_SIZE + MSGTYPE_SIZE :], "little")  # type: int
+
+        if (since and time < since) or (
+            msgtypes and msgtype.decode(errors="replace") not in msgtypes
+        ):
+            if not skip(stream, length):
+                break
+            continue
 
-        offset = offset + header_len
-        if not tmp_header_raw:
+        if len(body) < length:
+            body = bytearray(length)
+        msg_view = memoryview(body)[:length]
+        if read_into(stream, msg_view) < length:
             break
-        tmp_header = BytesIO(tmp_header_raw)
-        time = int.from_bytes(tmp_header.read(TIME_SIZE), "little")  # type: int
-        msgtype = tmp_header.read(MSGTYPE_SIZE).split(b"\x00", 1)[0]  # type: bytes
-        length = int.from_bytes(tmp_header.read(LENGTH_SIZE), "little")  # type: int
 
         # Start converting the message to a dictionary
         msg_dict = {}
@@ -300,9 +530,6 @@ def parse_raw_messages(blob: bytes, outbound: bool):
         msg_dict["time"] = time
         msg_dict["size"] = length  # "size" is less readable here, but more readable in the output
 
-        msg_ser = BytesIO(blob[offset : offset + length])
-        offset = offset + length
-
         # Determine message type
         if msgtype not in MESSAGEMAP:
             # Unrecognized message type
@@ -313,9 +540,9 @@ def parse_raw_messages(blob: bytes, outbound: bool):
                 msg_dict["msgtype"] = msgtype_tmp
             except UnicodeDecodeError:
                 msg_dict["msgtype"] = "UNREADABLE"
-            msg_dict["body"] = msg_ser.read().hex()
+            msg_dict["body"] = msg_view.hex()
             msg_dict["error"] = "Unrecognized message type."
-            messages.append(msg_dict)
+            yield msg_dict
             # print(f"WARNING - Unrecognized message type {msgtype}", file=sys.stderr)
             continue
 
@@ -324,23 +551,21 @@ def parse_raw_messages(blob: bytes, outbound: bool):
         msg_dict["msgtype"] = msgtype.decode()
 
         try:
-            msg.deserialize(msg_ser)
+            msg.deserialize(BytesIO(msg_view))
         except KeyboardInterrupt:
             raise
         except Exception:
             # Unable to deserialize message body
-            msg_ser.seek(0, os.SEEK_SET)
-            msg_dict["body"] = msg_ser.read().hex()
+            msg_dict["body"] = msg_view.hex()
             msg_dict["error"] = "Unable to deserialize message."
-            messages.append(msg_dict)
+            yield msg_dict
             # print("WARNING - Unable to deserialize message", file=sys.stderr)
             continue
 
         # Convert body of message into a jsonable object
         if length:
             msg_dict["body"] = to_jsonable(msg)
-        messages.append(msg_dict)
-    return messages
+        yield msg_dict
 
 
 def to_jsonable(obj: str):
@@ -0,0 +1,250 @@
+import os
+import struct
+import subprocess
+import tarfile
+from array import array
+from collections.abc import Iterator
+from pathlib import Path
+from threading import Lock
+from typing import BinaryIO
+
+from kubernetes.client.models import V1Pod
+
+from .constants import BITCOINCORE_CONTAINER
+
+# Message capture record header: time (us), msgtype, body length
+CAPTURE_HEADER = struct.Struct("<Q12sI")
+
+CAPTURE_FORMATS = ["auto", "parquet", "arrow", "numpy"]
+DIRECTIONS = ["recv", "sent"]
+CAPTURE_FILES = {"msgs_recv.dat": 0, "msgs_sent.dat": 1}
+
+
+class CaptureDataset:
+    """
+    Columnar message capture records for a whole network.
+
+    Columns are typed arrays. Node names and message types are dictionary
+    encoded, so a record costs about 20 bytes however long the names are.
+    Records can be added from several threads at once.
+    """
+
+    def __init__(self):
+        self.nodes: list[str] = []
+        self.msgtypes: list[str] = []
+        self._node_codes: dict[str, int] = {}
+        self._msgtype_codes: dict[str, int] = {}
+        self._lock = Lock()
+        self.time = array("q")
+        self.src = array("I")
+        self.dst = array("I")
+        self.direction = array("B")
+        self.msgtype = array("H")
+        self.size = array("I")
+
+    def __len__(self):
+        return len(self.time)
+
+    def node_code(self, name: str) -> int:
+        return self._encode(name, self.nodes, self._node_codes)
+
+    def msgtype_code(self, msgtype: str) -> int:
+        return self._encode(msgtype, self.msgtypes, self._msgtype_codes)
+
+    def _encode(self, value: str, values: list[str], codes: dict[str, int]) -> int:
+        with self._lock:
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(values)
+                values.append(value)
+            return code
+
+    def add_capture_file(self, stream: BinaryIO, capturer: str, peer: str, direction: int) -> int:
+        """Add every record of one msgs_recv.dat or msgs_sent.dat file, skipping message bodies"""
+        capturer_code = self.node_code(capturer)
+        peer_code = self.node_code(peer)
+        src, dst = (capturer_code, peer_code) if direction else (peer_code, capturer_code)
+
+        times = array("q")
+        msgtypes = array("H")
+        sizes = array("I")
+        codes = {}
+        for time, msgtype, length in read_message_headers(stream):
+            code = codes.get(msgtype)
+            if code is None:
+                code = codes[msgtype] = self.msgtype_code(
+                    msgtype.split(b"\x00", 1)[0].decode(errors="replace")
+                )
+            times.append(time)
+            msgtypes.append(code)
+            sizes.append(length)
+
+        with self._lock:
+            self.time.extend(times)
+            self.msgtype.extend(msgtypes)
+            self.size.extend(sizes)
+            self.src.extend(array("I", [src]) * len(times))
+            self.dst.extend(array("I", [dst]) * len(times))
+            self.direction.extend(array("B", [direction]) * len(times))
+        return len(times)
+
+
+def read_message_headers(stream: BinaryIO) -> Iterator[tuple[int, bytes, int]]:
+    """Yield (time, raw msgtype, length) for each record, skipping over message bodies"""
+    header = memoryview(bytearray(CAPTURE_HEADER.size))
+    while read_into(stream, header) == CAPTURE_HEADER.size:
+        time, msgtype, length = CAPTURE_HEADER.unpack_from(header)
+        yield time, msgtype, length
+        if not skip(stream, length):
+            break
+
+
+def read_into(stream: BinaryIO, view: memoryview) -> int:
+    """Fill view from stream, returning fewer bytes than its length only at EOF"""
+    read = 0
+    while read < len(view):
+        n = stream.readinto(view[read:])
+        if not n:
+            break
+        read += n
+    return read
+
+
+def skip(stream: BinaryIO, length: int) -> bool:
+    """Advance past length bytes of stream without keeping them"""
+    try:
+        seekable = stream.seekable()
+    except AttributeError:
+        # Members of a streamed tar archive can't tell
+        seekable = False
+    if seekable:
+        stream.seek(length, os.SEEK_CUR)
+        return True
+    scratch = memoryview(bytearray(min(length, 1 << 16)))
+    while length:
+        n = read_into(stream, scratch[: min(length, len(scratch))])
+        if not n:
+            return False
+        length -= n
+    return True
+
+
+def capture_tank(
+    tank: V1Pod, dataset: CaptureDataset, peer_names: dict[str, str], tank_name: str
+) -> int:
+    """
+    Stream a tank's whole message_capture directory through a single tar exec and add
+    its records to the dataset. Peers are named through peer_names, keyed by IP.
+    """
+    chain = tank.metadata.labels.get("chain", "regtest")
+    subdir = "" if chain == "main" else f"{chain}/"
+    base_dir = f"/root/.bitcoin/{subdir}message_capture"
+    process = subprocess.Popen(
+        [
+            "kubectl",
+            "exec",
+            tank.metadata.name,
+            "--namespace",
+            tank.metadata.namespace,
+            "--container",
+            BITCOINCORE_CONTAINER,
+            "--",
+            "tar",
+            "cf",
+            "-",
+            "-C",
+            base_dir,
+            ".",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    records = 0
+    try:
+        with tarfile.open(fileobj=process.stdout, mode="r|") as tar:
+            for member in tar:
+                path = Path(member.name)
+                if not member.isfile() or path.name not in CAPTURE_FILES:
+                    continue
+                # Capture directories are named after the peer address with ':' as '_'
+                peer_ip = path.parent.name.rsplit("_", 1)[0].strip("[]")
+                peer = peer_names.get(peer_ip, peer_ip)
+                records += dataset.add_capture_file(
+                    tar.extractfile(member), tank_name, peer, CAPTURE_FILES[path.name]
+                )
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+    return records
+
+
+def write_dataset(dataset: CaptureDataset, output: Path, fmt: str = "auto") -> Path:
+    """
+    Write the dataset sorted by time, as Parquet or Arrow IPC if pyarrow is installed,
+    otherwise as a compressed NumPy archive. Returns the path written.
+    """
+    if fmt in ("auto", "parquet", "arrow"):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            if fmt != "auto":
+                raise ImportError(
+                    f"Writing {fmt} requires pyarrow: pip install 'warnet[dataset]'"
+                ) from None
+        else:
+            return _write_arrow(dataset, output, "arrow" if fmt == "arrow" else "parquet", pa)
+
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError(
+            "Writing a capture dataset requires pyarrow or numpy: pip install 'warnet[dataset]'"
+        ) from None
+
+    output = output.with_suffix(".npz")
+    order = np.argsort(np.frombuffer(dataset.time, dtype=np.int64), kind="stable")
+    np.savez_compressed(
+        output,
+        time=np.frombuffer(dataset.time, dtype=np.int64)[order],
+        src=np.frombuffer(dataset.src, dtype=np.uint32)[order],
+        dst=np.frombuffer(dataset.dst, dtype=np.uint32)[order],
+        direction=np.frombuffer(dataset.direction, dtype=np.uint8)[order],
+        msgtype=np.frombuffer(dataset.msgtype, dtype=np.uint16)[order],
+        size=np.frombuffer(dataset.size, dtype=np.uint32)[order],
+        nodes=np.array(dataset.nodes),
+        msgtypes=np.array(dataset.msgtypes),
+        directions=np.array(DIRECTIONS),
+    )
+    return output
+
+
+def _write_arrow(dataset: CaptureDataset, output: Path, fmt: str, pa) -> Path:
+    def column(values: array, arrow_type):
+        return pa.Array.from_buffers(arrow_type, len(values), [None, pa.py_buffer(values)])
+
+    def dictionary(codes: array, arrow_type, names: list[str]):
+        return pa.DictionaryArray.from_arrays(column(codes, arrow_type), pa.array(names))
+
+    table = pa.table(
+        {
+            "time": column(dataset.time, pa.int64()),
+            "src": dictionary(dataset.src, pa.uint32(), dataset.nodes),
+            "dst": dictionary(dataset.dst, pa.uint32(), dataset.nodes),
+            "direction": dictionary(dataset.direction, pa.uint8(), DIRECTIONS),
+            "msgtype": dictionary(dataset.msgtype, pa.uint16(), dataset.msgtypes),
+            "size": column(dataset.size, pa.uint32()),
+        }
+    ).sort_by("time")
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        output = output.with_suffix(".parquet")
+        pq.write_table(table, output, compression="zstd")
+    else:
+        import pyarrow.feather as feather
+
+        output = output.with_suffix(".arrow")
+        feather.write_feather(table, output, compression="zstd")
+    return output
@@ -22,6 +22,8 @@ LIGHTNING_MISSION = "lightning"
 
 BITCOINCORE_CONTAINER = "bitcoincore"
 COMMANDER_CONTAINER = "commander"
+# Secret where commanders cache pod discovery, see resources/scenarios/commander.py
+DISCOVERY_SECRET = "warnet-discovery"
 
 
 class HookValue(Enum):
@@ -52,6 +54,9 @@ FORK_OBSERVER_RPCAUTH = "forkobserver:1418183465eecbd407010cf60811c6a0$d4e5f0647
 # Fork Observer config
 FORK_OBSERVER_RPC_USER = "forkobserver"
 FORK_OBSERVER_RPC_PASSWORD = "tabconf2024"
+FORK_OBSERVER_QUERY_INTERVAL = 20
+# Nodes one fork-observer instance is assumed to poll per second; larger networks are sharded
+FORK_OBSERVER_NODES_PER_SECOND = 10
 
 # Directories and files for non-python assets, e.g., helm charts, example scenarios, default configs
 SRC_DIR = files("warnet")
@@ -74,6 +79,8 @@ COMMANDER_CHART = str(CHARTS_DIR.joinpath("commander"))
 NAMESPACES_CHART_LOCATION = CHARTS_DIR.joinpath("namespaces")
 FORK_OBSERVER_CHART = str(files("resources.charts").joinpath("fork-observer"))
 CADDY_CHART = str(files("resources.charts").joinpath("caddy"))
+METRICS_CHART = str(files("resources.charts").joinpath("warnet-metrics"))
+BITCOIN_EXPORTER_CHART = str(files("resources.charts").joinpath("bitcoin-exporter"))
 CADDY_INGRESS_NAME = "caddy-ingress"
 
 DEFAULT_NAMESPACES = Path("two_namespaces_two_users")
@@ -146,6 +153,10 @@ LOGGING_HELM_COMMANDS = [
 ]
 
 
+# Tanks exporting metrics per Prometheus shard. Up to this many, the main Prometheus
+# scrapes every tank itself.
+PROMETHEUS_SHARD_SIZE = 500
+
 INGRESS_HELM_COMMANDS = [
     "helm repo add ingress-nginx https://kubernetes.github.io/ingress-nginx",
     "helm repo update",
@@ -19,11 +19,13 @@ from rich.console import Console
 from rich.prompt import Confirm, Prompt
 from rich.table import Table
 
+from .archive import archive, query
 from .constants import (
     BITCOINCORE_CONTAINER,
     COMMANDER_CHART,
     COMMANDER_CONTAINER,
     COMMANDER_MISSION,
+    DISCOVERY_SECRET,
     TANK_MISSION,
 )
 from .k8s import (
@@ -31,6 +33,7 @@ from .k8s import (
     delete_persistent_volume_claim,
     delete_pod,
     delete_release_secrets,
+    ensure_secret,
     get_default_namespace,
     get_default_namespace_or,
     get_mission,
@@ -407,6 +410,12 @@ def _run(
     archive_buffer.seek(0)
     archive_data = archive_buffer.read()
 
+    # Commanders may update but not create the Secret they cache discovery in
+    try:
+        ensure_secret(DISCOVERY_SECRET, namespace, labels={"app": "warnet"})
+    except Exception as e:
+        print(f"Scenario will run without the {DISCOVERY_SECRET} cache: {getattr(e, 'reason', e)}")
+
     # Start the commander pod with python and init containers
     try:
         # Construct Helm command
@@ -464,11 +473,31 @@ def _run(
     return name
 
 
-@click.command()
+class DefaultCommandGroup(click.Group):
+    """Group that runs its default command when no subcommand is named"""
+
+    default_command = "show"
+
+    def parse_args(self, ctx, args):
+        if not args or (args[0] not in self.commands and args[0] not in ctx.help_option_names):
+            args.insert(0, self.default_command)
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=DefaultCommandGroup)
+def logs():
+    """Show, archive and query pod logs.
+
+    `warnet logs [POD_NAME]` is short for `warnet logs show [POD_NAME]`. Pods
+    named after a subcommand need the long form, so deploy rejects those names.
+    """
+
+
+@logs.command(name="show")
 @click.argument("pod_name", type=str, default="")
 @click.option("--follow", "-f", is_flag=True, default=False, help="Follow logs")
 @click.option("--namespace", type=str, default="default", show_default=True)
-def logs(pod_name: str, follow: bool, namespace: str):
+def show_logs(pod_name: str, follow: bool, namespace: str):
     """Show the logs of a pod.
 
     If pod_name is omitted, an interactive menu lists all available commander
@@ -477,6 +506,10 @@ def logs(pod_name: str, follow: bool, namespace: str):
     return _logs(pod_name, follow, namespace)
 
 
+logs.add_command(archive)
+logs.add_command(query)
+
+
 def _logs(pod_name: str, follow: bool, namespace: Optional[str] = None):
     namespace = get_default_namespace_or(namespace)
 
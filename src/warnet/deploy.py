@@ -2,6 +2,7 @@ import json
 import subprocess
 import sys
 import tempfile
+from math import ceil
 from multiprocessing import Process
 from pathlib import Path
 from typing import Optional
@@ -11,10 +12,13 @@ import yaml
 
 from .constants import (
     BITCOIN_CHART_LOCATION,
+    BITCOIN_EXPORTER_CHART,
     CADDY_CHART,
     DEFAULTS_FILE,
     DEFAULTS_NAMESPACE_FILE,
     FORK_OBSERVER_CHART,
+    FORK_OBSERVER_NODES_PER_SECOND,
+    FORK_OBSERVER_QUERY_INTERVAL,
     FORK_OBSERVER_RPC_PASSWORD,
     FORK_OBSERVER_RPC_USER,
     HELM_COMMAND,
@@ -22,19 +26,20 @@ from .constants import (
     LOGGING_CRD_COMMANDS,
     LOGGING_HELM_COMMANDS,
     LOGGING_NAMESPACE,
+    METRICS_CHART,
     NAMESPACES_CHART_LOCATION,
     NAMESPACES_FILE,
     NETWORK_FILE,
     PLUGIN_ANNEX,
+    PROMETHEUS_SHARD_SIZE,
     SCENARIOS_DIR,
     WARGAMES_NAMESPACE_PREFIX,
     AnnexMember,
     HookValue,
     WarnetContent,
 )
-from .control import _logs, _run
+from .control import _logs, _run, logs
 from .k8s import (
-    get_default_namespace,
     get_default_namespace_or,
     get_mission,
     get_namespaces_by_type,
@@ -54,6 +59,15 @@ def validate_directory(ctx, param, value):
         raise click.BadParameter(
             f"'{value}' does not contain a valid network.yaml or namespaces.yaml file.{HINT}"
         )
+    if (directory / NETWORK_FILE).exists():
+        with (directory / NETWORK_FILE).open() as f:
+            nodes = (yaml.safe_load(f) or {}).get("nodes") or []
+        # `warnet logs <name>` would run the subcommand instead of showing the tank's logs
+        reserved = sorted({node.get("name") for node in nodes} & set(logs.commands))
+        if reserved:
+            raise click.BadParameter(
+                f"Tank names {', '.join(reserved)} are reserved for `warnet logs` subcommands"
+            )
     return directory
 
 
@@ -110,17 +124,21 @@ def _deploy(directory, debug, namespace, to_all_users):
         ingress_process.start()
         processes.append(ingress_process)
 
-        caddy_process = Process(target=deploy_caddy, args=(directory, debug))
-        caddy_process.start()
-        processes.append(caddy_process)
-
         # Wait for the network process to complete
         network_process.join()
 
         run_plugins(directory, HookValue.POST_NETWORK, namespace)
 
+        # Fork observer shards and their Caddy routes come from the same live tanks
+        fork_observer = fork_observer_configs(directory)
+        caddy_process = Process(target=deploy_caddy, args=(directory, debug, len(fork_observer)))
+        caddy_process.start()
+        processes.append(caddy_process)
+
         # Start the fork observer process immediately after network process completes
-        fork_observer_process = Process(target=deploy_fork_observer, args=(directory, debug))
+        fork_observer_process = Process(
+            target=deploy_fork_observer, args=(directory, debug, fork_observer)
+        )
         fork_observer_process.start()
         processes.append(fork_observer_process)
 
@@ -253,10 +271,64 @@ def deploy_logging_stack(directory: Path, debug: bool) -> bool:
         if not stream_command(command):
             print(f"Failed to run Helm command: {command}")
             return False
+
+    # Recording rules, and the Prometheus shards when there are many tanks to scrape
+    shards = prometheus_shards(metrics_tank_count(directory))
+    command = (
+        f"{HELM_COMMAND} warnet-metrics {METRICS_CHART} --namespace {LOGGING_NAMESPACE} "
+        f"--create-namespace --set aggregation.enabled=true --set shards={shards}"
+    )
+    if debug:
+        command += " --debug"
+    if not stream_command(command):
+        print(f"Failed to run Helm command: {command}")
+        return False
+    return True
+
+
+def metrics_tank_count(directory: Path) -> int:
+    """Number of tanks in a network that export bitcoind metrics"""
+    with (directory / DEFAULTS_FILE).open() as f:
+        default_file = yaml.safe_load(f) or {}
+    with (directory / NETWORK_FILE).open() as f:
+        network_file = yaml.safe_load(f)
+    default = bool(default_file.get("metricsExport", False))
+    return sum(bool(node.get("metricsExport", default)) for node in network_file.get("nodes") or [])
+
+
+def prometheus_shards(tank_count: int) -> int:
+    return max(1, ceil(tank_count / PROMETHEUS_SHARD_SIZE))
+
+
+def deploy_metrics_monitor(namespace: str, shards: int, debug: bool) -> bool:
+    """One ServiceMonitor for every tank in a namespace instead of one per tank"""
+    command = (
+        f"{HELM_COMMAND} warnet-metrics {METRICS_CHART} --namespace {namespace} "
+        f"--set serviceMonitor.enabled=true --set shards={shards}"
+    )
+    if debug:
+        command += " --debug"
+    if not stream_command(command):
+        click.echo(f"Failed to run Helm command: {command}")
+        return False
     return True
 
 
-def deploy_caddy(directory: Path, debug: bool):
+def deploy_bitcoin_exporter(namespace: str, bitcoin_exporter: dict, debug: bool) -> bool:
+    """One exporter polling every metrics-exporting tank in a namespace instead of a sidecar each"""
+    command = f"{HELM_COMMAND} bitcoin-exporter {BITCOIN_EXPORTER_CHART} --namespace {namespace}"
+    for key, value in bitcoin_exporter.items():
+        if key != "enabled":
+            command += f" --set {key}={value}"
+    if debug:
+        command += " --debug"
+    if not stream_command(command):
+        click.echo(f"Failed to run Helm command: {command}")
+        return False
+    return True
+
+
+def deploy_caddy(directory: Path, debug: bool, observer_shards: int = 0):
     network_file_path = directory / NETWORK_FILE
     with network_file_path.open() as f:
         network_file = yaml.safe_load(f)
@@ -276,15 +348,13 @@ def deploy_caddy(directory: Path, debug: bool):
         services.append(
             {"title": "Grafana", "path": "/grafana/", "host": "loki-grafana", "port": 80}
         )
-    if network_file.get("fork_observer", {}).get("enabled", False):
-        services.append(
-            {
-                "title": "Fork Observer",
-                "path": "/fork-observer/",
-                "host": "fork-observer",
-                "port": 2323,
-            }
-        )
+    # one route per fork-observer shard from fork_observer_configs
+    for shard in range(observer_shards):
+        release = fork_observer_release(shard)
+        title = "Fork Observer"
+        if observer_shards > 1:
+            title += f" {shard + 1}/{observer_shards}"
+        services.append({"title": title, "path": f"/{release}/", "host": release, "port": 2323})
     # add any extra services
     services += network_file.get("services", {})
 
@@ -326,64 +396,125 @@ def deploy_ingress(directory: Path, debug: bool):
     return True
 
 
-def deploy_fork_observer(directory: Path, debug: bool) -> bool:
+def fork_observer_configs(directory: Path) -> list[str]:
+    """
+    The [[networks.nodes]] config of each fork-observer shard, built once from the
+    live tanks of every namespace so the shards and their Caddy routes agree.
+    Empty when fork-observer is not enabled.
+    """
     network_file_path = directory / NETWORK_FILE
     with network_file_path.open() as f:
         network_file = yaml.safe_load(f)
 
-    # Only start if configured in the network file
-    if not network_file.get("fork_observer", {}).get("enabled", False):
+    fork_observer = network_file.get("fork_observer", {})
+    if not fork_observer.get("enabled", False):
+        return []
+
+    tanks = []
+    for tank in sorted(get_mission("tank"), key=lambda t: (t.metadata.namespace, t.metadata.name)):
+        labels = tank.metadata.labels or {}
+        if "RPCPort" in labels and "P2PPort" in labels:
+            tanks.append(tank)
+        else:
+            click.echo(
+                f"Not observing {tank.metadata.name} ({tank.metadata.namespace}): "
+                "pod has no RPCPort/P2PPort labels"
+            )
+    shards = fork_observer_shards(len(tanks), fork_observer)
+    per_shard = ceil(len(tanks) / shards)
+    qualify = len({tank.metadata.namespace for tank in tanks}) > 1
+
+    configs = []
+    for shard in range(shards):
+        first = shard * per_shard
+        nodes = [
+            _fork_observer_node(node_id, tank, qualify)
+            for node_id, tank in enumerate(tanks[first : first + per_shard], start=first)
+        ]
+        configs.append("\n\n".join(nodes))
+    return configs
+
+
+def deploy_fork_observer(directory: Path, debug: bool, configs: list[str]) -> bool:
+    """One fork-observer release per shard config from fork_observer_configs"""
+    if not configs:
         return False
 
-    default_namespace = get_default_namespace()
+    network_file_path = directory / NETWORK_FILE
+    with network_file_path.open() as f:
+        network_file = yaml.safe_load(f)
+    fork_observer = network_file.get("fork_observer", {})
+
     namespace = LOGGING_NAMESPACE
-    cmd = f"{HELM_COMMAND} 'fork-observer' {FORK_OBSERVER_CHART} --namespace {namespace} --create-namespace"
-    if debug:
-        cmd += " --debug"
+    success = True
+    for shard, config in enumerate(configs):
+        release = fork_observer_release(shard)
+        cmd = f"{HELM_COMMAND} '{release}' {FORK_OBSERVER_CHART} --namespace {namespace} --create-namespace"
+        if debug:
+            cmd += " --debug"
 
-    temp_override_file_path = ""
-    override_string = ""
-
-    # Add an entry for each node in the graph
-    for i, tank in enumerate(get_mission("tank")):
-        node_name = tank.metadata.name
-        for container in tank.spec.containers:
-            if container.name == "bitcoincore":
-                for port in container.ports:
-                    if port.name == "rpc":
-                        rpcport = port.container_port
-                    if port.name == "p2p":
-                        p2pport = port.container_port
-        node_config = f"""
-[[networks.nodes]]
-id = {i}
-name = "{node_name}"
-description = "{node_name}.{default_namespace}.svc:{int(p2pport)}"
-rpc_host = "{node_name}.{default_namespace}.svc"
-rpc_port = {int(rpcport)}
-rpc_user = "{FORK_OBSERVER_RPC_USER}"
-rpc_password = "{FORK_OBSERVER_RPC_PASSWORD}"
-"""
-
-        override_string += node_config
-
-    # Create yaml string using multi-line string format
-    override_string = override_string.strip()
-    v = {"config": override_string}
-    v["configQueryinterval"] = network_file.get("fork_observer", {}).get("configQueryinterval", 20)
-    yaml_string = yaml.dump(v, default_style="|", default_flow_style=False)
-
-    # Dump to yaml tempfile
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as temp_file:
-        temp_file.write(yaml_string)
-        temp_override_file_path = Path(temp_file.name)
-
-    cmd = f"{cmd} -f {temp_override_file_path}"
+        v = {
+            "config": config,
+            "configQueryInterval": f"query_interval = {fork_observer_query_interval(fork_observer)}",
+        }
+        yaml_string = yaml.dump(v, default_style="|", default_flow_style=False)
 
-    if not stream_command(cmd):
-        click.echo(f"Failed to run Helm command: {cmd}")
-        return False
-    return True
+        # Dump to yaml tempfile
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as temp_file:
+            temp_file.write(yaml_string)
+            temp_override_file_path = Path(temp_file.name)
+
+        cmd = f"{cmd} -f {temp_override_file_path}"
+
+        if not stream_command(cmd):
+            click.echo(f"Failed to run Helm command: {cmd}")
+            success = False
+    return success
+
+
+def fork_observer_query_interval(fork_observer: dict) -> int:
+    # Older network files spell it configQueryinterval
+    return int(
+        fork_observer.get(
+            "configQueryInterval",
+            fork_observer.get("configQueryinterval", FORK_OBSERVER_QUERY_INTERVAL),
+        )
+    )
+
+
+def fork_observer_shards(node_count: int, fork_observer: dict) -> int:
+    """
+    Fork-observer instances needed to poll node_count nodes within one query
+    interval, or at most fork_observer.nodesPerInstance nodes each when set
+    """
+    per_instance = fork_observer.get("nodesPerInstance") or (
+        fork_observer_query_interval(fork_observer) * FORK_OBSERVER_NODES_PER_SECOND
+    )
+    return max(1, ceil(node_count / per_instance))
+
+
+def fork_observer_release(shard: int) -> str:
+    return "fork-observer" if shard == 0 else f"fork-observer-{shard}"
+
+
+def _fork_observer_node(node_id: int, tank, qualify: bool) -> str:
+    """A [[networks.nodes]] TOML entry for a tank, using the ports from its pod labels"""
+    name = tank.metadata.name
+    namespace = tank.metadata.namespace
+    labels = tank.metadata.labels
+    host = f"{name}.{namespace}.svc"
+    return "\n".join(
+        [
+            "[[networks.nodes]]",
+            f"id = {node_id}",
+            f'name = "{f"{name}.{namespace}" if qualify else name}"',
+            f'description = "{host}:{int(labels["P2PPort"])}"',
+            f'rpc_host = "{host}"',
+            f"rpc_port = {int(labels['RPCPort'])}",
+            f'rpc_user = "{FORK_OBSERVER_RPC_USER}"',
+            f'rpc_password = "{FORK_OBSERVER_RPC_PASSWORD}"',
+        ]
+    )
 
 
 def deploy_network(directory: Path, debug: bool = False, namespace: Optional[str] = None):
@@ -409,8 +540,18 @@ def deploy_network(directory: Path, debug: bool = False, namespace: Optional[str
         if needs_ln_init:
             break
 
+    metrics_tanks = metrics_tank_count(directory)
+    if metrics_tanks:
+        deploy_metrics_monitor(namespace, prometheus_shards(metrics_tanks), debug)
+    bitcoin_exporter = network_file.get("bitcoin_exporter") or {}
+    shared_exporter = bool(metrics_tanks) and bitcoin_exporter.get("enabled", False)
+    if shared_exporter:
+        deploy_bitcoin_exporter(namespace, bitcoin_exporter, debug)
+
     processes = []
     for node in network_file["nodes"]:
+        if shared_exporter:
+            node = {**node, "metricsSidecar": False}
         p = Process(target=deploy_single_node, args=(node, directory, debug, namespace))
         p.start()
         processes.append(p)
@@ -2,7 +2,11 @@ import json
 import os
 import random
 import sys
+import time
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Optional
 
 import click
 import inquirer
@@ -10,19 +14,65 @@ import yaml
 from rich import print
 from rich.console import Console
 from rich.table import Table
+from test_framework.messages import COIN
+from urllib3.exceptions import MaxRetryError
 
 from resources.scenarios.ln_framework.ln import (
     CHANNEL_OPEN_START_HEIGHT,
-    CHANNEL_OPENS_PER_BLOCK,
     Policy,
 )
+from resources.scenarios.ln_framework.plan import plan_channel_opens, plan_funding
 
+from .bitcoin import _rpc
 from .constants import (
     DEFAULT_IMAGE_REPO,
     DEFAULT_TAG,
     FORK_OBSERVER_RPCAUTH,
+    NETWORK_FILE,
     SUPPORTED_TAGS,
+    TANK_MISSION,
 )
+from .k8s import get_addnodes, get_channels, get_mission, get_service_ips
+from .topology import (
+    BETWEENNESS_SAMPLES,
+    TOPOLOGY_MODELS,
+    betweenness_estimate,
+    generate_topology,
+    partitioned_nodes,
+    print_topology_stats,
+    topology_stats,
+    undirected,
+    validate_topology,
+)
+
+# libyaml's parser and emitter are much faster on large networks, fall back to pure Python without it
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def write_network_yaml(
+    path: Path, nodes: Iterable[dict], sections: Optional[dict] = None, sort_keys: bool = True
+) -> int:
+    """
+    Write network.yaml one node at a time, so even networks of tens of thousands of
+    nodes never need a YAML representation of the whole document in memory.
+    Top-level sections other than nodes are written first. Returns the node count.
+    """
+    count = 0
+    with open(path, "w") as f:
+        if sections:
+            yaml.dump(
+                sections, f, Dumper=YAML_DUMPER, default_flow_style=False, sort_keys=sort_keys
+            )
+        for node in nodes:
+            if not count:
+                f.write("nodes:\n")
+            # A one-item list renders exactly like that item inside the nodes list
+            yaml.dump([node], f, Dumper=YAML_DUMPER, default_flow_style=False, sort_keys=sort_keys)
+            count += 1
+        if not count:
+            f.write("nodes: []\n")
+    return count
 
 
 def custom_graph(
@@ -32,6 +82,9 @@ def custom_graph(
     fork_obs_query_interval: int,
     caddy: bool,
     logging: bool,
+    seed: Optional[int] = None,
+    model: str = "random",
+    model_options: Optional[dict] = None,
 ):
     try:
         datadir.mkdir(parents=False, exist_ok=False)
@@ -41,54 +94,50 @@ def custom_graph(
         sys.exit(1)
 
     # Generate network.yaml
-    nodes = []
-    connections = set()
-    total_count = sum(int(entry["count"]) for entry in tanks)
-    index = 0
-
+    images = []
+    connections = []
     for entry in tanks:
-        for _ in range(int(entry["count"])):
-            if ":" in entry["version"] and "/" in entry["version"]:
-                repo, tag = entry["version"].split(":")
-                image = {"repository": repo, "tag": tag}
-            else:
-                image = {"tag": entry["version"]}
-            node = {"name": f"tank-{index:04d}", "addnode": [], "image": image}
-
-            # Connect to other nodes
-            available_nodes = list(range(total_count))
-            # Do not connect to self
-            available_nodes.remove(index)
-            for count in range(min(int(entry["connections"]), len(available_nodes))):
-                # Add neighbor connection first to create minimal round-robin
-                if count == 0:
-                    next_node = (index + 1) % total_count
-                    node["addnode"].append(f"tank-{next_node:04d}")
-                    connections.add((index, next_node))
-                    if next_node in available_nodes:
-                        available_nodes.remove(next_node)
-                else:
-                    random_node = random.choice(available_nodes)
-                    # Avoid circular loops of A -> B -> A
-                    if (random_node, index) not in connections:
-                        node["addnode"].append(f"tank-{random_node:04d}")
-                        connections.add((index, random_node))
-                        available_nodes.remove(random_node)
-
-            nodes.append(node)
-            index += 1
-
-    network_yaml_data = {"nodes": nodes}
-    network_yaml_data["fork_observer"] = {
-        "enabled": fork_observer,
-        "configQueryInterval": fork_obs_query_interval,
-    }
-    network_yaml_data["caddy"] = {
-        "enabled": caddy,
-    }
+        if ":" in entry["version"] and "/" in entry["version"]:
+            repo, tag = entry["version"].split(":")
+            image = {"repository": repo, "tag": tag}
+        else:
+            image = {"tag": entry["version"]}
+        images += [image] * int(entry["count"])
+        connections += [int(entry["connections"])] * int(entry["count"])
+
+    model_options = model_options or {}
+    rng = random.Random(seed)
+    try:
+        topology = generate_topology(model, connections, rng, **model_options)
+    except ValueError as e:
+        datadir.rmdir()
+        raise click.ClickException(str(e)) from e
+    problems = validate_topology(topology, model_options.get("max_inbound"))
+    if problems:
+        datadir.rmdir()
+        raise click.ClickException(
+            f"Generated {model} topology is invalid:\n" + "\n".join(problems)
+        )
+    print_topology_stats(topology_stats(topology, rng), title=f"{model} topology")
 
-    with open(os.path.join(datadir, "network.yaml"), "w") as f:
-        yaml.dump(network_yaml_data, f, default_flow_style=False)
+    nodes = (
+        {
+            "name": f"tank-{index:04d}",
+            "addnode": [f"tank-{peer:04d}" for peer in peers],
+            "image": dict(image),
+        }
+        for index, (image, peers) in enumerate(zip(images, topology))
+    )
+    sections = {
+        "fork_observer": {
+            "enabled": fork_observer,
+            "configQueryInterval": fork_obs_query_interval,
+        },
+        "caddy": {
+            "enabled": caddy,
+        },
+    }
+    write_network_yaml(datadir / "network.yaml", nodes, sections)
 
     # Generate node-defaults.yaml
     defaults_yaml_content = {
@@ -285,8 +334,101 @@ def inquirer_create_network(project_path: Path):
 
 
 @click.command()
-def create():
-    """Create a new warnet network"""
+@click.option(
+    "--model",
+    type=click.Choice(list(TOPOLOGY_MODELS)),
+    default=None,
+    help="Topology model. Giving a model or --nodes skips the interactive prompts",
+)
+@click.option("--nodes", type=int, default=None, help="Number of tanks")
+@click.option(
+    "--connections", type=int, default=8, show_default=True, help="addnode peers per tank"
+)
+@click.option(
+    "--version",
+    "tank_version",
+    type=str,
+    default=DEFAULT_TAG,
+    show_default=True,
+    help="Bitcoin Core tag, or repository/image:tag",
+)
+@click.option("--name", type=str, default=None, help="Network name [default: <model>-<nodes>]")
+@click.option("--seed", type=int, default=None, help="Random seed for a reproducible topology")
+@click.option(
+    "--rewire",
+    type=click.FloatRange(0, 1),
+    default=None,
+    help="small-world: probability of rewiring each lattice edge [default: 0.1]",
+)
+@click.option(
+    "--clusters", type=int, default=None, help="clustered: number of regions or ASes [default: 4]"
+)
+@click.option(
+    "--locality",
+    type=click.FloatRange(0, 1),
+    default=None,
+    help="clustered: probability a peer is in the same cluster [default: 0.8]",
+)
+@click.option(
+    "--max-inbound",
+    type=int,
+    default=None,
+    help="Fail if any tank gets more inbound connections (clustered: cap them) [default: 114]",
+)
+@click.option(
+    "--degrees",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="degree: JSON or YAML degree list or {degree: count} mapping from a network crawl",
+)
+@click.option(
+    "--group",
+    "groups",
+    type=str,
+    multiple=True,
+    help="COUNT:CONNECTIONS:VERSION tank group, repeatable. Used instead of --nodes",
+)
+@click.option(
+    "--fork-observer/--no-fork-observer",
+    default=True,
+    show_default=True,
+    help="Enable fork-observer",
+)
+@click.option(
+    "--fork-observer-query-interval",
+    type=int,
+    default=20,
+    show_default=True,
+    help="Seconds between fork-observer node queries",
+)
+@click.option(
+    "--logging/--no-logging", default=False, show_default=True, help="Enable grafana logging"
+)
+def create(
+    model: Optional[str],
+    nodes: Optional[int],
+    connections: int,
+    tank_version: str,
+    name: Optional[str],
+    seed: Optional[int],
+    rewire: Optional[float],
+    clusters: Optional[int],
+    locality: Optional[float],
+    max_inbound: Optional[int],
+    degrees: Optional[str],
+    groups: tuple[str],
+    fork_observer: bool,
+    fork_observer_query_interval: int,
+    logging: bool,
+):
+    """
+    Create a new warnet network
+
+    Without options the network is built interactively with random addnode
+    peers. With --model, --nodes or --group it is generated without prompting,
+    so it can run unattended. Either way, summary statistics of the topology
+    are printed.
+    """
     try:
         project_path = Path(os.getcwd())
         # Check if the project has a networks directory
@@ -297,10 +439,45 @@ def create():
                 bold=True,
             )
             return False
+        if model or nodes or groups:
+            if groups:
+                tanks = [_parse_group(group) for group in groups]
+            elif nodes:
+                tanks = [{"version": tank_version, "count": nodes, "connections": connections}]
+            else:
+                raise click.UsageError(
+                    "--nodes or --group is required when generating with --model"
+                )
+            model = model or "random"
+            total = sum(tank["count"] for tank in tanks)
+            custom_network_path = project_path / "networks" / (name or f"{model}-{total}")
+            custom_graph(
+                tanks,
+                custom_network_path,
+                fork_observer=fork_observer,
+                fork_obs_query_interval=fork_observer_query_interval,
+                caddy=fork_observer | logging,
+                logging=logging,
+                seed=seed,
+                model=model,
+                model_options={
+                    "rewire": rewire,
+                    "clusters": clusters,
+                    "locality": locality,
+                    "max_inbound": max_inbound,
+                    "degrees": degrees,
+                },
+            )
+            click.secho("\nNew network created successfully!", fg="green", bold=True)
+            click.echo("\nRun the following command to deploy this network:")
+            click.echo(f"warnet deploy {custom_network_path}")
+            return
         custom_network_path = inquirer_create_network(project_path)
         click.secho("\nNew network created successfully!", fg="green", bold=True)
         click.echo("\nRun the following command to deploy this network:")
         click.echo(f"warnet deploy {custom_network_path}")
+    except click.ClickException:
+        raise
     except Exception as e:
         click.echo(f"{e}\n\n")
         click.secho(f"An error occurred while creating a new network:\n\n{e}\n\n", fg="red")
@@ -311,71 +488,558 @@ def create():
         return False
 
 
+def _parse_group(group: str) -> dict:
+    try:
+        count, connections, version = group.split(":", 2)
+        return {"version": version, "count": int(count), "connections": int(connections)}
+    except ValueError:
+        raise click.BadParameter(
+            f"'{group}' is not COUNT:CONNECTIONS:VERSION, e.g. 10:8:27.0", param_hint="--group"
+        ) from None
+
+
 @click.command()
 @click.argument("graph_file_path", type=click.Path(exists=True, file_okay=True, dir_okay=False))
 @click.argument("output_path", type=click.Path(exists=False, file_okay=False, dir_okay=True))
-def import_network(graph_file_path: str, output_path: str):
-    """Create a network from an imported lightning network graph JSON"""
-    print(_import_network(graph_file_path, output_path))
+@click.option(
+    "--top-capacity",
+    type=int,
+    default=None,
+    help="Keep only the N nodes with the most total channel capacity",
+)
+@click.option(
+    "--seed-node",
+    "seed_nodes",
+    type=str,
+    multiple=True,
+    help="Keep only the neighbourhood of this node pubkey, repeatable",
+)
+@click.option(
+    "--radius", type=int, default=2, show_default=True, help="Hops kept around each --seed-node"
+)
+@click.option(
+    "--k-core",
+    type=int,
+    default=None,
+    help="Keep only the k-core: nodes with at least K peers that also remain",
+)
+def import_network(
+    graph_file_path: str,
+    output_path: str,
+    top_capacity: Optional[int],
+    seed_nodes: tuple[str],
+    radius: int,
+    k_core: Optional[int],
+):
+    """
+    Create a network from an imported lightning network graph JSON
 
+    The describegraph JSON is parsed as a stream, so mainnet-sized graphs can be
+    imported. Sampling options are applied in the order --top-capacity,
+    --seed-node, --k-core to produce a smaller, deployable subgraph.
+    """
+    print(
+        _import_network(
+            graph_file_path,
+            output_path,
+            top_capacity=top_capacity,
+            seed_nodes=seed_nodes,
+            radius=radius,
+            k_core=k_core,
+        )
+    )
 
-def _import_network(graph_file_path, output_path):
+
+def _import_network(
+    graph_file_path,
+    output_path,
+    top_capacity: Optional[int] = None,
+    seed_nodes: Iterable[str] = (),
+    radius: int = 2,
+    k_core: Optional[int] = None,
+):
     output_path = Path(output_path)
     graph_file_path = Path(graph_file_path).resolve()
-    with open(graph_file_path) as graph_file:
-        graph = json.loads(graph_file.read())
 
+    start = time.perf_counter()
+    pub_keys, edges, skipped = _read_describegraph(graph_file_path)
+    print(
+        f"Read {len(pub_keys)} nodes and {len(edges)} channels in "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+    if skipped:
+        click.secho(
+            f"Dropped {skipped} of {len(edges) + skipped} channels without a policy for both ends",
+            fg="yellow",
+        )
+
+    if not pub_keys:
+        raise click.ClickException(f"No nodes found in {graph_file_path}")
+    if top_capacity is not None or seed_nodes or k_core is not None:
+        start = time.perf_counter()
+        pub_keys, edges = _sample_ln_graph(
+            pub_keys, edges, top_capacity, seed_nodes, radius, k_core
+        )
+        print(
+            f"Sampled {len(pub_keys)} nodes and {len(edges)} channels in "
+            f"{time.perf_counter() - start:.1f}s"
+        )
+        if not pub_keys:
+            raise click.ClickException(
+                "No nodes left to import: loosen --top-capacity, --seed-node, --radius or --k-core"
+            )
+
+    start = time.perf_counter()
     tanks = {}
     pk_to_tank = {}
-    tank_to_pk = {}
     index = 0
-    for node in graph["nodes"]:
+    for pub_key in pub_keys:
         tank = f"tank-{index:04d}"
-        pk_to_tank[node["pub_key"]] = tank
-        tank_to_pk[tank] = node["pub_key"]
+        pk_to_tank[pub_key] = tank
         tanks[tank] = {"name": tank, "ln": {"lnd": True}, "lnd": {"channels": []}}
         index += 1
     print(f"Imported {index} nodes")
 
-    sorted_edges = sorted(graph["edges"], key=lambda x: int(x["channel_id"]))
+    sorted_edges = sorted(edges, key=lambda edge: edge[0])
 
-    # Start including channel open txs at this block height
-    block = CHANNEL_OPEN_START_HEIGHT
-    # Coinbase occupies the 0 position!
-    index = 1
-    count = 0
-    for edge in sorted_edges:
-        source = pk_to_tank[edge["node1_pub"]]
+    opens = []
+    for _, node1_pub, node2_pub, capacity, node1_policy, node2_policy in sorted_edges:
+        source = pk_to_tank[node1_pub]
         channel = {
-            "id": {"block": block, "index": index},
-            "target": pk_to_tank[edge["node2_pub"]] + "-ln",
-            "capacity": int(edge["capacity"]),
-            "push_amt": int(edge["capacity"]) // 2,
-            "source_policy": Policy.from_lnd_describegraph(edge["node1_policy"]).to_dict(),
-            "target_policy": Policy.from_lnd_describegraph(edge["node2_policy"]).to_dict(),
+            # Filled in by the planner
+            "id": None,
+            "target": pk_to_tank[node2_pub] + "-ln",
+            "capacity": capacity,
+            "push_amt": capacity // 2,
+            "source_policy": node1_policy,
+            "target_policy": node2_policy,
         }
         tanks[source]["lnd"]["channels"].append(channel)
-        index += 1
-        if index > CHANNEL_OPENS_PER_BLOCK:
-            index = 1
-            block += 1
-        count += 1
+        opens.append((source + "-ln", channel))
+    count = len(opens)
 
+    blocks = plan_channel_opens(opens)
+    funding = plan_funding([{"source": source, **channel} for source, channel in opens])
+    print(
+        f"Planned channel opens in {blocks} blocks from height {CHANNEL_OPEN_START_HEIGHT}, "
+        f"funded by {sum(len(amounts) for amounts in funding.values())} UTXOs totalling "
+        f"{sum(sum(amounts) for amounts in funding.values()) / COIN:.2f} BTC"
+    )
     print(f"Imported {count} channels")
 
-    network = {"nodes": []}
-    prev_node_name = list(tanks.keys())[-1]
-    for name, obj in tanks.items():
-        obj["name"] = name
-        obj["addnode"] = [prev_node_name]
-        prev_node_name = name
-        network["nodes"].append(obj)
+    def nodes():
+        prev_node_name = list(tanks.keys())[-1]
+        for name, obj in tanks.items():
+            obj["name"] = name
+            obj["addnode"] = [prev_node_name]
+            prev_node_name = name
+            yield obj
 
     output_path.mkdir(parents=True, exist_ok=True)
     # This file must exist and must contain at least one line of valid yaml
     with open(output_path / "node-defaults.yaml", "w") as f:
         f.write(f"imported_from: {graph_file_path}\n")
     # Here's the good stuff
-    with open(output_path / "network.yaml", "w") as f:
-        f.write(yaml.dump(network, sort_keys=False))
+    write_network_yaml(output_path / "network.yaml", nodes(), sort_keys=False)
+    print(f"Wrote network in {time.perf_counter() - start:.1f}s")
     return f"Network created in {output_path.resolve()}"
+
+
+def _read_describegraph(path: Path) -> tuple[list[str], list[tuple], int]:
+    """
+    Stream the nodes and edges of an lnd describegraph JSON file, keeping only what
+    the import needs: node pubkeys in file order and, per channel, a tuple of
+    (channel id, node1 pubkey, node2 pubkey, capacity, node1 policy, node2 policy).
+    """
+    pub_keys = []
+    edges = []
+    skipped = 0
+    console = Console()
+    with (
+        open(path, encoding="utf-8") as graph_file,
+        console.status(f"[bold yellow]Reading {path.name}...[/bold yellow]") as status,
+    ):
+        for key, item in _iter_json_arrays(graph_file):
+            if key == "nodes":
+                pub_keys.append(item["pub_key"])
+            elif key == "edges":
+                if not item.get("node1_policy") or not item.get("node2_policy"):
+                    skipped += 1
+                    continue
+                edges.append(
+                    (
+                        int(item["channel_id"]),
+                        item["node1_pub"],
+                        item["node2_pub"],
+                        int(item["capacity"]),
+                        Policy.dict_from_lnd_describegraph(item["node1_policy"]),
+                        Policy.dict_from_lnd_describegraph(item["node2_policy"]),
+                    )
+                )
+            else:
+                continue
+            if not (len(pub_keys) + len(edges)) % 10000:
+                status.update(
+                    f"[bold yellow]Reading {path.name}: {len(pub_keys)} nodes, "
+                    f"{len(edges)} channels[/bold yellow]"
+                )
+    return pub_keys, edges, skipped
+
+
+def _iter_json_arrays(f, chunk_size: int = 1 << 20):
+    """
+    Yield (key, item) for every item of the arrays in a top-level JSON object,
+    decoding one item at a time from chunks of a text file
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def peek() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or not fill():
+                return buf[pos : pos + 1]
+
+    def expect(char: str):
+        nonlocal pos
+        if peek() != char:
+            raise ValueError(f"Expected '{char}' in JSON at offset {pos}: {buf[pos : pos + 20]!r}")
+        pos += 1
+
+    def value():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+                # A value ending exactly at the end of the buffer may be truncated
+                if end < len(buf) or eof:
+                    pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            fill()
+
+    expect("{")
+    while peek() != "}":
+        key = value()
+        expect(":")
+        if peek() == "[":
+            expect("[")
+            while peek() != "]":
+                yield key, value()
+                if peek() != "]":
+                    expect(",")
+            expect("]")
+        else:
+            value()
+        if peek() != "}":
+            expect(",")
+
+
+def _sample_ln_graph(
+    pub_keys: list[str],
+    edges: list[tuple],
+    top_capacity: Optional[int],
+    seed_nodes: Iterable[str],
+    radius: int,
+    k_core: Optional[int],
+) -> tuple[list[str], list[tuple]]:
+    """Reduce a channel graph to a subgraph, keeping node order and every channel inside it"""
+    kept = set(pub_keys)
+
+    def peers() -> dict[str, set]:
+        adjacency = {pub_key: set() for pub_key in kept}
+        for _, a, b, *_ in edges:
+            if a in kept and b in kept and a != b:
+                adjacency[a].add(b)
+                adjacency[b].add(a)
+        return adjacency
+
+    if top_capacity is not None:
+        capacity = dict.fromkeys(pub_keys, 0)
+        for _, a, b, amount, *_ in edges:
+            capacity[a] = capacity.get(a, 0) + amount
+            capacity[b] = capacity.get(b, 0) + amount
+        kept = set(sorted(pub_keys, key=lambda pub_key: -capacity[pub_key])[:top_capacity])
+
+    if seed_nodes:
+        missing = [seed for seed in seed_nodes if seed not in kept]
+        if missing:
+            raise click.BadParameter(
+                f"Not in the graph: {', '.join(missing)}", param_hint="--seed-node"
+            )
+        adjacency = peers()
+        reached = set(seed_nodes)
+        frontier = list(seed_nodes)
+        for _ in range(radius):
+            frontier = [
+                peer for node in frontier for peer in adjacency[node] if peer not in reached
+            ]
+            reached.update(frontier)
+        kept = reached
+
+    if k_core is not None:
+        adjacency = peers()
+        degree = {node: len(adjacency[node]) for node in kept}
+        peel = [node for node, d in degree.items() if d < k_core]
+        removed = set(peel)
+        while peel:
+            for peer in adjacency[peel.pop()]:
+                if peer in removed:
+                    continue
+                degree[peer] -= 1
+                if degree[peer] < k_core:
+                    removed.add(peer)
+                    peel.append(peer)
+        kept -= removed
+
+    return (
+        [pub_key for pub_key in pub_keys if pub_key in kept],
+        [edge for edge in edges if edge[1] in kept and edge[2] in kept],
+    )
+
+
+@click.group(name="graph")
+def graph():
+    """Inspect network topologies"""
+
+
+@graph.command()
+@click.argument("target", type=str, default="live")
+@click.option(
+    "--top", type=int, default=10, show_default=True, help="Central nodes and diffs shown"
+)
+@click.option(
+    "--samples",
+    type=int,
+    default=BETWEENNESS_SAMPLES,
+    show_default=True,
+    help="Source nodes sampled to estimate betweenness",
+)
+@click.option(
+    "--concurrency", type=int, default=20, show_default=True, help="Tanks queried at once"
+)
+def stats(target: str, top: int, samples: int, concurrency: int):
+    """
+    Graph statistics of a network directory or of the running network (TARGET "live")
+
+    Reports degree distribution, connected components, diameter, clustering and
+    the most central nodes of the addnode topology, and of the LN channel graph
+    when there is one. For the running network the connections reported by
+    getpeerinfo are compared with the configured addnodes.
+
+    Exits with status 1 if any node is partitioned from the rest of the network.
+    """
+    if target == "live":
+        try:
+            tanks = get_mission(TANK_MISSION)
+        except MaxRetryError as e:
+            print(f"{e}")
+            sys.exit(1)
+        if not tanks:
+            print("No active tanks found.")
+            return
+        names, addnodes, channels = _live_graphs(tanks)
+        connected, unreachable = _live_peers(tanks, concurrency)
+    else:
+        directory = Path(target)
+        if not (directory / NETWORK_FILE).is_file():
+            raise click.BadParameter(
+                f"'{target}' is neither 'live' nor a network directory with a {NETWORK_FILE}",
+                param_hint="TARGET",
+            )
+        names, addnodes, channels = _network_graphs(directory)
+        connected, unreachable = None, []
+
+    rng = random.Random(0)
+    neighbors = _print_graph_stats(
+        names,
+        connected or addnodes,
+        "P2P connections" if connected else "P2P addnodes",
+        top,
+        samples,
+        rng,
+    )
+    if any(channels.values()):
+        _print_graph_stats(names, channels, "LN channels", top, samples, rng)
+
+    if connected is not None:
+        _print_topology_diff(addnodes, connected, unreachable, top)
+
+    partitioned = [names[node] for node in partitioned_nodes(neighbors)]
+    if partitioned:
+        print(
+            f"[bold red]{len(partitioned)} nodes are partitioned from the largest component:[/bold red] "
+            + ", ".join(partitioned[:top])
+            + (" ..." if len(partitioned) > top else "")
+        )
+        sys.exit(1)
+
+
+def _print_graph_stats(
+    names: list[str],
+    peers: dict[str, list[str]],
+    title: str,
+    top: int,
+    samples: int,
+    rng: random.Random,
+) -> list[set[int]]:
+    """Print statistics and the most central nodes of a name -> peers graph"""
+    index = {name: i for i, name in enumerate(names)}
+    outbound = [
+        [index[peer] for peer in peers.get(name, []) if peer in index and peer != name]
+        for name in names
+    ]
+    print_topology_stats(topology_stats(outbound, rng), title=title)
+
+    neighbors = undirected(outbound)
+    centrality = betweenness_estimate(neighbors, samples, rng)
+    exact = len(names) <= samples
+    table = Table(
+        title=f"Most central nodes ({'exact' if exact else f'estimated from {samples} sources'})",
+        show_header=True,
+        header_style="bold magenta",
+    )
+    table.add_column("Node", style="cyan")
+    table.add_column("Degree", justify="right")
+    table.add_column("Betweenness", justify="right", style="green")
+    for node in sorted(range(len(names)), key=lambda n: centrality[n], reverse=True)[:top]:
+        table.add_row(names[node], str(len(neighbors[node])), f"{centrality[node]:.4f}")
+    Console().print(table)
+    return neighbors
+
+
+def _print_topology_diff(
+    addnodes: dict[str, list[str]],
+    connected: dict[str, list[str]],
+    unreachable: list[str],
+    top: int,
+):
+    """Compare configured addnode connections with live peer connections"""
+    intended = {_name_pair(a, b) for a, peers in addnodes.items() for b in peers if a != b}
+    actual = {_name_pair(a, b) for a, peers in connected.items() for b in peers if a != b}
+    missing = sorted(intended - actual)
+    unexpected = sorted(actual - intended)
+
+    table = Table(title="Intended vs actual topology", show_header=False)
+    table.add_column("Statistic", style="cyan")
+    table.add_column("Value", justify="right", style="green")
+    table.add_row("Configured addnode connections", str(len(intended)))
+    table.add_row("Live connections", str(len(actual)))
+    table.add_row("Configured but not connected", str(len(missing)))
+    table.add_row("Connected but not configured", str(len(unexpected)))
+    table.add_row("Tanks not answering getpeerinfo", str(len(unreachable)))
+    Console().print(table)
+
+    for label, pairs in [("Missing", missing), ("Unexpected", unexpected)]:
+        for a, b in pairs[:top]:
+            print(f"{label}: {a} <-> {b}")
+        if len(pairs) > top:
+            print(f"{label}: ... and {len(pairs) - top} more")
+    for name in unreachable[:top]:
+        print(f"[yellow]Unreachable: {name}[/yellow]")
+
+
+def _name_pair(a: str, b: str) -> tuple[str, str]:
+    return (a, b) if a < b else (b, a)
+
+
+def _peer_name(target: str) -> str:
+    """Tank name of an addnode or channel target: tank-0001:18444, tank-0001.ns.svc or tank-0001-ln"""
+    name = target.split(":")[0].split(".")[0]
+    return name[: -len("-ln")] if name.endswith("-ln") else name
+
+
+def _network_graphs(directory: Path) -> tuple[list[str], dict, dict]:
+    """Tank names, addnode peers and LN channel peers of every tank in a network directory"""
+    with (directory / NETWORK_FILE).open() as f:
+        network = yaml.load(f, Loader=YAML_LOADER)
+    names, addnodes, channels = [], {}, {}
+    for node in network.get("nodes") or []:
+        name = node["name"]
+        names.append(name)
+        addnodes[name] = [_peer_name(peer) for peer in node.get("addnode") or []]
+        channels[name] = [
+            _peer_name(channel["target"]) for channel in (node.get("lnd") or {}).get("channels", [])
+        ]
+    return names, addnodes, channels
+
+
+def _live_graphs(tanks) -> tuple[list[str], dict, dict]:
+    """Tank names, configured addnode peers and LN channel peers of the running tanks"""
+    namespaces = {tank.metadata.namespace for tank in tanks}
+    qualify = _qualifier(namespaces)
+    names = [qualify(tank.metadata.name, tank.metadata.namespace) for tank in tanks]
+    addnodes, channels = {}, {}
+    for namespace in namespaces:
+        for name, peers in get_addnodes(namespace).items():
+            addnodes[qualify(name, namespace)] = [
+                qualify(_peer_name(peer), _peer_namespace(peer, namespace)) for peer in peers
+            ]
+        for channel in get_channels(namespace):
+            source = qualify(_peer_name(channel["source"]), namespace)
+            channels.setdefault(source, []).append(
+                qualify(_peer_name(channel["target"]), namespace)
+            )
+    return names, addnodes, channels
+
+
+def _live_peers(tanks, concurrency: int) -> tuple[dict[str, list[str]], list[str]]:
+    """Each running tank's connected peers from getpeerinfo, and the tanks that did not answer"""
+    namespaces = {tank.metadata.namespace for tank in tanks}
+    qualify = _qualifier(namespaces)
+    # Outbound peers are addressed by service IP and inbound peers by pod IP
+    peer_names = {}
+    for namespace in namespaces:
+        for ip, name in get_service_ips(namespace).items():
+            peer_names[ip] = qualify(name, namespace)
+    for tank in tanks:
+        if tank.status.pod_ip:
+            peer_names[tank.status.pod_ip] = qualify(tank.metadata.name, tank.metadata.namespace)
+
+    def peers(tank) -> list[str]:
+        peerinfo = json.loads(_rpc(tank.metadata.name, "getpeerinfo", [], tank.metadata.namespace))
+        addresses = [peer["addr"].rsplit(":", 1)[0].strip("[]") for peer in peerinfo]
+        return [peer_names[address] for address in addresses if address in peer_names]
+
+    connected, unreachable = {}, []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(peers, tank): tank for tank in tanks}
+        for future in as_completed(futures):
+            tank = futures[future]
+            name = qualify(tank.metadata.name, tank.metadata.namespace)
+            try:
+                connected[name] = future.result()
+            except Exception:
+                unreachable.append(name)
+    return connected, sorted(unreachable)
+
+
+def _qualifier(namespaces: set[str]):
+    """Tank names are only qualified with their namespace when there is more than one"""
+
+    def qualify(name: str, namespace: str) -> str:
+        return name if len(namespaces) == 1 else f"{name}.{namespace}"
+
+    return qualify
+
+
+def _peer_namespace(target: str, default: str) -> str:
+    parts = target.split(":")[0].split(".")
+    return parts[1] if len(parts) > 1 else default
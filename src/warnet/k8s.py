@@ -106,6 +106,35 @@ def get_channels(namespace: Optional[str] = None) -> any:
     return channels
 
 
+def get_addnodes(namespace: Optional[str] = None) -> dict[str, list[str]]:
+    """Map each tank in a namespace to the addnode peers in its bitcoin.conf configmap"""
+    namespace = get_default_namespace_or(namespace)
+    sclient = get_static_client()
+    config_maps = sclient.list_namespaced_config_map(namespace=namespace)
+    addnodes = {}
+    for cm in config_maps.items:
+        if not cm.data or "bitcoin.conf" not in cm.data:
+            continue
+        addnodes[cm.metadata.name] = [
+            line.split("=", 1)[1].strip()
+            for line in cm.data["bitcoin.conf"].splitlines()
+            if line.strip().startswith("addnode=")
+        ]
+    return addnodes
+
+
+def get_service_ips(namespace: Optional[str] = None) -> dict[str, str]:
+    """Map the cluster IP of each service in a namespace to the service name"""
+    namespace = get_default_namespace_or(namespace)
+    sclient = get_static_client()
+    services = sclient.list_namespaced_service(namespace=namespace)
+    return {
+        svc.spec.cluster_ip: svc.metadata.name
+        for svc in services.items
+        if svc.spec.cluster_ip and svc.spec.cluster_ip != "None"
+    }
+
+
 def get_persistent_volume_claims(namespace: Optional[str] = None) -> any:
     namespace = get_default_namespace_or(namespace)
     sclient = get_static_client()
@@ -185,6 +214,18 @@ def delete_release_secrets(release_name: str, namespace: Optional[str] = None):
         print(f"Deleted secret {release_name}.{namespace}")
 
 
+def ensure_secret(name: str, namespace: Optional[str] = None, labels: Optional[dict] = None):
+    """Create an empty Secret unless it already exists"""
+    namespace = get_default_namespace_or(namespace)
+    sclient = get_static_client()
+    body = client.V1Secret(metadata=client.V1ObjectMeta(name=name, labels=labels))
+    try:
+        sclient.create_namespaced_secret(namespace=namespace, body=body)
+    except ApiException as e:
+        if e.status != 409:
+            raise
+
+
 def delete_persistent_volume_claim(pvc_name: str, namespace: Optional[str] = None):
     namespace = get_default_namespace_or(namespace)
     sclient = get_static_client()
@@ -442,7 +483,13 @@ def get_host():
 
 
 def pod_log(
-    pod_name, container_name=None, follow=False, namespace: Optional[str] = None, tail_lines=None
+    pod_name,
+    container_name=None,
+    follow=False,
+    namespace: Optional[str] = None,
+    tail_lines=None,
+    since_seconds=None,
+    timestamps=False,
 ):
     namespace = get_default_namespace_or(namespace)
     sclient = get_static_client()
@@ -455,6 +502,8 @@ def pod_log(
             follow=follow,
             _preload_content=False,
             tail_lines=tail_lines,
+            since_seconds=since_seconds,
+            timestamps=timestamps,
         )
     except ApiException as e:
         raise Exception(json.loads(e.body.decode("utf-8"))["message"]) from None
@@ -471,6 +520,25 @@ def wait_for_pod(pod_name, timeout_seconds=10, namespace: Optional[str] = None):
         timeout_seconds -= 1
 
 
+def pod_exec(
+    pod_name: str, container: str, command: list[str], namespace: Optional[str] = None
+) -> str:
+    """Run a command in a container through the API server, without kubectl, and return stdout"""
+    namespace = get_default_namespace_or(namespace)
+    sclient = get_static_client()
+    return stream(
+        sclient.connect_get_namespaced_pod_exec,
+        pod_name,
+        namespace,
+        command=command,
+        container=container,
+        stdin=False,
+        stderr=False,
+        stdout=True,
+        tty=False,
+    )
+
+
 def write_file_to_container(
     pod_name, container_name, dst_path, data, namespace: Optional[str] = None, quiet: bool = False
 ):
@@ -1,11 +1,12 @@
 import click
 
 from .admin import admin
+from .analyze import analyze
 from .bitcoin import bitcoin
 from .control import down, logs, run, snapshot, stop
 from .dashboard import dashboard, host
 from .deploy import deploy
-from .graph import create, import_network
+from .graph import create, graph, import_network
 from .image import image
 from .ln import ln
 from .namespaces import namespaces
@@ -63,11 +64,13 @@ def version() -> None:
 
 
 cli.add_command(admin)
+cli.add_command(analyze)
 cli.add_command(auth)
 cli.add_command(bitcoin)
 cli.add_command(deploy)
 cli.add_command(down)
 cli.add_command(dashboard)
+cli.add_command(graph)
 cli.add_command(host)
 cli.add_command(import_network)
 cli.add_command(image)
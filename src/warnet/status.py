@@ -1,27 +1,99 @@
+import json
 import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from typing import Optional
 
 import click
+from kubernetes import watch
+from kubernetes.client.models import V1Pod
+from kubernetes.client.rest import ApiException
 from kubernetes.config.config_exception import ConfigException
 from rich.console import Console
+from rich.live import Live
 from rich.panel import Panel
 from rich.table import Table
 from rich.text import Text
 from urllib3.exceptions import MaxRetryError
 
-from .constants import COMMANDER_MISSION, LIGHTNING_MISSION, TANK_MISSION
-from .k8s import get_mission
-from .network import _connected
+from .constants import BITCOINCORE_CONTAINER, COMMANDER_MISSION, LIGHTNING_MISSION, TANK_MISSION
+from .k8s import get_default_namespace, get_pods, get_static_client, pod_exec
+from .network import is_connection_manual
+
+STATUS_MISSIONS = [TANK_MISSION, LIGHTNING_MISSION, COMMANDER_MISSION]
+STATUS_COMPONENTS = {
+    TANK_MISSION: "Tank",
+    LIGHTNING_MISSION: "Lightning",
+    COMMANDER_MISSION: "Scenario",
+}
+
+# One exec per tank and sample instead of one per RPC
+TANK_SAMPLE_COMMAND = [
+    "sh",
+    "-c",
+    "bitcoin-cli getblockcount && bitcoin-cli getconnectioncount && bitcoin-cli getmempoolinfo",
+]
+# The leading line keeps the API client from parsing the JSON into a dict repr
+TANK_PEERS_COMMAND = ["sh", "-c", "echo getpeerinfo && bitcoin-cli getpeerinfo"]
+# bitcoind only makes this many manual outbound connections, however many addnodes it has
+MAX_MANUAL_CONNECTIONS = 8
+# Watch streams are re-listed after this long, bounding how stale a missed event can be
+WATCH_TIMEOUT = 300
+REFRESH_PER_SECOND = 4
 
 
 @click.command()
-def status():
-    """Display the unified status of the Warnet network and active scenarios"""
-    console = Console()
+@click.option("--watch", "watch_", is_flag=True, help="Keep a live table updated until interrupted")
+@click.option(
+    "--interval",
+    type=float,
+    default=10,
+    show_default=True,
+    help="Seconds between RPC samples of each tank with --watch",
+)
+@click.option(
+    "--concurrency",
+    type=int,
+    default=10,
+    show_default=True,
+    help="Tanks sampled at once",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print JSON instead of a table")
+@click.option(
+    "--summary",
+    "summary_only",
+    is_flag=True,
+    help="Only show counts grouped by namespace, image tag and phase",
+)
+def status(watch_: bool, interval: float, concurrency: int, as_json: bool, summary_only: bool):
+    """
+    Display the unified status of the Warnet network and active scenarios
+
+    --json prints every pod and the --summary counts for automation, without
+    rendering tables or querying tanks. --summary alone prints only the counts,
+    which is much faster to read on large networks.
+
+    Running tanks are checked for their manual connections --concurrency at a
+    time. With --watch, pod phases are followed with a single watch across all
+    namespaces and running tanks are sampled for block height, peers and
+    mempool size at most once per --interval, so the load on the cluster does
+    not depend on how often the table is redrawn.
+    """
+    if watch_ and (as_json or summary_only):
+        raise click.UsageError("--watch cannot be combined with --json or --summary")
 
     try:
-        tanks = _get_tank_status()
-        lns = _get_ln_status()
-        scenarios = _get_deployed_scenarios()
+        if watch_:
+            # Fail early on a missing kubeconfig, the watch itself runs in the background
+            get_static_client()
+        else:
+            pods = get_pods()
+            tanks = _get_tank_status(pods)
+            lns = _get_ln_status(pods)
+            scenarios = _get_deployed_scenarios(pods)
     except ConfigException as e:
         print(e)
         print(
@@ -42,6 +114,47 @@ def status():
         )
         sys.exit(1)
 
+    if as_json:
+        result = {
+            "summary": {
+                "tanks": _summarize(tanks),
+                "lightning": _summarize(lns),
+                "scenarios": _summarize(scenarios),
+                "active_scenarios": _active(scenarios),
+            }
+        }
+        if not summary_only:
+            result.update({"tanks": tanks, "lightning": lns, "scenarios": scenarios})
+        click.echo(json.dumps(result))
+        return
+
+    console = Console()
+    if watch_:
+        _watch_status(console, interval, concurrency)
+        return
+
+    if summary_only:
+        table = Table(title="Warnet Summary", show_header=True, header_style="bold magenta")
+        table.add_column("Component", style="cyan")
+        table.add_column("Namespace", style="green")
+        table.add_column("Image tag", style="green")
+        table.add_column("Status", style="yellow")
+        table.add_column("Count", justify="right")
+        for component, pods in [("Tank", tanks), ("Lightning", lns), ("Scenario", scenarios)]:
+            for group in _summarize(pods)["groups"]:
+                table.add_row(
+                    component,
+                    group["namespace"],
+                    group["tag"],
+                    group["status"],
+                    str(group["count"]),
+                )
+        console.print(table)
+        console.print(
+            f"Total Tanks: {len(tanks)} | Active Scenarios: {_active(scenarios)}", style="bold cyan"
+        )
+        return
+
     # Create a unified table
     table = Table(title="Warnet Status", show_header=True, header_style="bold magenta")
     table.add_column("Component", style="cyan")
@@ -63,12 +176,9 @@ def status():
     table.add_row("", "", "")
 
     # Add scenarios to the table
-    active = 0
     if scenarios:
         for scenario in scenarios:
             table.add_row("Scenario", scenario["name"], scenario["status"], scenario["namespace"])
-            if scenario["status"] == "running" or scenario["status"] == "pending":
-                active += 1
     else:
         table.add_row("", "No active scenarios", "", style="red")
 
@@ -87,42 +197,286 @@ def status():
     # Print summary
     summary = Text()
     summary.append(f"\nTotal Tanks: {len(tanks)}", style="bold cyan")
-    summary.append(f" | Active Scenarios: {active}", style="bold green")
+    summary.append(f" | Active Scenarios: {_active(scenarios)}", style="bold green")
     console.print(summary)
-    _connected(end="\r")
+    _print_connected(pods, concurrency)
 
 
-def _get_tank_status():
-    tanks = get_mission(TANK_MISSION)
-    return [
-        {
-            "name": tank.metadata.name,
-            "status": tank.status.phase.lower(),
-            "namespace": tank.metadata.namespace,
-        }
-        for tank in tanks
-    ]
+def _get_tank_status(pods: Optional[list[V1Pod]] = None):
+    return _get_mission_status(TANK_MISSION, pods)
 
 
-def _get_ln_status():
-    tanks = get_mission(LIGHTNING_MISSION)
-    return [
-        {
-            "name": tank.metadata.name,
-            "status": tank.status.phase.lower(),
-            "namespace": tank.metadata.namespace,
-        }
-        for tank in tanks
-    ]
+def _get_ln_status(pods: Optional[list[V1Pod]] = None):
+    return _get_mission_status(LIGHTNING_MISSION, pods)
+
+
+def _get_deployed_scenarios(pods: Optional[list[V1Pod]] = None):
+    return _get_mission_status(COMMANDER_MISSION, pods)
 
 
-def _get_deployed_scenarios():
-    commanders = get_mission(COMMANDER_MISSION)
+def _get_mission_status(mission: str, pods: Optional[list[V1Pod]] = None):
+    """Status of the pods of one mission, from an existing pod listing when given"""
+    pods = get_pods() if pods is None else pods
     return [
-        {
-            "name": c.metadata.name,
-            "status": c.status.phase.lower(),
-            "namespace": c.metadata.namespace,
-        }
-        for c in commanders
+        _pod_status(pod) for pod in pods if (pod.metadata.labels or {}).get("mission") == mission
     ]
+
+
+def _pod_status(pod: V1Pod) -> dict:
+    return {
+        "name": pod.metadata.name,
+        "status": pod.status.phase.lower(),
+        "namespace": pod.metadata.namespace,
+        "image": _pod_image(pod),
+    }
+
+
+def _pod_image(pod: V1Pod) -> str:
+    """Image of the Bitcoin Core container of a tank, or of the first container of other pods"""
+    containers = pod.spec.containers if pod.spec else []
+    for container in containers:
+        if container.name == BITCOINCORE_CONTAINER:
+            return container.image
+    return containers[0].image if containers else ""
+
+
+def _image_tag(image: str) -> str:
+    name = image.split("@")[0]
+    return name.rsplit(":", 1)[1] if ":" in name.rsplit("/", 1)[-1] else "latest"
+
+
+def _summarize(pods: list[dict]) -> dict:
+    """Pod counts in total, per status and per (namespace, image tag, status)"""
+    statuses = Counter(pod["status"] for pod in pods)
+    groups = Counter((pod["namespace"], _image_tag(pod["image"]), pod["status"]) for pod in pods)
+    return {
+        "total": len(pods),
+        "statuses": dict(statuses),
+        "groups": [
+            {"namespace": namespace, "tag": tag, "status": status, "count": count}
+            for (namespace, tag, status), count in sorted(groups.items())
+        ],
+    }
+
+
+def _active(scenarios: list[dict]) -> int:
+    return sum(scenario["status"] in ("running", "pending") for scenario in scenarios)
+
+
+def _print_connected(pods: list[V1Pod], concurrency: int):
+    """Check that every running tank has the manual connections it was deployed with"""
+    expected = {
+        (pod.metadata.namespace, pod.metadata.name): int(
+            (pod.metadata.annotations or {}).get("init_peers", 0)
+        )
+        for pod in pods
+        if (pod.metadata.labels or {}).get("mission") == TANK_MISSION
+        and pod.status.phase == "Running"
+    }
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = dict(_sample_all(_sample_connections, expected, executor))
+
+    connected = True
+    for (namespace, name), sample in sorted(samples.items()):
+        if "error" in sample:
+            click.secho(f"Tank: {name:<15} {namespace:<15} rpc error: {sample['error']}", fg="red")
+            connected = False
+        elif sample["manual"] < min(MAX_MANUAL_CONNECTIONS, expected[(namespace, name)]):
+            click.echo(
+                f"Tank: {name:<15} {namespace:<15} peers expected: "
+                f"{expected[(namespace, name)]:<3} actual: {sample['manual']:<3}"
+            )
+            connected = False
+    if connected:
+        click.secho("Network connected", fg="green")
+    else:
+        click.secho("Network not connected", fg="red")
+
+
+class StatusWatch:
+    """
+    Network state for `warnet status --watch`, kept up to date by background
+    threads: one pod watch across all namespaces and a fixed pool sampling
+    running tanks
+    """
+
+    def __init__(self, interval: float, concurrency: int):
+        self.interval = interval
+        self.concurrency = concurrency
+        self.lock = threading.Lock()
+        # (namespace, name) -> pod status with its mission
+        self.pods: dict[tuple[str, str], dict] = {}
+        # (namespace, name) -> {"height", "peers", "mempool"} or {"error"}
+        self.samples: dict[tuple[str, str], dict] = {}
+        self.errors: dict[str, str] = {}
+        # Bumped on every change so the table is only rebuilt when something changed
+        self.version = 0
+        self.stopped = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._watch_pods, daemon=True).start()
+        threading.Thread(target=self._sample_tanks, daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def _watch_pods(self):
+        sclient = get_static_client()
+        # Users without cluster-wide access fall back to their own namespace
+        list_pods, args, scope = sclient.list_pod_for_all_namespaces, (), "all namespaces"
+        while not self.stopped.is_set():
+            try:
+                listing = list_pods(*args, label_selector="mission")
+                with self.lock:
+                    self.pods.clear()
+                    for pod in listing.items:
+                        self._update_pod(pod)
+                    for key in [key for key in self.samples if key not in self.pods]:
+                        del self.samples[key]
+                    self.errors.pop(scope, None)
+                    self.version += 1
+                w = watch.Watch()
+                for event in w.stream(
+                    list_pods,
+                    *args,
+                    label_selector="mission",
+                    resource_version=listing.metadata.resource_version,
+                    timeout_seconds=WATCH_TIMEOUT,
+                ):
+                    with self.lock:
+                        if event["type"] == "DELETED":
+                            pod = event["object"]
+                            self.pods.pop((pod.metadata.namespace, pod.metadata.name), None)
+                            self.samples.pop((pod.metadata.namespace, pod.metadata.name), None)
+                        else:
+                            self._update_pod(event["object"])
+                        self.version += 1
+                    if self.stopped.is_set():
+                        w.stop()
+            except ApiException as e:
+                if e.status == 403 and not args:
+                    namespace = get_default_namespace()
+                    list_pods, args, scope = sclient.list_namespaced_pod, (namespace,), namespace
+                # 410 Gone: our resource version expired, just list again
+                elif e.status != 410:
+                    self._error(scope, f"{e.status} {e.reason}")
+                    self.stopped.wait(self.interval)
+            except Exception as e:
+                self._error(scope, str(e))
+                self.stopped.wait(self.interval)
+
+    def _update_pod(self, pod: V1Pod):
+        mission = (pod.metadata.labels or {}).get("mission")
+        if mission in STATUS_MISSIONS:
+            self.pods[(pod.metadata.namespace, pod.metadata.name)] = {
+                "mission": mission,
+                **_pod_status(pod),
+            }
+
+    def _error(self, scope: str, error: str):
+        with self.lock:
+            self.errors[scope] = error
+            self.version += 1
+
+    def _sample_tanks(self):
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while not self.stopped.is_set():
+                started = time.monotonic()
+                with self.lock:
+                    tanks = [
+                        key
+                        for key, pod in self.pods.items()
+                        if pod["mission"] == TANK_MISSION and pod["status"] == "running"
+                    ]
+                for key, sample in _sample_all(_sample_tank, tanks, executor):
+                    with self.lock:
+                        self.samples[key] = sample
+                        self.version += 1
+                self.stopped.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def table(self) -> Table:
+        with self.lock:
+            pods = sorted(
+                self.pods.items(),
+                key=lambda item: (STATUS_MISSIONS.index(item[1]["mission"]), item[0]),
+            )
+            samples = dict(self.samples)
+            errors = dict(self.errors)
+
+        table = Table(title="Warnet Status", show_header=True, header_style="bold magenta")
+        table.add_column("Component", style="cyan")
+        table.add_column("Name", style="green")
+        table.add_column("Status", style="yellow")
+        table.add_column("Namespace", style="green")
+        table.add_column("Height", justify="right")
+        table.add_column("Peers", justify="right")
+        table.add_column("Mempool", justify="right")
+        for key, pod in pods:
+            sample = samples.get(key, {}) if pod["status"] == "running" else {}
+            if "error" in sample:
+                values = [Text("rpc error", style="red"), "", ""]
+            else:
+                values = [str(sample.get(field, "-")) for field in ("height", "peers", "mempool")]
+            table.add_row(
+                STATUS_COMPONENTS[pod["mission"]],
+                pod["name"],
+                pod["status"],
+                pod["namespace"],
+                *values,
+            )
+
+        tanks = [pod for _, pod in pods if pod["mission"] == TANK_MISSION]
+        heights = [sample["height"] for sample in samples.values() if "height" in sample]
+        caption = (
+            f"Tanks running: {sum(pod['status'] == 'running' for pod in tanks)}/{len(tanks)}"
+            f" | Height: {f'{min(heights)}-{max(heights)}' if heights else '-'}"
+            f" | Sampled every {self.interval:g}s"
+        )
+        for scope, error in errors.items():
+            caption += f"\n[red]{scope}: {error}[/red]"
+        table.caption = caption
+        return table
+
+
+def _sample_all(
+    sampler: Callable[[str, str], dict], tanks: Iterable[tuple[str, str]], executor: Executor
+) -> Iterator[tuple[tuple[str, str], dict]]:
+    """Sample (namespace, name) tanks on the executor, yielding each sample as it completes"""
+    futures = {executor.submit(sampler, *tank): tank for tank in tanks}
+    for future in as_completed(futures):
+        yield futures[future], future.result()
+
+
+def _sample_tank(namespace: str, name: str) -> dict:
+    try:
+        output = pod_exec(name, BITCOINCORE_CONTAINER, TANK_SAMPLE_COMMAND, namespace)
+        height, peers, mempool = output.strip().split("\n", 2)
+        return {"height": int(height), "peers": int(peers), "mempool": json.loads(mempool)["size"]}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def _sample_connections(namespace: str, name: str) -> dict:
+    try:
+        output = pod_exec(name, BITCOINCORE_CONTAINER, TANK_PEERS_COMMAND, namespace)
+        peers = json.loads(output.split("\n", 1)[1])
+        return {"manual": sum(is_connection_manual(peer) for peer in peers)}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def _watch_status(console: Console, interval: float, concurrency: int):
+    state = StatusWatch(interval, concurrency)
+    state.start()
+    version = None
+    try:
+        with Live(console=console, refresh_per_second=REFRESH_PER_SECOND) as live:
+            while True:
+                if state.version != version:
+                    version = state.version
+                    live.update(state.table())
+                time.sleep(1 / REFRESH_PER_SECOND)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        state.stop()
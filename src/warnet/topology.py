@@ -0,0 +1,467 @@
+import inspect
+import json
+import random
+from collections import Counter, deque
+from pathlib import Path
+from typing import Callable, Optional
+
+import yaml
+from rich.console import Console
+from rich.table import Table
+
+# Bitcoin Core's -maxconnections=125 less 8 full-relay, 2 block-relay-only and 1 feeler outbound
+MAX_INBOUND = 114
+
+# Graphs up to this size get an exact diameter, larger ones are sampled. The exact diameter
+# needs a BFS from every node, so its cost grows with the square of the network size
+EXACT_DIAMETER_LIMIT = 500
+# Double-sweep BFS pairs used to estimate the diameter above EXACT_DIAMETER_LIMIT
+STATS_SAMPLES = 8
+# Clustering coefficient is exact up to this many nodes and averaged over this many above
+CLUSTERING_SAMPLES = 2000
+# Shortest-path sources used to estimate betweenness centrality
+BETWEENNESS_SAMPLES = 32
+
+# name -> generator(connections, rng, **options) returning each node's addnode peers by index
+TOPOLOGY_MODELS: dict[str, Callable] = {}
+# name -> fewest nodes the model can build a valid, connected topology from
+TOPOLOGY_MIN_NODES: dict[str, int] = {}
+
+
+def topology_model(name: str, min_nodes: int = 1):
+    def register(generator: Callable) -> Callable:
+        TOPOLOGY_MODELS[name] = generator
+        TOPOLOGY_MIN_NODES[name] = min_nodes
+        return generator
+
+    return register
+
+
+def generate_topology(
+    model: str, connections: list[int], rng: random.Random, **options
+) -> list[list[int]]:
+    """
+    Build a topology with a registered model, where connections[i] is the out-degree
+    requested for node i. Options a model does not take are ignored.
+    """
+    if len(connections) < TOPOLOGY_MIN_NODES[model]:
+        raise ValueError(
+            f"The {model} model needs at least {TOPOLOGY_MIN_NODES[model]} nodes, "
+            f"not {len(connections)}"
+        )
+    generator = TOPOLOGY_MODELS[model]
+    accepted = inspect.signature(generator).parameters
+    return generator(
+        connections,
+        rng,
+        **{key: value for key, value in options.items() if key in accepted and value is not None},
+    )
+
+
+@topology_model("random")
+def sample_addnodes(connections: list[int], rng: random.Random) -> list[list[int]]:
+    """
+    Choose addnode peers for every node, where connections[i] is the out-degree of node i.
+
+    Each node first connects to its successor, forming a ring that keeps the network
+    connected, then to random peers. A node never connects to itself, to the same peer
+    twice, or back to a peer that already connects to it (A -> B -> A). Within those
+    limits every node gets exactly the out-degree it asked for, and generation costs
+    O(connections) per node so it scales linearly with the number of edges.
+    """
+    total = len(connections)
+    outbound = [[] for _ in range(total)]
+    inbound = [set() for _ in range(total)]
+
+    for index, wanted in enumerate(connections):
+        excluded = inbound[index] | {index}
+        available = total - len(excluded)
+        wanted = min(wanted, available)
+        peers = []
+
+        successor = (index + 1) % total
+        if wanted and successor not in excluded:
+            peers.append(successor)
+            excluded.add(successor)
+
+        remaining = wanted - len(peers)
+        if remaining > (total - len(excluded)) // 2 or available < total // 2:
+            # Rejection sampling would mostly miss: draw from the explicit candidates
+            candidates = [n for n in range(total) if n not in excluded]
+            peers.extend(rng.sample(candidates, remaining))
+        else:
+            while len(peers) < wanted:
+                peer = rng.randrange(total)
+                if peer not in excluded:
+                    peers.append(peer)
+                    excluded.add(peer)
+
+        outbound[index] = peers
+        for peer in peers:
+            inbound[peer].add(index)
+
+    return outbound
+
+
+# Two nodes would connect to each other twice
+@topology_model("cycle", min_nodes=3)
+def cycle(connections: list[int], rng: random.Random) -> list[list[int]]:
+    """Every node connects to its successor only"""
+    total = len(connections)
+    return [[(index + 1) % total] for index in range(total)]
+
+
+@topology_model("scale-free")
+def barabasi_albert(connections: list[int], rng: random.Random) -> list[list[int]]:
+    """
+    Barabási–Albert preferential attachment: each new node connects to connections[i]
+    earlier nodes, picked with probability proportional to their degree
+    """
+    outbound = [[] for _ in connections]
+    # Every node appears here once per edge it has, so a uniform pick is degree-weighted
+    endpoints = []
+    for index, wanted in enumerate(connections):
+        wanted = min(wanted, index)
+        peers = set()
+        while len(peers) < wanted:
+            peer = endpoints[rng.randrange(len(endpoints))] if endpoints else 0
+            peers.add(peer)
+        outbound[index] = sorted(peers)
+        endpoints.extend(peers)
+        endpoints.extend([index] * max(len(peers), 1))
+    return outbound
+
+
+# The ring lattice needs a successor that is not also a predecessor
+@topology_model("small-world", min_nodes=3)
+def watts_strogatz(
+    connections: list[int], rng: random.Random, rewire: float = 0.1
+) -> list[list[int]]:
+    """
+    Watts–Strogatz small world: a ring lattice where node i connects to its next
+    connections[i] successors, each edge rewired to a random node with probability rewire
+    """
+    total = len(connections)
+    edges = set()
+    outbound = [[] for _ in range(total)]
+    for index, wanted in enumerate(connections):
+        for step in range(1, min(wanted, (total - 1) // 2) + 1):
+            peer = (index + step) % total
+            if rng.random() < rewire or _pair(index, peer) in edges:
+                peer = _random_peer(rng, total, index, edges)
+                if peer is None:
+                    break
+            edges.add(_pair(index, peer))
+            outbound[index].append(peer)
+    return outbound
+
+
+@topology_model("degree")
+def fitted_degree(
+    connections: list[int], rng: random.Random, degrees: Optional[str] = None
+) -> list[list[int]]:
+    """
+    Configuration model with node degrees drawn from a crawl. The degrees file is JSON
+    or YAML: a list with one degree per crawled node, or a {degree: node count} mapping.
+    Requested connections are not used. Components are joined afterwards.
+    """
+    if not degrees:
+        raise ValueError("The degree model needs a degrees file from a network crawl")
+    observed = _load_degrees(Path(degrees))
+    total = len(connections)
+    stubs = [node for node in range(total) for _ in range(rng.choice(observed))]
+    rng.shuffle(stubs)
+
+    edges = set()
+    outbound = [[] for _ in range(total)]
+    for a, b in zip(stubs[::2], stubs[1::2]):
+        if a == b or _pair(a, b) in edges:
+            continue
+        edges.add(_pair(a, b))
+        if rng.random() < 0.5:
+            a, b = b, a
+        outbound[a].append(b)
+    _join_components(outbound, rng)
+    return outbound
+
+
+@topology_model("clustered")
+def clustered(
+    connections: list[int],
+    rng: random.Random,
+    clusters: int = 4,
+    locality: float = 0.8,
+    max_inbound: int = MAX_INBOUND,
+) -> list[list[int]]:
+    """
+    Nodes are split into clusters (regions or ASes) of consecutive indexes. Each peer is
+    picked inside the node's own cluster with probability locality, otherwise from the
+    whole network, and no node accepts more than max_inbound connections.
+    """
+    total = len(connections)
+    clusters = max(1, min(clusters, total))
+    bounds = [-(-total * c // clusters) for c in range(clusters + 1)]
+    inbound = [0] * total
+    edges = set()
+    outbound = [[] for _ in range(total)]
+    for index, wanted in enumerate(connections):
+        cluster = index * clusters // total
+        start, end = bounds[cluster], bounds[cluster + 1]
+        attempts = 0
+        while len(outbound[index]) < wanted and attempts < 100 * max(wanted, 1):
+            attempts += 1
+            local = rng.random() < locality
+            peer = rng.randrange(start, end) if local else rng.randrange(total)
+            if peer == index or inbound[peer] >= max_inbound or _pair(index, peer) in edges:
+                continue
+            edges.add(_pair(index, peer))
+            outbound[index].append(peer)
+            inbound[peer] += 1
+    _join_components(outbound, rng)
+    return outbound
+
+
+def validate_topology(outbound: list[list[int]], max_inbound: Optional[int] = None) -> list[str]:
+    """Return a description of every structural problem that would break a deployment"""
+    problems = []
+    inbound = Counter()
+    seen = set()
+    for index, peers in enumerate(outbound):
+        if index in peers:
+            problems.append(f"Node {index} connects to itself")
+        for peer in peers:
+            if not 0 <= peer < len(outbound):
+                problems.append(f"Node {index} connects to unknown node {peer}")
+                continue
+            if _pair(index, peer) in seen:
+                problems.append(f"Duplicate connection between nodes {index} and {peer}")
+            seen.add(_pair(index, peer))
+            inbound[peer] += 1
+    if max_inbound is not None:
+        over = [node for node, count in inbound.items() if count > max_inbound]
+        if over:
+            problems.append(f"{len(over)} nodes exceed {max_inbound} inbound connections")
+    components = _components(undirected(outbound))
+    if len(components) > 1:
+        problems.append(f"Network is split into {len(components)} disconnected components")
+    return problems
+
+
+def topology_stats(outbound: list[list[int]], rng: Optional[random.Random] = None) -> dict:
+    """
+    Summary statistics of a topology. The diameter is exact up to EXACT_DIAMETER_LIMIT
+    nodes and clustering up to CLUSTERING_SAMPLES, both are estimated from samples above.
+    """
+    rng = rng or random.Random(0)
+    neighbors = undirected(outbound)
+    total = len(neighbors)
+    degrees = [len(peers) for peers in neighbors]
+    components = _components(neighbors)
+    exact = total <= EXACT_DIAMETER_LIMIT
+
+    largest = max(components, key=len) if components else []
+    if exact:
+        sources = largest
+    else:
+        # Double sweeps from random nodes: each BFS restarts from the farthest node found
+        sources = []
+        for node in rng.sample(largest, min(STATS_SAMPLES, len(largest))):
+            sources += [node, max(_distances(neighbors, node).items(), key=lambda d: d[1])[0]]
+    diameter = max((max(_distances(neighbors, node).values()) for node in sources), default=0)
+
+    if total <= CLUSTERING_SAMPLES:
+        sample = range(total)
+    else:
+        sample = rng.sample(range(total), CLUSTERING_SAMPLES)
+    clustering = [_local_clustering(neighbors, node) for node in sample]
+
+    return {
+        "nodes": total,
+        "edges": sum(len(peers) for peers in outbound),
+        "components": len(components),
+        "largest_component": len(largest),
+        "diameter": diameter,
+        "diameter_exact": exact,
+        "clustering": sum(clustering) / len(clustering) if clustering else 0.0,
+        "min_degree": min(degrees, default=0),
+        "mean_degree": sum(degrees) / total if total else 0.0,
+        "max_degree": max(degrees, default=0),
+        "degree_histogram": degree_histogram(degrees),
+    }
+
+
+def betweenness_estimate(
+    neighbors: list[set[int]],
+    samples: int = BETWEENNESS_SAMPLES,
+    rng: Optional[random.Random] = None,
+) -> list[float]:
+    """
+    Normalized betweenness centrality of every node: the share of shortest paths
+    between other node pairs that pass through it. Brandes' algorithm runs from
+    a random sample of source nodes and is scaled up to the whole graph, so the
+    cost is O(samples * edges). Exact when there are no more nodes than samples.
+    """
+    rng = rng or random.Random(0)
+    total = len(neighbors)
+    if total < 3:
+        return [0.0] * total
+    adjacency = [list(peers) for peers in neighbors]
+    sources = range(total) if total <= samples else rng.sample(range(total), samples)
+    centrality = [0.0] * total
+    for source in sources:
+        distance = [-1] * total
+        paths = [0] * total
+        distance[source] = 0
+        paths[source] = 1
+        order = [source]
+        # order doubles as the BFS queue
+        for node in order:
+            for peer in adjacency[node]:
+                if distance[peer] < 0:
+                    distance[peer] = distance[node] + 1
+                    order.append(peer)
+                if distance[peer] == distance[node] + 1:
+                    paths[peer] += paths[node]
+        dependency = [0.0] * total
+        for node in reversed(order):
+            for peer in adjacency[node]:
+                if distance[peer] == distance[node] - 1:
+                    dependency[peer] += paths[peer] / paths[node] * (1 + dependency[node])
+            if node != source:
+                centrality[node] += dependency[node]
+    # Every undirected path is counted from both ends when all sources are used
+    scale = len(sources) * (total - 1) * (total - 2)
+    return [value / scale * total for value in centrality]
+
+
+def partitioned_nodes(neighbors: list[set[int]]) -> list[int]:
+    """Nodes outside the largest connected component"""
+    components = _components(neighbors)
+    if len(components) < 2:
+        return []
+    largest = max(components, key=len)
+    return sorted(
+        node for component in components if component is not largest for node in component
+    )
+
+
+def degree_histogram(degrees: list[int], max_buckets: int = 16) -> list[tuple[str, int]]:
+    """Count nodes per degree, in power-of-two buckets when there are too many distinct degrees"""
+    counts = Counter(degrees)
+    if len(counts) <= max_buckets:
+        return [(str(degree), counts[degree]) for degree in sorted(counts)]
+    buckets = Counter()
+    for degree, count in counts.items():
+        low = 1 << (degree.bit_length() - 1) if degree else 0
+        buckets[low] += count
+    return [
+        (f"{low}-{max(low * 2 - 1, low)}" if low else "0", buckets[low]) for low in sorted(buckets)
+    ]
+
+
+def print_topology_stats(stats: dict, title: str = "Topology"):
+    console = Console()
+    table = Table(title=title, show_header=False)
+    table.add_column("Statistic", style="cyan")
+    table.add_column("Value", justify="right", style="green")
+    table.add_row("Nodes", str(stats["nodes"]))
+    table.add_row("Connections", str(stats["edges"]))
+    table.add_row(
+        "Components", f"{stats['components']} (largest {stats['largest_component']} nodes)"
+    )
+    table.add_row("Diameter", f"{'' if stats['diameter_exact'] else '>= '}{stats['diameter']}")
+    table.add_row("Clustering coefficient", f"{stats['clustering']:.3f}")
+    table.add_row(
+        "Degree min/mean/max",
+        f"{stats['min_degree']} / {stats['mean_degree']:.1f} / {stats['max_degree']}",
+    )
+    console.print(table)
+
+    histogram = Table(title="Degree histogram", show_header=True, header_style="bold magenta")
+    histogram.add_column("Degree", justify="right", style="cyan")
+    histogram.add_column("Nodes", justify="right", style="green")
+    histogram.add_column("")
+    peak = max((count for _, count in stats["degree_histogram"]), default=0)
+    for bucket, count in stats["degree_histogram"]:
+        histogram.add_row(bucket, str(count), "█" * max(1, count * 40 // peak))
+    console.print(histogram)
+
+
+def undirected(outbound: list[list[int]]) -> list[set[int]]:
+    neighbors = [set() for _ in outbound]
+    for index, peers in enumerate(outbound):
+        for peer in peers:
+            neighbors[index].add(peer)
+            neighbors[peer].add(index)
+    return neighbors
+
+
+def _pair(a: int, b: int) -> tuple[int, int]:
+    return (a, b) if a < b else (b, a)
+
+
+def _random_peer(rng: random.Random, total: int, index: int, edges: set) -> Optional[int]:
+    """A random node not yet connected to index, or None if there is none"""
+    for _ in range(100):
+        peer = rng.randrange(total)
+        if peer != index and _pair(index, peer) not in edges:
+            return peer
+    candidates = [p for p in range(total) if p != index and _pair(index, p) not in edges]
+    return rng.choice(candidates) if candidates else None
+
+
+def _components(neighbors: list[set[int]]) -> list[list[int]]:
+    seen = set()
+    components = []
+    for start in range(len(neighbors)):
+        if start in seen:
+            continue
+        seen.add(start)
+        component = [start]
+        queue = deque([start])
+        while queue:
+            for peer in neighbors[queue.popleft()]:
+                if peer not in seen:
+                    seen.add(peer)
+                    component.append(peer)
+                    queue.append(peer)
+        components.append(component)
+    return components
+
+
+def _join_components(outbound: list[list[int]], rng: random.Random):
+    """Connect every smaller component to the largest one with a single extra edge"""
+    components = _components(undirected(outbound))
+    if len(components) < 2:
+        return
+    components.sort(key=len, reverse=True)
+    for component in components[1:]:
+        outbound[rng.choice(component)].append(rng.choice(components[0]))
+
+
+def _distances(neighbors: list[set[int]], source: int) -> dict[int, int]:
+    distances = {source: 0}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        for peer in neighbors[node]:
+            if peer not in distances:
+                distances[peer] = distances[node] + 1
+                queue.append(peer)
+    return distances
+
+
+def _local_clustering(neighbors: list[set[int]], node: int) -> float:
+    peers = neighbors[node]
+    if len(peers) < 2:
+        return 0.0
+    links = sum(len(neighbors[peer] & peers) for peer in peers) / 2
+    return links / (len(peers) * (len(peers) - 1) / 2)
+
+
+def _load_degrees(path: Path) -> list[int]:
+    with open(path) as f:
+        data = json.load(f) if path.suffix == ".json" else yaml.safe_load(f)
+    if isinstance(data, dict):
+        return [int(degree) for degree, count in data.items() for _ in range(int(count))]
+    return [int(degree) for degree in data]
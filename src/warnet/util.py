@@ -1,7 +1,3 @@
-def create_cycle_graph(n: int, version: str, bitcoin_conf: str | None, random_version: bool):
-    raise NotImplementedError("create_cycle_graph function is not implemented")
-
-
 def parse_bitcoin_conf(file_content):
     """
     Custom parser for INI-style bitcoin.conf
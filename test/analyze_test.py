@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+from test_base import TestBase
+
+from warnet.analyze import (
+    BLOCK,
+    TX,
+    _item_stats,
+    _parse_events,
+    _parse_time,
+    _percentile,
+    _relay_path,
+    _undirected,
+)
+
+BLOCK_HASH = "5d9fbc1b27c13d8cf1bd1dd1c8e24bc6a7a6b8a0b0b7b2d34c2a0e5b8a1c7d01"
+TXID = "c3a1b6e0f5d14a2b9e8c7d6f5a4b3c2d1e0f9a8b7c6d5e4f3a2b1c0d9e8f7a6b"
+
+# debug.log lines (logtimemicros=1, logthreadnames=1) as captured from three tanks
+LOGS = {
+    "tank-0000": [
+        f"2024-09-02T10:00:00.000000Z [msghand] Submitting wtx {TXID} to mempool for relay",
+        f"2024-09-02T10:00:01.000000Z [msghand] UpdateTip: new best={BLOCK_HASH} height=101 version=0x20000000 log2_work=7.658 tx=102",
+    ],
+    "tank-0001": [
+        f"2024-09-02T10:00:00.250000Z [msghand] AcceptToMemoryPool: peer=0: accepted {TXID} (wtxid={TXID}, poolsz 1 txn, 1 kB)",
+        f"2024-09-02T10:00:01.100000Z [msghand] Saw new header hash={BLOCK_HASH} height=101",
+        f"2024-09-02T10:00:01.150000Z [msghand] UpdateTip: new best={BLOCK_HASH} height=101 version=0x20000000 log2_work=7.658 tx=102",
+        "2024-09-02T10:00:01.200000Z [msghand] Pre-allocating up to position 0x100000 in rev00000.dat",
+    ],
+    "tank-0002": [
+        f"2024-09-02T10:00:01.400000Z [msghand] Saw new cmpctblock header hash={BLOCK_HASH} height=101 peer=0",
+    ],
+}
+
+
+class AnalyzeTest(TestBase):
+    def __init__(self):
+        super().__init__()
+        # Parses captured logs only, no network to bring down
+        self.network = False
+
+    def run_test(self):
+        try:
+            self.check_parse_time()
+            self.check_parse_events()
+            self.check_stats()
+            self.check_relay_path()
+        finally:
+            self.cleanup()
+
+    def check_parse_time(self):
+        self.log.info("Parsing log timestamps")
+        assert _parse_time("2024-09-02T10:00:00.250000Z") == 1725271200.25
+        assert _parse_time("2024-09-02T10:00:00Z") == 1725271200.0
+        assert _parse_time("not-a-time") is None
+
+    def check_parse_events(self):
+        self.log.info("Parsing propagation events from captured logs")
+        events, heights, mempool_logged = _parse_events(line.encode() for line in LOGS["tank-0001"])
+        # The header is seen before the tip is updated: the first sighting counts
+        assert events[BLOCK] == {BLOCK_HASH: _parse_time("2024-09-02T10:00:01.100000Z")}
+        assert events[TX] == {TXID: _parse_time("2024-09-02T10:00:00.250000Z")}
+        assert heights == {BLOCK_HASH: 101}
+        assert mempool_logged
+
+        # Without debug=mempool only the wallet's own transactions are logged
+        events, _, mempool_logged = _parse_events(line.encode() for line in LOGS["tank-0000"])
+        assert TXID in events[TX]
+        assert not mempool_logged
+
+    def check_stats(self):
+        self.log.info("Computing propagation delays")
+        assert _percentile([], 50) is None
+        assert _percentile([1.0], 90) == 1.0
+        assert _percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.0
+        assert _percentile([1.0, 2.0, 3.0, 4.0], 90) == 4.0
+
+        seen = {}
+        for name, lines in LOGS.items():
+            events, _, _ = _parse_events(line.encode() for line in lines)
+            if BLOCK_HASH in events[BLOCK]:
+                seen[("default", name)] = events[BLOCK][BLOCK_HASH]
+        stats = _item_stats(BLOCK_HASH, seen)
+        assert stats["origin"] == ("default", "tank-0000")
+        assert stats["last"] == ("default", "tank-0002")
+        assert [round(delay, 3) for delay in stats["delays"]] == [0.1, 0.4]
+        assert round(stats["max"], 3) == 0.4
+
+    def check_relay_path(self):
+        self.log.info("Inferring relay paths from the topology")
+        # The same tank names in two namespaces stay apart
+        addnodes = {
+            "default": {"tank-0001": ["tank-0000"], "tank-0002": ["tank-0001"]},
+            "wargames-red": {"tank-0001": ["tank-0000.default.svc:18444"]},
+        }
+        peers = {}
+        for namespace, tanks in addnodes.items():
+            for node, node_peers in _undirected(namespace, tanks).items():
+                peers.setdefault(node, set()).update(node_peers)
+        assert peers[("default", "tank-0000")] == {
+            ("default", "tank-0001"),
+            ("wargames-red", "tank-0001"),
+        }
+        assert ("wargames-red", "tank-0000") not in peers
+
+        seen = {
+            ("default", "tank-0000"): 0.0,
+            ("default", "tank-0001"): 0.1,
+            ("default", "tank-0002"): 0.4,
+            ("wargames-red", "tank-0001"): 0.2,
+        }
+        assert _relay_path(("default", "tank-0002"), seen, peers) == [
+            ("default", "tank-0000"),
+            ("default", "tank-0001"),
+            ("default", "tank-0002"),
+        ]
+        # A tank with no earlier peer did not get the item from the origin
+        assert _relay_path(("default", "tank-0002"), seen, {}) == ["?", ("default", "tank-0002")]
+
+
+if __name__ == "__main__":
+    test = AnalyzeTest()
+    test.run_test()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import gzip
+import tempfile
+from pathlib import Path
+
+import click
+from click.testing import CliRunner
+from test_base import TestBase
+
+from warnet.archive import (
+    QUERY_POOL_MIN_SEGMENTS,
+    SEGMENT_KEY_LEN,
+    UNCATEGORIZED,
+    _categories,
+    _normalize_timestamp,
+    query,
+    save_index,
+)
+from warnet.deploy import validate_directory
+
+POD = "default/tank-0000"
+
+
+class ArchiveTest(TestBase):
+    def __init__(self):
+        super().__init__()
+        # Works on a local archive only, no network to bring down
+        self.network = False
+
+    def run_test(self):
+        try:
+            self.check_normalize_timestamp()
+            self.check_categories()
+            self.check_query()
+            self.check_reserved_tank_names()
+        finally:
+            self.cleanup()
+
+    def check_normalize_timestamp(self):
+        self.log.info("Normalizing timestamps to UTC")
+        utc = "2024-10-01T12:00:00.500000000Z"
+        assert _normalize_timestamp("2024-10-01T12:00:00.5Z") == utc
+        assert _normalize_timestamp("2024-10-01T12:00:00.5+00:00") == utc
+        assert _normalize_timestamp("2024-10-01T14:00:00.5+02:00") == utc
+        assert _normalize_timestamp("2024-10-01T08:00:00.5-0400") == utc
+        assert _normalize_timestamp("2024-10-01T12:30Z") == "2024-10-01T12:30:00.000000000Z"
+        # Without an offset the prefix is compared as is
+        assert _normalize_timestamp("2024-10-01T12") == "2024-10-01T12"
+        # Padding keeps string order equal to time order
+        assert _normalize_timestamp("2024-10-01T12:00:00.5Z") > _normalize_timestamp(
+            "2024-10-01T12:00:00.123456789Z"
+        )
+
+    def check_categories(self):
+        self.log.info("Reading bitcoind log categories")
+        assert _categories("2024-10-01T12:00:00Z [net] connected peer=1") == ["net"]
+        assert _categories("2024-10-01T12:00:00Z [msghand] [net:debug] received") == [
+            "msghand",
+            "net",
+        ]
+        assert _categories("2024-10-01T12:00:00Z UpdateTip: new best") == [UNCATEGORIZED]
+
+    def check_query(self):
+        self.log.info("Querying a local archive")
+        runner = CliRunner()
+        with tempfile.TemporaryDirectory() as archive_dir:
+            # Few segments are searched in process, more go through the pool
+            for hours in (2, QUERY_POOL_MIN_SEGMENTS):
+                self.write_archive(Path(archive_dir), hours)
+                result = runner.invoke(query, ["UpdateTip", "--dir", archive_dir])
+                assert result.exit_code == 0, result.output
+                lines = result.output.splitlines()
+                assert len(lines) == hours, result.output
+                assert lines == sorted(lines)
+                assert all(line.startswith("tank-0000 default ") for line in lines)
+
+            result = runner.invoke(
+                query,
+                ["peer=", "--dir", archive_dir, "--category", "net", "--start", "2024-10-01T03"],
+            )
+            assert result.exit_code == 0, result.output
+            assert len(result.output.splitlines()) == QUERY_POOL_MIN_SEGMENTS - 3, result.output
+
+            # The same instant with an offset selects the same segments
+            result = runner.invoke(
+                query,
+                ["UpdateTip", "--dir", archive_dir, "--end", "2024-10-01T04:00:00+02:00"],
+            )
+            assert result.exit_code == 0, result.output
+            assert len(result.output.splitlines()) == 2, result.output
+
+    def write_archive(self, root: Path, hours: int):
+        index = {POD: {"segments": {}}}
+        pod_dir = root / POD
+        pod_dir.mkdir(parents=True, exist_ok=True)
+        for hour in range(hours):
+            timestamps = [
+                _normalize_timestamp(f"2024-10-01T{hour:02}:00:0{second}Z") for second in (1, 2)
+            ]
+            lines = [
+                f"{timestamps[0]} 2024-10-01T{hour:02}:00:01Z [net] connected peer={hour}",
+                f"{timestamps[1]} 2024-10-01T{hour:02}:00:02Z UpdateTip: new best height={hour}",
+            ]
+            segment = timestamps[0][:SEGMENT_KEY_LEN]
+            with gzip.open(pod_dir / f"{segment}.log.gz", "wt", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            index[POD]["segments"][segment] = {
+                "start": timestamps[0],
+                "end": timestamps[1],
+                "lines": 2,
+                "categories": {"net": 1, UNCATEGORIZED: 1},
+            }
+        save_index(root, index)
+
+    def check_reserved_tank_names(self):
+        self.log.info("Rejecting tanks named after `warnet logs` subcommands")
+        with tempfile.TemporaryDirectory() as network_dir:
+            network_file = Path(network_dir) / "network.yaml"
+            network_file.write_text("nodes:\n  - name: tank-0000\n")
+            assert validate_directory(None, None, network_dir) == Path(network_dir)
+
+            network_file.write_text("nodes:\n  - name: tank-0000\n  - name: query\n")
+            try:
+                validate_directory(None, None, network_dir)
+            except click.BadParameter as e:
+                assert "query" in str(e)
+            else:
+                raise AssertionError("A tank named query was accepted")
+
+
+if __name__ == "__main__":
+    test = ArchiveTest()
+    test.run_test()
@@ -5,6 +5,7 @@ import os
 import sys
 
 import pexpect
+import yaml
 from test_base import TestBase
 
 from warnet.process import stream_command
@@ -23,6 +24,7 @@ class GraphTest(TestBase):
             self.directory_not_exist()
             os.mkdir(NETWORKS_DIR)
             self.directory_exists()
+            self.create_from_model()
             self.run_created_network()
         finally:
             self.cleanup()
@@ -63,6 +65,34 @@ class GraphTest(TestBase):
             print(f"\nReceived prompt text:\n  {self.sut.before.decode('utf-8')}\n")
             raise e
 
+    def create_from_model(self):
+        self.log.info("testing non-interactive warnet create with a topology model")
+        for name in ["SmallWorldA", "SmallWorldB"]:
+            self.warnet(
+                f"create --model small-world --nodes 20 --connections 3 --seed 7 --name {name}"
+            )
+        with open(f"{NETWORKS_DIR}/SmallWorldA/network.yaml") as f:
+            network_a = f.read()
+        with open(f"{NETWORKS_DIR}/SmallWorldB/network.yaml") as f:
+            network_b = f.read()
+        # Same seed, same topology
+        assert network_a == network_b
+        nodes = yaml.safe_load(network_a)["nodes"]
+        assert len(nodes) == 20
+        assert all(len(node["addnode"]) == 3 for node in nodes)
+        stats = self.warnet(f"graph stats {NETWORKS_DIR}/SmallWorldA")
+        assert "1 (largest 20 nodes)" in stats
+        assert "Most central nodes" in stats
+
+        # Two nodes cannot form a ring without a duplicate or missing edge
+        try:
+            self.warnet("create --model cycle --nodes 2 --name TooSmall")
+        except Exception as e:
+            assert "needs at least 3 nodes" in str(e), e
+        else:
+            raise AssertionError("A 2-node cycle was created")
+        assert not os.path.exists(f"{NETWORKS_DIR}/TooSmall")
+
     def run_created_network(self):
         self.log.info("adding custom config to one tank")
         with open("networks/ANewNetwork/network.yaml") as f:
@@ -48,11 +48,19 @@ class RPCTest(TestBase):
         count = all_logs.count("Enqueuing TransactionAddedToMempool")
         assert count > 1, f"Transaction not propagated to enough nodes (count: {count})"
 
+        recent_logs = self.warnet(f"bitcoin grep-logs {txid} --since 1h --no-sort")
+        count = recent_logs.count("Enqueuing TransactionAddedToMempool")
+        assert count > 1, f"Transaction not found in recent logs (count: {count})"
+
     def test_message_exchange(self):
         self.log.info("Testing message exchange between nodes")
         msgs = self.warnet("bitcoin messages tank-0000 tank-0001")
         assert "verack" in msgs, "VERACK message not found in exchange"
 
+        pings = self.warnet("bitcoin messages tank-0000 tank-0001 --type ping,pong --since 1d")
+        assert "ping" in pings, "PING message not found in exchange"
+        assert "verack" not in pings, "Message type filter was not applied"
+
     def test_address_manager(self):
         self.log.info("Testing address manager")
 
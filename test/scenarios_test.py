@@ -24,6 +24,8 @@ class ScenariosTest(TestBase):
             self.run_and_check_miner_scenario_from_file()
             self.run_and_check_scenario_from_file()
             self.run_and_check_scenario_from_file_debug()
+            self.run_and_check_async_scenario()
+            self.run_and_check_zmq_scenario()
             self.check_regtest_recon()
             self.check_active_count()
         finally:
@@ -105,6 +107,18 @@ class ScenariosTest(TestBase):
         self.warnet(f"run {scenario_file} --source_dir={self.scen_dir}")
         self.wait_for_predicate(self.check_scenario_clean_exit)
 
+    def run_and_check_async_scenario(self):
+        scenario_file = self.scen_dir / "test_scenarios" / "async_tips.py"
+        self.log.info(f"Running scenario from: {scenario_file}")
+        self.warnet(f"run {scenario_file} --source_dir={self.scen_dir}")
+        self.wait_for_predicate(self.check_scenario_clean_exit)
+
+    def run_and_check_zmq_scenario(self):
+        scenario_file = self.scen_dir / "test_scenarios" / "zmq_heights.py"
+        self.log.info(f"Running scenario from: {scenario_file}")
+        self.warnet(f"run {scenario_file} --source_dir={self.scen_dir}")
+        self.wait_for_predicate(self.check_scenario_clean_exit)
+
     def check_regtest_recon(self):
         scenario_file = self.scen_dir / "reconnaissance.py"
         self.log.info(f"Running scenario from file: {scenario_file}")
@@ -112,17 +126,19 @@ class ScenariosTest(TestBase):
         self.wait_for_predicate(self.check_scenario_clean_exit)
 
     def check_active_count(self):
+        # Every earlier scenario that ran to completion is still listed
+        passed = len([s for s in scenarios_deployed() if s["status"] == "succeeded"])
         scenario_file = self.scen_dir / "test_scenarios" / "buggy_failure.py"
         self.log.info(f"Running scenario from: {scenario_file}")
         self.warnet(f"run {scenario_file} --source_dir={self.scen_dir}")
 
-        def two_pass_one_fail():
+        def earlier_pass_one_fail():
             deployed = scenarios_deployed()
-            if len([s for s in deployed if s["status"] == "succeeded"]) != 2:
+            if len([s for s in deployed if s["status"] == "succeeded"]) != passed:
                 return False
             return len([s for s in deployed if s["status"] == "failed"]) == 1
 
-        self.wait_for_predicate(two_pass_one_fail)
+        self.wait_for_predicate(earlier_pass_one_fail)
         table = self.warnet("status")
         assert "Active Scenarios: 0" in table
 
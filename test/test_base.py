@@ -16,7 +16,6 @@ from warnet import SRC_DIR
 from warnet.k8s import get_pod_exit_status
 from warnet.network import _connected as network_connected
 from warnet.status import _get_deployed_scenarios as scenarios_deployed
-from warnet.status import _get_tank_status as network_status
 
 
 class TestBase:
@@ -126,15 +125,11 @@ class TestBase:
         """
 
         def check_status():
-            tanks = network_status()
-            stats = {"total": 0}
+            tanks = json.loads(self.warnet("status --json --summary"))["summary"]["tanks"]
             # "Probably" means all tanks are stopped and deleted
-            if len(tanks) == 0:
+            if tanks["total"] == 0:
                 return True
-            for tank in tanks:
-                status = tank["status"]
-                stats["total"] += 1
-                stats[status] = stats.get(status, 0) + 1
+            stats = {"total": tanks["total"], **tanks["statuses"]}
             self.log.info(f"Waiting for all tanks to reach '{target}': {stats}")
             return target in stats and stats[target] == stats["total"]
 